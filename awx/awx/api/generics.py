@@ -9,6 +9,7 @@ import time
 # Django
 from django.conf import settings
 from django.db import connection
+from django.db.models import prefetch_related_objects
 from django.db.models.fields import FieldDoesNotExist
 from django.db.models.fields.related import OneToOneRel
 from django.http import QueryDict
@@ -33,11 +34,11 @@ from awx.main.models import *  # noqa
 from awx.main.access import access_registry
 from awx.main.utils import * # noqa
 from awx.main.utils.db import get_all_field_names
-from awx.api.serializers import ResourceAccessListElementSerializer
+from awx.api.serializers import ResourceAccessListElementSerializer, SUMMARIZABLE_FK_FIELDS
 from awx.api.versioning import URLPathVersioning, get_request_version
 from awx.api.metadata import SublistAttachDetatchMetadata
 
-__all__ = ['APIView', 'GenericAPIView', 'ListAPIView', 'SimpleListAPIView',
+__all__ = ['APIView', 'GenericAPIView', 'ListAPIView', 'PolymorphicListAPIView', 'SimpleListAPIView',
            'ListCreateAPIView', 'SubListAPIView', 'SubListCreateAPIView',
            'SubListDestroyAPIView',
            'SubListCreateAttachDetachAPIView', 'RetrieveAPIView',
@@ -52,6 +53,9 @@ __all__ = ['APIView', 'GenericAPIView', 'ListAPIView', 'SimpleListAPIView',
 logger = logging.getLogger('awx.api.generics')
 analytics_logger = logging.getLogger('awx.analytics.performance')
 
+# Foreign keys to the objects shown in the summary fields of list items.
+SUMMARY_FK_FIELD_NAMES = tuple(SUMMARIZABLE_FK_FIELDS) + ('created_by', 'modified_by')
+
 
 def get_view_name(cls, suffix=None):
     '''
@@ -327,11 +331,19 @@ class ListAPIView(generics.ListAPIView, GenericAPIView):
 
     def paginate_queryset(self, queryset):
         page = super(ListAPIView, self).paginate_queryset(queryset)
+        if page is not None:
+            page = self.load_page(page)
+            # Loads the related objects shown in summary fields in bulk
+            cache_list_related(page, SUMMARY_FK_FIELD_NAMES)
         # Queries RBAC info & stores into list objects
         if hasattr(self, 'capabilities_prefetch') and page is not None:
             cache_list_capabilities(page, self.capabilities_prefetch, self.model, self.request.user)
         return page
 
+    def load_page(self, page):
+        # Hook to replace the objects of a page before they are serialized.
+        return page
+
     def get_description_context(self):
         if 'username' in get_all_field_names(self.model):
             order_field = 'username'
@@ -396,6 +408,28 @@ class ListAPIView(generics.ListAPIView, GenericAPIView):
         return allowed_fields
 
 
+class PolymorphicListAPIView(ListAPIView):
+    # Base class for a read-only list view of a polymorphic model. The page
+    # is fetched as base objects, then the objects of each concrete type on it
+    # are loaded with one query per type, and their related objects are
+    # prefetched for the whole page.
+
+    def get_queryset(self):
+        qs = super(PolymorphicListAPIView, self).get_queryset()
+        # Resolving the real instances through the original queryset keeps
+        # its select_related.
+        self.polymorphic_queryset = qs
+        self.prefetch_lookups = qs._prefetch_related_lookups
+        return qs.non_polymorphic().prefetch_related(None)
+
+    def load_page(self, page):
+        if not page:
+            return page
+        page = list(self.polymorphic_queryset.get_real_instances(page))
+        prefetch_related_objects(page, *self.prefetch_lookups)
+        return page
+
+
 class ListCreateAPIView(ListAPIView, generics.ListCreateAPIView):
     # Base class for a list view that allows creating new objects.
     pass
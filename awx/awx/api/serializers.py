@@ -281,6 +281,15 @@ class BaseSerializer(serializers.ModelSerializer):
             choices.append((t, name))
         return choices
 
+    def get_type_serializer(self, serializer_class):
+        # Serializers of the concrete types in a list of polymorphic objects
+        # are built once and reused for every object of their type, instead of
+        # building the fields of a new serializer for each object.
+        type_serializers = self.__dict__.setdefault('_type_serializers', {})
+        if serializer_class not in type_serializers:
+            type_serializers[serializer_class] = serializer_class(context=self.context)
+        return type_serializers[serializer_class]
+
     def get_url(self, obj):
         if obj is None or not hasattr(obj, 'get_absolute_url'):
             return ''
@@ -605,8 +614,7 @@ class UnifiedJobTemplateSerializer(BaseSerializer):
             elif isinstance(obj, WorkflowJobTemplate):
                 serializer_class = WorkflowJobTemplateSerializer
         if serializer_class:
-            serializer = serializer_class(instance=obj, context=self.context)
-            return serializer.to_representation(obj)
+            return self.get_type_serializer(serializer_class).to_representation(obj)
         else:
             return super(UnifiedJobTemplateSerializer, self).to_representation(obj)
 
@@ -689,8 +697,7 @@ class UnifiedJobSerializer(BaseSerializer):
             elif isinstance(obj, WorkflowJob):
                 serializer_class = WorkflowJobSerializer
         if serializer_class:
-            serializer = serializer_class(instance=obj, context=self.context)
-            ret = serializer.to_representation(obj)
+            ret = self.get_type_serializer(serializer_class).to_representation(obj)
         else:
             ret = super(UnifiedJobSerializer, self).to_representation(obj)
 
@@ -744,8 +751,7 @@ class UnifiedJobListSerializer(UnifiedJobSerializer):
             elif isinstance(obj, WorkflowJob):
                 serializer_class = WorkflowJobSerializer
         if serializer_class:
-            serializer = serializer_class(instance=obj, context=self.context)
-            ret = serializer.to_representation(obj)
+            ret = self.get_type_serializer(serializer_class).to_representation(obj)
         else:
             ret = super(UnifiedJobListSerializer, self).to_representation(obj)
         if 'elapsed' in ret:
@@ -28,7 +28,7 @@ from django.utils.timezone import now
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.cache import never_cache
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import ugettext_lazy as _
 
@@ -74,8 +74,10 @@ from awx.main.utils import (
     decrypt_field,
 )
 from awx.main.utils.encryption import encrypt_value
+from awx.main.utils.event_partitions import filter_event_partitions
 from awx.main.utils.filters import SmartFilter
 from awx.main.utils.insights import filter_insights_api_response
+from awx.main.utils.stdout_index import get_line_index_path
 
 from awx.api.permissions import * # noqa
 from awx.api.renderers import * # noqa
@@ -862,6 +864,7 @@ class OrganizationList(OrganizationCountsMixin, ListCreateAPIView):
 
     model = Organization
     serializer_class = OrganizationSerializer
+    capabilities_prefetch = ['admin']
 
     def get_queryset(self):
         qs = Organization.accessible_objects(self.request.user, 'read_role')
@@ -1073,6 +1076,7 @@ class TeamList(ListCreateAPIView):
 
     model = Team
     serializer_class = TeamSerializer
+    capabilities_prefetch = ['admin']
 
     def get_queryset(self):
         qs = Team.accessible_objects(self.request.user, 'read_role').order_by()
@@ -2442,6 +2446,14 @@ class InventoryScriptView(RetrieveAPIView):
                 hosts_q['enabled'] = True
             host = get_object_or_404(obj.hosts, **hosts_q)
             return Response(host.variables_dict)
+        if request.accepted_renderer.format == 'json':
+            script_data = obj.open_script_data(
+                hostvars=hostvars,
+                towervars=towervars,
+                show_all=show_all
+            )
+            if script_data is not None:
+                return StreamingHttpResponse(FileWrapper(script_data), content_type='application/json')
         return Response(obj.get_script_data(
             hostvars=hostvars,
             towervars=towervars,
@@ -3489,6 +3501,10 @@ class WorkflowJobTemplateList(WorkflowsEnforcementMixin, ListCreateAPIView):
     model = WorkflowJobTemplate
     serializer_class = WorkflowJobTemplateListSerializer
     always_allow_superuser = False
+    capabilities_prefetch = [
+        'admin', 'execute',
+        {'copy': 'organization.admin'}
+    ]
     new_in_310 = True
 
 
@@ -4210,7 +4226,7 @@ class JobJobEventsList(BaseJobEventsList):
     def get_queryset(self):
         job = self.get_parent_object()
         self.check_parent_access(job)
-        qs = job.job_events
+        qs = filter_event_partitions(job.job_events.all(), job)
         qs = qs.select_related('host')
         qs = qs.prefetch_related('hosts', 'children')
         return qs.all()
@@ -4411,6 +4427,10 @@ class AdHocCommandAdHocCommandEventsList(BaseAdHocCommandEventsList):
     parent_model = AdHocCommand
     new_in_220 = True
 
+    def get_queryset(self):
+        qs = super(AdHocCommandAdHocCommandEventsList, self).get_queryset()
+        return filter_event_partitions(qs, self.get_parent_object())
+
 
 class AdHocCommandActivityStreamList(ActivityStreamEnforcementMixin, SubListAPIView):
 
@@ -4474,7 +4494,7 @@ class SystemJobNotificationsList(SubListAPIView):
     new_in_300 = True
 
 
-class UnifiedJobTemplateList(ListAPIView):
+class UnifiedJobTemplateList(PolymorphicListAPIView):
 
     model = UnifiedJobTemplate
     serializer_class = UnifiedJobTemplateSerializer
@@ -4486,7 +4506,7 @@ class UnifiedJobTemplateList(ListAPIView):
     ]
 
 
-class UnifiedJobList(ListAPIView):
+class UnifiedJobList(PolymorphicListAPIView):
 
     model = UnifiedJob
     serializer_class = UnifiedJobListSerializer
@@ -4605,6 +4625,11 @@ class UnifiedJobStdout(RetrieveAPIView):
                             write_fd.close()
                             subprocess.Popen("sed -i 's/\\\\r\\\\n/\\n/g' {}".format(unified_job.result_stdout_file),
                                              shell=True).wait()
+                            # Any line index recorded for the file no longer matches it.
+                            try:
+                                os.remove(get_line_index_path(unified_job.result_stdout_file))
+                            except OSError:
+                                pass
                     except Exception as e:
                         return Response({"error": _("Error generating stdout download file: {}".format(e))})
             try:
@@ -4615,7 +4640,7 @@ class UnifiedJobStdout(RetrieveAPIView):
                     suffix = ''
                 else:
                     suffix = '_ansi'
-                response = HttpResponse(FileWrapper(content_fd), content_type='text/plain')
+                response = StreamingHttpResponse(FileWrapper(content_fd), content_type='text/plain')
                 response["Content-Disposition"] = 'attachment; filename="job_%s%s.txt"' % (str(unified_job.id), suffix)
                 return response
             except Exception as e:
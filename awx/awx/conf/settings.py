@@ -1,6 +1,7 @@
 # Python
 from collections import namedtuple
 import contextlib
+import copy
 import logging
 import sys
 import threading
@@ -54,7 +55,19 @@ SETTING_CACHE_TIMEOUT = 60
 # Flag indicating whether to store field default values in the cache.
 SETTING_CACHE_DEFAULTS = True
 
-__all__ = ['SettingsWrapper', 'get_settings_to_cache', 'SETTING_CACHE_NOTSET']
+# Cache key of a counter bumped whenever any setting changes; each process
+# keeps validated setting values in memory until the counter changes.
+SETTING_CACHE_GENERATION_KEY = '_awx_conf_generation'
+
+# Check the generation counter in the cache at most every this many seconds.
+SETTING_LOCAL_CACHE_TIMEOUT = 5
+
+# Keep values in memory at most this many seconds, in case one was read again
+# before the change that bumped the generation counter was committed.
+SETTING_LOCAL_CACHE_MAX_AGE = SETTING_CACHE_TIMEOUT
+
+__all__ = ['SettingsWrapper', 'get_settings_to_cache', 'SETTING_CACHE_NOTSET',
+           'bump_setting_cache_generation']
 
 
 @contextlib.contextmanager
@@ -179,6 +192,22 @@ def get_settings_to_cache(registry):
     return dict([(key, SETTING_CACHE_NOTSET) for key in get_writeable_settings(registry)])
 
 
+def bump_setting_cache_generation(cache=django_cache):
+    '''
+    Tells every process to discard the setting values it holds in memory,
+    and discards those of the current process right away.
+    '''
+    try:
+        cache.incr(SETTING_CACHE_GENERATION_KEY)
+    except ValueError:
+        # Start from the clock so a counter evicted from the cache can't
+        # come back with a generation some process has already seen.
+        cache.add(SETTING_CACHE_GENERATION_KEY, int(time.time() * 1000000), None)
+    settings_wrapper = getattr(settings, '_awx_conf_settings', None)
+    if settings_wrapper is not None:
+        settings_wrapper.clear_local_cache()
+
+
 def get_cache_value(value):
     '''Returns the proper special cache setting for a value
     based on instance type.
@@ -227,6 +256,11 @@ class SettingsWrapper(UserSettingsHolder):
         self.__dict__['_awx_conf_preload_expires'] = None
         self.__dict__['_awx_conf_preload_lock'] = threading.RLock()
         self.__dict__['_awx_conf_init_readonly'] = False
+        self.__dict__['_awx_conf_local_cache'] = {}
+        self.__dict__['_awx_conf_local_generation'] = None
+        self.__dict__['_awx_conf_local_expires'] = None
+        self.__dict__['_awx_conf_local_since'] = time.time()
+        self.__dict__['_awx_conf_local_stats'] = {'hits': 0, 'misses': 0, 'invalidations': 0}
         self.__dict__['cache'] = EncryptedCacheProxy(cache, registry)
         self.__dict__['registry'] = registry
 
@@ -303,7 +337,54 @@ class SettingsWrapper(UserSettingsHolder):
         settings_to_cache['_awx_conf_preload_expires'] = self._awx_conf_preload_expires
         self.cache.set_many(settings_to_cache, timeout=SETTING_CACHE_TIMEOUT)
 
+    def clear_local_cache(self):
+        if self._awx_conf_local_cache:
+            self._awx_conf_local_stats['invalidations'] += 1
+        self.__dict__['_awx_conf_local_cache'] = {}
+        self.__dict__['_awx_conf_local_expires'] = None
+        self.__dict__['_awx_conf_local_since'] = time.time()
+
+    def local_cache_stats(self):
+        '''
+        Returns the hit, miss and invalidation counts of the in-memory cache
+        of validated setting values kept by this process.
+        '''
+        return dict(self._awx_conf_local_stats, size=len(self._awx_conf_local_cache))
+
+    def _check_local_cache_generation(self):
+        # Only look at the generation counter every SETTING_LOCAL_CACHE_TIMEOUT
+        # seconds; until then, values held in memory are used as they are.
+        if self._awx_conf_local_expires and self._awx_conf_local_expires > time.time():
+            return
+        generation = self.cache.cache.get(SETTING_CACHE_GENERATION_KEY)
+        if generation is None:
+            self.cache.cache.add(SETTING_CACHE_GENERATION_KEY, int(time.time() * 1000000), None)
+            generation = self.cache.cache.get(SETTING_CACHE_GENERATION_KEY)
+        # Without a counter (e.g., no cache) values can't be kept any longer.
+        if generation is None or generation != self._awx_conf_local_generation or \
+                time.time() - self._awx_conf_local_since > SETTING_LOCAL_CACHE_MAX_AGE:
+            self.clear_local_cache()
+            self.__dict__['_awx_conf_local_generation'] = generation
+        self.__dict__['_awx_conf_local_expires'] = time.time() + SETTING_LOCAL_CACHE_TIMEOUT
+
     def _get_local(self, name):
+        self._check_local_cache_generation()
+        local_cache = self._awx_conf_local_cache
+        if name in local_cache:
+            self._awx_conf_local_stats['hits'] += 1
+            value = local_cache[name]
+        else:
+            self._awx_conf_local_stats['misses'] += 1
+            value = self._get_cached(name)
+            # Skip values read while the cache was being cleared.
+            if local_cache is self._awx_conf_local_cache:
+                local_cache[name] = value
+        if isinstance(value, (list, dict, set)):
+            # Callers may modify the value they get back.
+            value = copy.deepcopy(value)
+        return value
+
+    def _get_cached(self, name):
         self._preload_cache()
         cache_key = Setting.get_cache_key(name)
         try:
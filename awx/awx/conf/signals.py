@@ -4,6 +4,7 @@ import logging
 # Django
 from django.conf import settings
 from django.core.signals import setting_changed
+from django.db import connection
 from django.db.models.signals import post_save, pre_delete, post_delete
 from django.core.cache import cache
 from django.dispatch import receiver
@@ -13,6 +14,7 @@ import awx.main.signals
 from awx.conf import settings_registry
 from awx.conf.models import Setting
 from awx.conf.serializers import SettingSerializer
+from awx.conf.settings import bump_setting_cache_generation
 
 logger = logging.getLogger('awx.conf.signals')
 
@@ -21,6 +23,11 @@ awx.main.signals.model_serializer_mapping[Setting] = SettingSerializer
 __all__ = []
 
 
+def invalidate_settings_cache(cache_keys):
+    cache.delete_many(cache_keys)
+    bump_setting_cache_generation(cache)
+
+
 def handle_setting_change(key, for_delete=False):
     # When a setting changes or is deleted, remove its value from cache along
     # with any other settings that depend on it.
@@ -30,7 +37,10 @@ def handle_setting_change(key, for_delete=False):
         setting_keys.append(dependent_key)
     # NOTE: This block is probably duplicated.
     cache_keys = set([Setting.get_cache_key(k) for k in setting_keys])
-    cache.delete_many(cache_keys)
+    invalidate_settings_cache(cache_keys)
+    # Other processes may cache the old value again until the change is
+    # committed, so invalidate once more when it is.
+    connection.on_commit(lambda: invalidate_settings_cache(cache_keys))
 
     # Send setting_changed signal with new value for each setting.
     for setting_key in setting_keys:
@@ -348,3 +348,23 @@ def test_setting_logging_test(api_request):
         assert test_arguments.LOG_AGGREGATOR_HOST == 'http://foobar'
         assert test_arguments.LOG_AGGREGATOR_TYPE == 'logstash'
         assert test_arguments.LOG_AGGREGATOR_LEVEL == 'DEBUG'
+
+
+@pytest.mark.django_db
+def test_setting_change_invalidates_cache_again_on_commit(dummy_setting):
+    from django.core.cache import cache
+    from awx.conf.settings import SETTING_CACHE_GENERATION_KEY
+    with dummy_setting(
+        'FOO_BAR',
+        field_class=fields.IntegerField,
+        category='FooBar',
+        category_slug='foobar'
+    ), mock.patch('awx.conf.signals.connection') as connection:
+        Setting.objects.create(key='FOO_BAR', value=1)
+        # Another process caches the old value before the change commits
+        cache.set(Setting.get_cache_key('FOO_BAR'), 0)
+        generation = cache.get(SETTING_CACHE_GENERATION_KEY)
+        on_commit = connection.on_commit.call_args[0][0]
+        on_commit()
+        assert cache.get(Setting.get_cache_key('FOO_BAR')) is None
+        assert cache.get(SETTING_CACHE_GENERATION_KEY) != generation
@@ -15,7 +15,11 @@ import pytest
 import six
 
 from awx.conf import models, fields
-from awx.conf.settings import SettingsWrapper, EncryptedCacheProxy, SETTING_CACHE_NOTSET
+from awx.conf.settings import (
+    SettingsWrapper, EncryptedCacheProxy, SETTING_CACHE_NOTSET, SETTING_LOCAL_CACHE_TIMEOUT,
+    SETTING_LOCAL_CACHE_MAX_AGE,
+    bump_setting_cache_generation
+)
 from awx.conf.registry import SettingsRegistry
 
 from awx.main.utils import encrypt_field, decrypt_field
@@ -404,6 +408,48 @@ def test_settings_use_cache(settings, mocker):
     getattr(settings, 'AWX_VAR')
 
 
+def test_settings_kept_in_memory(settings, mocker):
+    settings.registry.register(
+        'AWX_VAR',
+        field_class=fields.CharField,
+        category=_('System'),
+        category_slug='system'
+    )
+    settings.cache.set('AWX_VAR', 'foobar')
+    settings.cache.set('_awx_conf_preload_expires', 100)
+    assert settings.AWX_VAR == 'foobar'
+    settings.cache.set('AWX_VAR', 'changed')
+    assert settings.AWX_VAR == 'foobar'
+    stats = settings.local_cache_stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+    # The change is only picked up once the generation counter moves on
+    expired = time.time() + SETTING_LOCAL_CACHE_TIMEOUT + 1
+    with mocker.patch('awx.conf.settings.time.time', return_value=expired):
+        assert settings.AWX_VAR == 'foobar'
+    bump_setting_cache_generation(settings.cache.cache)
+    with mocker.patch('awx.conf.settings.time.time', return_value=expired + SETTING_LOCAL_CACHE_TIMEOUT + 1):
+        assert settings.AWX_VAR == 'changed'
+    assert settings.local_cache_stats()['misses'] == 2
+
+
+def test_settings_in_memory_max_age(settings, mocker):
+    settings.registry.register(
+        'AWX_VAR',
+        field_class=fields.CharField,
+        category=_('System'),
+        category_slug='system'
+    )
+    settings.cache.set('AWX_VAR', 'foobar')
+    settings.cache.set('_awx_conf_preload_expires', 100)
+    assert settings.AWX_VAR == 'foobar'
+    settings.cache.set('AWX_VAR', 'changed')
+
+    # Even without a generation change, values aren't kept forever
+    with mocker.patch('awx.conf.settings.time.time', return_value=time.time() + SETTING_LOCAL_CACHE_MAX_AGE + 1):
+        assert settings.AWX_VAR == 'changed'
+
+
 def test_settings_use_an_encrypted_cache(settings, mocker):
     settings.registry.register(
         'AWX_ENCRYPTED',
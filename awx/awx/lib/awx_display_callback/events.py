@@ -35,11 +35,12 @@ __all__ = ['event_context']
 class IsolatedFileWrite:
     '''
     Stand-in class that will write partial event data to a file as a
-    replacement for memcache when a job is running on an isolated host.
+    replacement for memcache when a job is running on an isolated host (or
+    when the file-based partial event transport is enabled).
     '''
 
-    def __init__(self):
-        self.private_data_dir = os.getenv('AWX_ISOLATED_DATA_DIR')
+    def __init__(self, private_data_dir=None):
+        self.private_data_dir = private_data_dir or os.getenv('AWX_ISOLATED_DATA_DIR')
 
     def set(self, key, value):
         # Strip off the leading memcache key identifying characters :1:ev-
@@ -65,6 +66,11 @@ class EventContext(object):
         cache_actual = os.getenv('CACHE', '127.0.0.1:11211')
         if os.getenv('AWX_ISOLATED_DATA_DIR', False):
             self.cache = IsolatedFileWrite()
+        elif os.getenv('AWX_PARTIAL_EVENT_DATA_DIR', False):
+            # Write partial event data into the job's private data dir, where
+            # it is picked up in batches as stdout is processed (see
+            # awx.main.utils.partial_events).
+            self.cache = IsolatedFileWrite(os.getenv('AWX_PARTIAL_EVENT_DATA_DIR'))
         else:
             self.cache = memcache.Client([cache_actual], debug=0)
 
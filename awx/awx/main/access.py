@@ -348,9 +348,11 @@ class BaseAccess(object):
                 if not feature_enabled('workflows'):
                     user_capabilities[display_method] = (display_method == 'delete')
                     continue
-            elif display_method == 'copy' and isinstance(obj, WorkflowJobTemplate) and obj.organization_id is None:
-                user_capabilities[display_method] = self.user.is_superuser
-                continue
+                # Only superusers can copy a workflow without an organization,
+                # whatever the prefetched organization admin check says
+                if display_method == 'copy' and isinstance(obj, WorkflowJobTemplate) and obj.organization_id is None:
+                    user_capabilities[display_method] = self.user.is_superuser
+                    continue
             elif display_method in ['start', 'schedule'] and isinstance(obj, Group):  # TODO: remove in 3.3
                 try:
                     if obj.deprecated_inventory_source and not obj.deprecated_inventory_source._can_update():
@@ -2092,7 +2094,7 @@ class ScheduleAccess(BaseAccess):
         qs = self.model.objects.all()
 
         unified_pk_qs = UnifiedJobTemplate.accessible_pk_qs(self.user, 'read_role')
-        inv_src_qs = InventorySource.objects.filter(inventory_id=Inventory._accessible_pk_qs(Inventory, self.user, 'read_role'))
+        inv_src_qs = InventorySource.objects.filter(inventory_id__in=Inventory._accessible_pk_qs(Inventory, self.user, 'read_role'))
         return qs.filter(
             Q(unified_job_template_id__in=unified_pk_qs) |
             Q(unified_job_template_id__in=inv_src_qs.values_list('pk', flat=True)))
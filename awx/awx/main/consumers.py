@@ -1,12 +1,15 @@
 import json
 import logging
+import time
 import urllib
+from collections import OrderedDict
 
 from channels import Group, channel_layers
 from channels.sessions import channel_session
 from channels.handler import AsgiRequest
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.serializers.json import DjangoJSONEncoder
 
 from django.contrib.auth.models import User
@@ -15,6 +18,25 @@ from awx.main.models.organization import AuthToken
 
 logger = logging.getLogger('awx.main.consumers')
 
+# Groups whose clients may subscribe with "batch": true to receive their
+# messages as JSON arrays, see EventEmitter.
+BATCHABLE_GROUPS = ('job_events', 'ad_hoc_command_events')
+
+# How long (in seconds) a batched subscription is remembered by each node,
+# how often emitters look it up, and how long they keep the state of a group
+# they have stopped seeing events for.
+BATCH_SUBSCRIPTION_TIMEOUT = 86400
+BATCH_SUBSCRIPTION_CHECK_INTERVAL = 1
+IDLE_GROUP_TIMEOUT = 300
+
+
+def batched_group_name(name):
+    return '{}-batched'.format(name)
+
+
+def batched_subscription_key(name):
+    return 'websocket-batched-{}'.format(name)
+
 
 def discard_groups(message):
     if 'groups' in message.channel_session:
@@ -73,6 +95,7 @@ def ws_receive(message):
     if 'groups' in data:
         discard_groups(message)
         groups = data['groups']
+        batch = bool(data.get('batch', False))
         current_groups = set(message.channel_session.pop('groups') if 'groups' in message.channel_session else [])
         for group_name,v in groups.items():
             if type(v) is list:
@@ -85,6 +108,10 @@ def ws_receive(message):
                             message.reply_channel.send({"text": json.dumps(
                                 {"error": "access denied to channel {0} for resource id {1}".format(group_name, oid)})})
                             continue
+                    if batch and group_name in BATCHABLE_GROUPS:
+                        from awx.main.tasks import handle_batched_subscription
+                        handle_batched_subscription.delay(name)
+                        name = batched_group_name(name)
                     current_groups.add(name)
                     Group(name).add(message.reply_channel)
             else:
@@ -98,3 +125,98 @@ def emit_channel_notification(group, payload):
         Group(group).send({"text": json.dumps(payload, cls=DjangoJSONEncoder)})
     except ValueError:
         logger.error("Invalid payload emitting channel {} on topic: {}".format(group, payload))
+
+
+class EventEmitter(object):
+    '''
+    Sends job and ad hoc command events to the websocket clients subscribed
+    to them one at a time, and to those subscribed with "batch": true as
+    JSON arrays.  Arrays are only sent for the groups that have had batched
+    subscribers, as recorded in the cache of every node by
+    handle_batched_subscription.
+
+    Once `coalesce` is set (by callback receiver workers, which call
+    `flush` regularly), the events for batched clients are buffered per
+    group and sent at most once per window, or as soon as
+    WEBSOCKET_EVENT_BATCH_SIZE are waiting.  Each group's window doubles
+    when its buffer fills up and halves when it holds less than a quarter
+    of that, between WEBSOCKET_EVENT_BATCH_MIN_INTERVAL and
+    WEBSOCKET_EVENT_BATCH_MAX_INTERVAL seconds.
+    '''
+
+    def __init__(self):
+        self.coalesce = False
+        self.buffers = OrderedDict()
+        self.windows = {}
+        self.subscriptions = {}
+        self.last_seen = {}
+        self.last_prune = 0
+
+    def emit(self, group, payload, now=None):
+        emit_channel_notification(group, payload)
+        now = now or time.time()
+        self.last_seen[group] = now
+        self.prune(now)
+        if not self.batched(group, now):
+            return
+        if not self.coalesce:
+            emit_channel_notification(batched_group_name(group), [payload])
+            return
+        if group not in self.buffers:
+            self.buffers[group] = (now, [])
+        self.buffers[group][1].append(payload)
+        if len(self.buffers[group][1]) >= settings.WEBSOCKET_EVENT_BATCH_SIZE:
+            self._send(group, now)
+
+    def batched(self, group, now):
+        checked_at, subscribed = self.subscriptions.get(group, (None, False))
+        if checked_at is None or now - checked_at >= BATCH_SUBSCRIPTION_CHECK_INTERVAL:
+            subscribed = bool(cache.get(batched_subscription_key(group)))
+            self.subscriptions[group] = (now, subscribed)
+        return subscribed
+
+    def prune(self, now):
+        # Forget the groups (i.e. jobs) that stopped sending events.
+        if now - self.last_prune < IDLE_GROUP_TIMEOUT:
+            return
+        self.last_prune = now
+        for group, last_seen in self.last_seen.items():
+            if now - last_seen >= IDLE_GROUP_TIMEOUT and group not in self.buffers:
+                del self.last_seen[group]
+                self.subscriptions.pop(group, None)
+                self.windows.pop(group, None)
+
+    def window(self, group):
+        return self.windows.get(group, settings.WEBSOCKET_EVENT_BATCH_MIN_INTERVAL)
+
+    def next_flush_in(self, default=1, now=None):
+        if not self.buffers:
+            return default
+        remaining = min(first_seen + self.window(group) for group, (first_seen, _) in self.buffers.items())
+        return min(max(remaining - (now or time.time()), 0.01), default)
+
+    def flush(self, now=None, drain=False):
+        now = now or time.time()
+        self.prune(now)
+        for group, (first_seen, _) in self.buffers.items():
+            if drain or now - first_seen >= self.window(group):
+                self._send(group, now)
+
+    def _send(self, group, now):
+        first_seen, payloads = self.buffers.pop(group)
+        size = settings.WEBSOCKET_EVENT_BATCH_SIZE
+        window = self.window(group)
+        if len(payloads) >= size:
+            window *= 2
+        elif len(payloads) < size / 4:
+            window /= 2
+        window = min(max(window, settings.WEBSOCKET_EVENT_BATCH_MIN_INTERVAL),
+                     settings.WEBSOCKET_EVENT_BATCH_MAX_INTERVAL)
+        if window > settings.WEBSOCKET_EVENT_BATCH_MIN_INTERVAL:
+            self.windows[group] = window
+        else:
+            self.windows.pop(group, None)
+        emit_channel_notification(batched_group_name(group), payloads)
+
+
+event_emitter = EventEmitter()
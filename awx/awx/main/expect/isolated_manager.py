@@ -16,6 +16,7 @@ from django.conf import settings
 import awx
 from awx.main.expect import run
 from awx.main.utils import OutputEventFilter
+from awx.main.utils.partial_events import FilePartialEventStore
 from awx.main.queue import CallbackQueueDispatcher
 
 logger = logging.getLogger('awx.isolated.manager')
@@ -450,20 +451,13 @@ class IsolatedManager(object):
 
         def job_event_callback(event_data):
             event_data.setdefault(event_data_key, instance.id)
-            if 'uuid' in event_data:
-                filename = '{}-partial.json'.format(event_data['uuid'])
-                partial_filename = os.path.join(private_data_dir, 'artifacts', 'job_events', filename)
-                try:
-                    with codecs.open(partial_filename, 'r', encoding='utf-8') as f:
-                        partial_event_data = json.load(f)
-                    event_data.update(partial_event_data)
-                except IOError:
-                    if event_data.get('event', '') != 'verbose':
-                        logger.error('Missing callback data for event type `{}`, uuid {}, job {}.\nevent_data: {}'.format(
-                            event_data.get('event', ''), event_data['uuid'], instance.id, event_data))
+            if 'uuid' in event_data and 'event' not in event_data:
+                logger.error('Missing callback data for event type `{}`, uuid {}, job {}.\nevent_data: {}'.format(
+                    event_data.get('event', ''), event_data['uuid'], instance.id, event_data))
             dispatcher.dispatch(event_data)
 
-        return OutputEventFilter(stdout_handle, job_event_callback)
+        return OutputEventFilter(stdout_handle, job_event_callback,
+                                 partial_event_store=FilePartialEventStore(private_data_dir))
 
     def run(self, instance, host, private_data_dir, proot_temp_dir):
         """
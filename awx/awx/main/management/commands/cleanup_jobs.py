@@ -4,17 +4,24 @@
 # Python
 import datetime
 import logging
+import os
+import time
 
 # Django
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Min
 from django.utils.timezone import now
 
 # AWX
 from awx.main.models import (
     Job, AdHocCommand, ProjectUpdate, InventoryUpdate,
-    SystemJob, WorkflowJob, Notification
+    SystemJob, WorkflowJob, Notification, JobEvent, JobHostSummary,
+    AdHocCommandEvent, Host, Project, InventorySource, UnifiedJob
 )
+from awx.main.models.unified_jobs import ACTIVE_STATES
+from awx.main.utils.event_partitions import EVENT_TIME_SLACK, is_partitioned, drop_event_partitions
+from awx.main.utils.stdout_index import get_line_index_path
 from awx.main.signals import ( # noqa
     emit_update_inventory_on_created_or_deleted,
     emit_update_inventory_computed_fields,
@@ -58,8 +65,118 @@ class Command(BaseCommand):
         parser.add_argument('--workflow-jobs', default=False,
                             action='store_true', dest='only_workflow_jobs',
                             help='Remove workflow jobs')
+        parser.add_argument('--bulk', dest='bulk', action='store_true', default=False,
+                            help='Remove oldest first in chunks, each in its own '
+                            'transaction, using set-based deletes for events and '
+                            'host summaries')
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=100, metavar='N',
+                            help='Remove N jobs/updates per chunk in bulk mode. Defaults to 100.')
+        parser.add_argument('--chunk-delay', dest='chunk_delay', type=float, default=0, metavar='SECONDS',
+                            help='Pause between chunks in bulk mode, to limit the load '
+                            'on the database. Defaults to 0.')
+
+    def bulk_cleanup(self, model, exclude_pks=(), delete_related=None,
+                     active_states=('pending', 'waiting', 'running')):
+        '''
+        Delete the objects of `model` created before the cutoff, except those
+        in `active_states` or in `exclude_pks`, oldest first in chunks of
+        --chunk-size.  Each chunk is deleted in its own transaction, after
+        `delete_related(pks)` has removed the bulk of its related rows with
+        set-based queries.
+        '''
+        name = model._meta.verbose_name_plural
+        qs = model.objects.filter(created__lt=self.cutoff).exclude(status__in=active_states)
+        if exclude_pks:
+            qs = qs.exclude(pk__in=exclude_pks)
+        total = qs.count()
+        skipped = model.objects.count() - total
+        if self.dry_run or not total:
+            return skipped, total
+
+        deleted = 0
+        begin = time.time()
+        while True:
+            if deleted and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            pks = list(qs.order_by('created', 'pk').values_list('pk', flat=True)[:self.chunk_size])
+            if not pks:
+                break
+            stdout_files = []
+            with transaction.atomic():
+                if issubclass(model, UnifiedJob):
+                    stdout_files = list(model.objects.filter(pk__in=pks).exclude(
+                        result_stdout_file='').values_list('result_stdout_file', flat=True))
+                if delete_related is not None:
+                    delete_related(pks)
+                model.objects.filter(pk__in=pks).delete()
+            for stdout_file in stdout_files:
+                for path in (stdout_file, get_line_index_path(stdout_file)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            deleted += len(pks)
+            elapsed = time.time() - begin
+            self.logger.info('%s: %d of %d deleted (%.1f per second)', name, deleted, total,
+                             deleted / elapsed if elapsed else deleted)
+        return skipped, deleted
+
+    def _delete_where_in(self, table, column, pks, subquery_table=None, subquery_column=None):
+        '''
+        Delete the rows of `table` whose `column` is in `pks`, or, given a
+        subquery table and column, whose `column` is the id of a row of
+        `subquery_table` with its `subquery_column` in `pks`.
+        '''
+        placeholders = ', '.join(['%s'] * len(pks))
+        if subquery_table:
+            condition = 'SELECT id FROM {} WHERE {} IN ({})'.format(subquery_table, subquery_column, placeholders)
+        else:
+            condition = placeholders
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE {} IN ({})'.format(table, column, condition), pks)
+            return cursor.rowcount
+
+    def delete_job_events_and_summaries(self, pks):
+        Host.objects.filter(last_job_host_summary__job__in=pks).update(last_job_host_summary=None)
+        event_hosts = JobEvent.hosts.through._meta
+        self._delete_where_in(event_hosts.db_table, JobEvent.hosts.field.m2m_column_name(), pks,
+                              JobEvent._meta.db_table, 'job_id')
+        events = self._delete_where_in(JobEvent._meta.db_table, 'job_id', pks)
+        summaries = self._delete_where_in(JobHostSummary._meta.db_table, 'job_id', pks)
+        self.logger.debug('deleted %d events and %d host summaries of jobs %s', events, summaries, pks)
+
+    def delete_ad_hoc_command_events(self, pks):
+        events = self._delete_where_in(AdHocCommandEvent._meta.db_table, 'ad_hoc_command_id', pks)
+        self.logger.debug('deleted %d events of ad hoc commands %s', events, pks)
+
+    def retire_event_partitions(self, event_model, model):
+        '''
+        When the events of `model` are partitioned by creation time, drop the
+        partitions holding only events older than both the cutoff and the
+        oldest active job, instead of deleting their rows job by job.
+        '''
+        if not is_partitioned(event_model):
+            return
+        before = self.cutoff
+        oldest_active = model.objects.filter(status__in=ACTIVE_STATES, created__lt=before).aggregate(
+            Min('created'))['created__min']
+        if oldest_active is not None:
+            before = oldest_active
+        action_text = 'would drop' if self.dry_run else 'dropped'
+        for name in drop_event_partitions(event_model, before - EVENT_TIME_SLACK, dry_run=self.dry_run):
+            self.logger.info('%s event partition %s', action_text, name)
+
+    def _current_and_last_job_pks(self, templates):
+        pks = set()
+        for current_job_id, last_job_id in templates.values_list('current_job_id', 'last_job_id'):
+            pks.update([current_job_id, last_job_id])
+        pks.discard(None)
+        return pks
 
     def cleanup_jobs(self):
+        self.retire_event_partitions(JobEvent, Job)
+        if self.bulk:
+            return self.bulk_cleanup(Job, delete_related=self.delete_job_events_and_summaries)
         #jobs_qs = Job.objects.exclude(status__in=('pending', 'running'))
         #jobs_qs = jobs_qs.filter(created__lte=self.cutoff)
         skipped, deleted = 0, 0
@@ -83,6 +200,9 @@ class Command(BaseCommand):
         return skipped, deleted
 
     def cleanup_ad_hoc_commands(self):
+        self.retire_event_partitions(AdHocCommandEvent, AdHocCommand)
+        if self.bulk:
+            return self.bulk_cleanup(AdHocCommand, delete_related=self.delete_ad_hoc_command_events)
         skipped, deleted = 0, 0
         ad_hoc_commands = AdHocCommand.objects.filter(created__lt=self.cutoff)
         for ad_hoc_command in ad_hoc_commands.iterator():
@@ -104,6 +224,9 @@ class Command(BaseCommand):
         return skipped, deleted
 
     def cleanup_project_updates(self):
+        if self.bulk:
+            return self.bulk_cleanup(ProjectUpdate, exclude_pks=self._current_and_last_job_pks(
+                Project.objects.exclude(scm_type='')))
         skipped, deleted = 0, 0
         project_updates = ProjectUpdate.objects.filter(created__lt=self.cutoff)
         for pu in project_updates.iterator():
@@ -127,6 +250,9 @@ class Command(BaseCommand):
         return skipped, deleted
 
     def cleanup_inventory_updates(self):
+        if self.bulk:
+            return self.bulk_cleanup(InventoryUpdate, exclude_pks=self._current_and_last_job_pks(
+                InventorySource.objects.exclude(source='')))
         skipped, deleted = 0, 0
         inventory_updates = InventoryUpdate.objects.filter(created__lt=self.cutoff)
         for iu in inventory_updates.iterator():
@@ -150,6 +276,8 @@ class Command(BaseCommand):
         return skipped, deleted
 
     def cleanup_management_jobs(self):
+        if self.bulk:
+            return self.bulk_cleanup(SystemJob)
         skipped, deleted = 0, 0
         system_jobs = SystemJob.objects.filter(created__lt=self.cutoff)
         for sj in system_jobs.iterator():
@@ -179,6 +307,8 @@ class Command(BaseCommand):
         self.logger.propagate = False
 
     def cleanup_workflow_jobs(self):
+        if self.bulk:
+            return self.bulk_cleanup(WorkflowJob)
         skipped, deleted = 0, 0
         workflow_jobs = WorkflowJob.objects.filter(created__lt=self.cutoff)
         for workflow_job in workflow_jobs.iterator():
@@ -200,6 +330,8 @@ class Command(BaseCommand):
         return skipped, deleted
 
     def cleanup_notifications(self):
+        if self.bulk:
+            return self.bulk_cleanup(Notification, active_states=('pending',))
         skipped, deleted = 0, 0
         notifications = Notification.objects.filter(created__lt=self.cutoff)
         for notification in notifications.iterator():
@@ -220,12 +352,16 @@ class Command(BaseCommand):
         skipped += Notification.objects.filter(created__gte=self.cutoff).count()
         return skipped, deleted
 
-    @transaction.atomic
     def handle(self, *args, **options):
         self.verbosity = int(options.get('verbosity', 1))
         self.init_logging()
         self.days = int(options.get('days', 90))
         self.dry_run = bool(options.get('dry_run', False))
+        self.bulk = bool(options.get('bulk', False))
+        self.chunk_size = int(options.get('chunk_size') or 100)
+        self.chunk_delay = float(options.get('chunk_delay') or 0)
+        if self.chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1.')
         try:
             self.cutoff = now() - datetime.timedelta(days=self.days)
         except OverflowError:
@@ -238,6 +374,14 @@ class Command(BaseCommand):
                 models_to_cleanup.add(m)
         if not models_to_cleanup:
             models_to_cleanup.update(model_names)
+        if self.bulk:
+            # Each chunk is committed on its own.
+            self.cleanup(model_names, models_to_cleanup)
+        else:
+            with transaction.atomic():
+                self.cleanup(model_names, models_to_cleanup)
+
+    def cleanup(self, model_names, models_to_cleanup):
         with disable_activity_stream(), disable_computed_fields():
             for m in model_names:
                 if m in models_to_cleanup:
@@ -246,4 +390,3 @@ class Command(BaseCommand):
                         self.logger.log(99, '%s: %d would be deleted, %d would be skipped.', m.replace('_', ' '), deleted, skipped)
                     else:
                         self.logger.log(99, '%s: %d deleted, %d skipped.', m.replace('_', ' '), deleted, skipped)
-
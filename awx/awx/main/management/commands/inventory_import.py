@@ -2,12 +2,14 @@
 # All Rights Reserved.
 
 # Python
+import contextlib
 import json
 import logging
 import os
 import re
 import subprocess
 import sys
+import tempfile
 import time
 import traceback
 import shutil
@@ -18,6 +20,7 @@ from django.core.management.base import BaseCommand, CommandError
 from django.core.exceptions import ImproperlyConfigured
 from django.db import connection, transaction
 from django.utils.encoding import smart_text
+from django.utils.timezone import now
 
 # AWX
 from awx.main.models import * # noqa
@@ -26,10 +29,11 @@ from awx.main.utils import (
     check_proot_installed,
     wrap_args_with_proot,
     build_proot_temp_dir,
-    get_licenser
+    get_licenser,
+    parse_yaml_or_json,
 )
-from awx.main.utils.mem_inventory import MemInventory, dict_to_mem_data
-from awx.main.signals import disable_activity_stream
+from awx.main.utils.mem_inventory import MemInventory, stream_to_mem_data
+from awx.main.signals import activity_stream_enabled, disable_activity_stream
 
 logger = logging.getLogger('awx.main.commands.inventory_import')
 
@@ -141,26 +145,36 @@ class AnsibleInventoryLoader(object):
 
         return wrap_args_with_proot(cmd, cwd, **kwargs)
 
-    def command_to_json(self, cmd):
-        data = {}
-        stdout, stderr = '', ''
+    def command_to_file(self, cmd):
+        '''
+        Run `cmd` and return its stdout, spooled to a temporary file rather
+        than held in memory, positioned at the start.
+        '''
         env = self.build_env()
 
         if ((self.is_custom or 'AWX_PRIVATE_DATA_DIR' in env) and
                 getattr(settings, 'AWX_PROOT_ENABLED', False)):
             cmd = self.get_proot_args(cmd, env)
 
-        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
-        stdout, stderr = proc.communicate()
+        stdout = tempfile.TemporaryFile()
+        proc = subprocess.Popen(cmd, stdout=stdout, stderr=subprocess.PIPE, env=env)
+        _, stderr = proc.communicate()
+        stdout.seek(0)
 
         if self.tmp_private_dir:
             shutil.rmtree(self.tmp_private_dir, True)
         if proc.returncode != 0 or 'file not found' in stderr:
-            raise RuntimeError('%s failed (rc=%d) with stdout:\n%s\nstderr:\n%s' % (
-                self.method, proc.returncode, stdout, stderr))
+            with contextlib.closing(stdout):
+                raise RuntimeError('%s failed (rc=%d) with stdout:\n%s\nstderr:\n%s' % (
+                    self.method, proc.returncode, stdout.read(), stderr))
 
         for line in stderr.splitlines():
             logger.error(line)
+        return stdout
+
+    def command_to_json(self, cmd):
+        with contextlib.closing(self.command_to_file(cmd)) as stdout:
+            stdout = stdout.read()
         try:
             data = json.loads(stdout)
             if not isinstance(data, dict):
@@ -174,46 +188,34 @@ class AnsibleInventoryLoader(object):
         base_args = self.get_base_args()
         logger.info('Reading Ansible inventory source: %s', self.source)
 
-        data = self.command_to_json(base_args + ['--list'])
+        inventory = MemInventory(
+            group_filter_re=self.group_filter_re, host_filter_re=self.host_filter_re)
+        with contextlib.closing(self.command_to_file(base_args + ['--list'])) as stdout:
+            logger.info('Processing JSON output...')
+            try:
+                inventory, has_hostvars = stream_to_mem_data(stdout, inventory=inventory)
+            except Exception:
+                logger.error('Failed to load JSON from %s output', self.method)
+                raise
 
         # TODO: remove after we run custom scripts through ansible-inventory
-        if self.is_custom and '_meta' not in data or 'hostvars' not in data['_meta']:
+        if not has_hostvars:
             # Invoke the executable once for each host name we've built up
             # to set their variables
-            data.setdefault('_meta', {})
-            data['_meta'].setdefault('hostvars', {})
             logger.warning('Re-calling script for hostvars individually.')
-            for group_name, group_data in data.iteritems():
-                if group_name == '_meta':
-                    continue
-
-                if isinstance(group_data, dict):
-                    group_host_list = group_data.get('hosts', [])
-                elif isinstance(group_data, list):
-                    group_host_list = group_data
+            for hostname, host in inventory.all_group.all_hosts.iteritems():
+                logger.debug('Obtaining hostvars for %s' % hostname.encode('utf-8'))
+                hostdata = self.command_to_json(
+                    base_args + ['--host', hostname.encode("utf-8")]
+                )
+                if isinstance(hostdata, dict):
+                    host.variables.update(hostdata)
                 else:
-                    logger.warning('Group data for "%s" is not a dict or list',
-                                   group_name)
-                    group_host_list = []
-
-                for hostname in group_host_list:
-                    logger.debug('Obtaining hostvars for %s' % hostname.encode('utf-8'))
-                    hostdata = self.command_to_json(
-                        base_args + ['--host', hostname.encode("utf-8")]
+                    logger.warning(
+                        'Expected dict of vars for host "%s" when '
+                        'calling with `--host`, got %s instead',
+                        hostname, str(type(hostdata))
                     )
-                    if isinstance(hostdata, dict):
-                        data['_meta']['hostvars'][hostname] = hostdata
-                    else:
-                        logger.warning(
-                            'Expected dict of vars for host "%s" when '
-                            'calling with `--host`, got %s instead',
-                            k, str(type(data))
-                        )
-
-        logger.info('Processing JSON output...')
-        inventory = MemInventory(
-            group_filter_re=self.group_filter_re, host_filter_re=self.host_filter_re)
-        inventory = dict_to_mem_data(data, inventory=inventory)
 
         return inventory
 
@@ -411,17 +413,155 @@ class Command(BaseCommand):
         # FIXME: Wait or raise error if inventory is being updated by another
         # source.
 
-    def _batch_add_m2m(self, related_manager, *objs, **kwargs):
-        key = (related_manager.instance.pk, related_manager.through._meta.db_table)
-        flush = bool(kwargs.get('flush', False))
-        if not hasattr(self, '_batch_add_m2m_cache'):
-            self._batch_add_m2m_cache = {}
-        cached_objs = self._batch_add_m2m_cache.setdefault(key, [])
-        cached_objs.extend(objs)
-        if len(cached_objs) > self._batch_size or flush:
-            if len(cached_objs):
-                related_manager.add(*cached_objs)
-            self._batch_add_m2m_cache[key] = []
+    def _batches(self, items):
+        items = list(items)
+        for offset in xrange(0, len(items), self._batch_size):
+            yield items[offset:(offset + self._batch_size)]
+
+    @contextlib.contextmanager
+    def _phase(self, name):
+        '''
+        Time one phase of load_into_database (and count its queries when
+        SQL_DEBUG is enabled), recording the result in self.phase_stats.
+        '''
+        if settings.SQL_DEBUG:
+            queries_before = len(connection.queries)
+        begin = time.time()
+        yield
+        elapsed = time.time() - begin
+        if settings.SQL_DEBUG:
+            queries = len(connection.queries) - queries_before
+            logger.warning('%s took %0.3fs and %d queries', name, elapsed, queries)
+        else:
+            queries = None
+            logger.info('%s took %0.3fs', name, elapsed)
+        self.phase_stats.append((name, elapsed, queries))
+
+    @staticmethod
+    def _parse_variables(variables):
+        return parse_yaml_or_json(variables.encode('utf-8'))
+
+    @staticmethod
+    def _m2m_through(model, attr):
+        '''
+        Return the through model of the many-to-many relation `attr` of
+        `model`, along with the names of its foreign keys to `model` and to
+        the related model.
+        '''
+        descriptor = getattr(model, attr)
+        field = descriptor.rel.field
+        source_name, target_name = field.m2m_field_name(), field.m2m_reverse_field_name()
+        if descriptor.reverse:
+            source_name, target_name = target_name, source_name
+        return descriptor.through, source_name, target_name
+
+    def _bulk_associate(self, model, attr, pairs):
+        '''
+        Add (instance pk, related pk) pairs to the many-to-many relation
+        `attr` of `model` and return the pairs that were not already present.
+        New rows are inserted straight into the through table, unless the
+        activity stream is recording this sync, in which case they are added
+        via the related managers so that the associations are logged.
+        '''
+        through, source_name, target_name = self._m2m_through(model, attr)
+        pairs = set(pairs)
+        existing = set()
+        for source_pks in self._batches(sorted(set(source_pk for source_pk, _ in pairs))):
+            existing.update(through.objects.filter(**{'%s__in' % source_name: source_pks})
+                                           .values_list(source_name, target_name))
+        new_pairs = sorted(pairs - existing)
+        if activity_stream_enabled:
+            target_pks = {}
+            for source_pk, target_pk in new_pairs:
+                target_pks.setdefault(source_pk, []).append(target_pk)
+            for source_pks in self._batches(sorted(target_pks)):
+                for instance in model.objects.filter(pk__in=source_pks):
+                    getattr(instance, attr).add(*target_pks[instance.pk])
+        else:
+            through.objects.bulk_create([
+                through(**{'%s_id' % source_name: source_pk, '%s_id' % target_name: target_pk})
+                for source_pk, target_pk in new_pairs
+            ], batch_size=self._batch_size)
+        return new_pairs
+
+    def _bulk_disassociate(self, model, attr, pairs):
+        '''
+        Remove (instance pk, related pk) pairs from the many-to-many relation
+        `attr` of `model`, deleting through table rows directly unless the
+        activity stream is recording this sync.
+        '''
+        through, source_name, target_name = self._m2m_through(model, attr)
+        target_pks = {}
+        for source_pk, target_pk in pairs:
+            target_pks.setdefault(source_pk, []).append(target_pk)
+        if activity_stream_enabled:
+            for source_pks in self._batches(sorted(target_pks)):
+                for instance in model.objects.filter(pk__in=source_pks):
+                    getattr(instance, attr).remove(*target_pks[instance.pk])
+            return
+        for source_pk in sorted(target_pks):
+            for pks in self._batches(sorted(target_pks[source_pk])):
+                through.objects.filter(**{source_name: source_pk, '%s__in' % target_name: pks}).delete()
+
+    def _bulk_create(self, queryset, objs):
+        '''
+        Insert new hosts or groups of this inventory in batches and return a
+        map of their names to primary keys.  Objects are saved one at a time
+        when the activity stream is recording this sync.
+        '''
+        created = now()
+        pk_map = {}
+        for batch in self._batches(objs):
+            if activity_stream_enabled:
+                for obj in batch:
+                    obj.save()
+            else:
+                for obj in batch:
+                    obj.created = obj.modified = created
+                queryset.model.objects.bulk_create(batch)
+            pk_map.update(queryset.filter(name__in=[obj.name for obj in batch]).values_list('name', 'pk'))
+        return pk_map
+
+    def _bulk_update(self, model, updates):
+        '''
+        Apply {pk: {field: value}} updates to rows of `model`.  On PostgreSQL
+        each batch of rows changing the same fields is written with a single
+        UPDATE; objects are saved one at a time when the activity stream is
+        recording this sync.
+        '''
+        if activity_stream_enabled:
+            for pks in self._batches(sorted(updates)):
+                for obj in model.objects.filter(pk__in=pks):
+                    for field_name, value in updates[obj.pk].items():
+                        setattr(obj, field_name, value)
+                    obj.save(update_fields=list(updates[obj.pk]))
+            return
+        modified = now()
+        if connection.vendor != 'postgresql':
+            for pk in sorted(updates):
+                model.objects.filter(pk=pk).update(modified=modified, **updates[pk])
+            return
+        pks_by_fields = {}
+        for pk, fields in updates.items():
+            pks_by_fields.setdefault(tuple(sorted(fields)), []).append(pk)
+        for field_names, all_pks in pks_by_fields.items():
+            columns = [model._meta.get_field(field_name).column for field_name in field_names]
+            for pks in self._batches(sorted(all_pks)):
+                values = []
+                params = [modified]
+                for pk in pks:
+                    values.append('({})'.format(', '.join(['%s'] * (len(columns) + 1))))
+                    params.append(pk)
+                    params.extend(updates[pk][field_name] for field_name in field_names)
+                with connection.cursor() as cursor:
+                    cursor.execute('''
+                        UPDATE {table} AS t SET modified = %s, {assignments}
+                        FROM (VALUES {values}) AS v(id, {columns})
+                        WHERE t.id = v.id
+                    '''.format(table=model._meta.db_table,
+                               assignments=', '.join('{0} = v.{0}'.format(c) for c in columns),
+                               values=', '.join(values),
+                               columns=', '.join(columns)), params)
 
     def _build_db_instance_id_map(self):
         '''
@@ -540,65 +680,54 @@ class Command(BaseCommand):
         a specific group, only clear relationships for hosts and groups that
         are beneath the inventory source group.
         '''
-        # FIXME: Optimize performance!
-        if settings.SQL_DEBUG:
-            queries_before = len(connection.queries)
-        group_group_count = 0
-        group_host_count = 0
-        db_groups = self.inventory_source.groups
-        for db_group in db_groups.all():
-            if self.inventory_source.deprecated_group_id == db_group.id:  # TODO: remove in 3.3
+        mem_groups = {}
+        for group_pk, group_name in self.inventory_source.groups.values_list('pk', 'name'):
+            if self.inventory_source.deprecated_group_id == group_pk:  # TODO: remove in 3.3
                 logger.info(
                     'Group "%s" from v1 API child group/host connections preserved',
-                    db_group.name
+                    group_name
                 )
                 continue
-            # Delete child group relationships not present in imported data.
-            db_children = db_group.children
-            db_children_name_pk_map = dict(db_children.values_list('name', 'pk'))
-            mem_children = self.all_group.all_groups[db_group.name].children
-            for mem_group in mem_children:
-                db_children_name_pk_map.pop(mem_group.name, None)
-            del_child_group_pks = list(set(db_children_name_pk_map.values()))
-            for offset in xrange(0, len(del_child_group_pks), self._batch_size):
-                child_group_pks = del_child_group_pks[offset:(offset + self._batch_size)]
-                for db_child in db_children.filter(pk__in=child_group_pks):
-                    group_group_count += 1
-                    db_group.children.remove(db_child)
-                    logger.info('Group "%s" removed from group "%s"',
-                                db_child.name, db_group.name)
-            # FIXME: Inventory source group relationships
-            # Delete group/host relationships not present in imported data.
-            db_hosts = db_group.hosts
-            del_host_pks = set(db_hosts.values_list('pk', flat=True))
-            mem_hosts = self.all_group.all_groups[db_group.name].hosts
-            all_mem_host_names = [h.name for h in mem_hosts if not h.instance_id]
-            for offset in xrange(0, len(all_mem_host_names), self._batch_size):
-                mem_host_names = all_mem_host_names[offset:(offset + self._batch_size)]
-                for db_host_pk in db_hosts.filter(name__in=mem_host_names).values_list('pk', flat=True):
-                    del_host_pks.discard(db_host_pk)
-            all_mem_instance_ids = [h.instance_id for h in mem_hosts if h.instance_id]
-            for offset in xrange(0, len(all_mem_instance_ids), self._batch_size):
-                mem_instance_ids = all_mem_instance_ids[offset:(offset + self._batch_size)]
-                for db_host_pk in db_hosts.filter(instance_id__in=mem_instance_ids).values_list('pk', flat=True):
-                    del_host_pks.discard(db_host_pk)
-            all_db_host_pks = [v for k,v in self.db_instance_id_map.items() if k in all_mem_instance_ids]
-            for db_host_pk in all_db_host_pks:
-                del_host_pks.discard(db_host_pk)
-            del_host_pks = list(del_host_pks)
-            for offset in xrange(0, len(del_host_pks), self._batch_size):
-                del_pks = del_host_pks[offset:(offset + self._batch_size)]
-                for db_host in db_hosts.filter(pk__in=del_pks):
-                    group_host_count += 1
-                    if db_host not in db_group.hosts.all():
-                        continue
-                    db_group.hosts.remove(db_host)
-                    logger.info('Host "%s" removed from group "%s"',
-                                db_host.name, db_group.name)
-        if settings.SQL_DEBUG:
-            logger.warning('group-group and group-host deletions took %d queries for %d relationships',
-                           len(connection.queries) - queries_before,
-                           group_group_count + group_host_count)
+            mem_groups[group_pk] = self.all_group.all_groups[group_name]
+
+        # Delete child group relationships not present in imported data.
+        through, parent_name, child_name = self._m2m_through(Group, 'children')
+        mem_child_names = dict((pk, set(g.name for g in mem_group.children))
+                               for pk, mem_group in mem_groups.items())
+        del_children = []
+        for group_pks in self._batches(sorted(mem_groups)):
+            children_qs = through.objects.filter(**{'%s__in' % parent_name: group_pks})
+            for group_pk, child_pk, db_child_name in children_qs.values_list(
+                    parent_name, child_name, '%s__name' % child_name):
+                if db_child_name in mem_child_names[group_pk]:
+                    continue
+                del_children.append((group_pk, child_pk))
+                logger.info('Group "%s" removed from group "%s"',
+                            db_child_name, mem_groups[group_pk].name)
+        self._bulk_disassociate(Group, 'children', del_children)
+
+        # FIXME: Inventory source group relationships
+        # Delete group/host relationships not present in imported data.
+        through, group_name, host_name = self._m2m_through(Group, 'hosts')
+        keep_host_names, keep_instance_ids, keep_host_pks = {}, {}, {}
+        for group_pk, mem_group in mem_groups.items():
+            keep_host_names[group_pk] = set(h.name for h in mem_group.hosts if not h.instance_id)
+            keep_instance_ids[group_pk] = set(h.instance_id for h in mem_group.hosts if h.instance_id)
+            keep_host_pks[group_pk] = set(v for k, v in self.db_instance_id_map.items()
+                                          if k in keep_instance_ids[group_pk])
+        del_hosts = []
+        for group_pks in self._batches(sorted(mem_groups)):
+            hosts_qs = through.objects.filter(**{'%s__in' % group_name: group_pks})
+            for group_pk, host_pk, db_host_name, db_instance_id in hosts_qs.values_list(
+                    group_name, host_name, '%s__name' % host_name, '%s__instance_id' % host_name):
+                if (db_host_name in keep_host_names[group_pk] or
+                        db_instance_id in keep_instance_ids[group_pk] or
+                        host_pk in keep_host_pks[group_pk]):
+                    continue
+                del_hosts.append((group_pk, host_pk))
+                logger.info('Host "%s" removed from group "%s"',
+                            db_host_name, mem_groups[group_pk].name)
+        self._bulk_disassociate(Group, 'hosts', del_hosts)
 
     def _update_inventory(self):
         '''
@@ -624,105 +753,89 @@ class Command(BaseCommand):
         imported data.  Associate with the inventory source group if importing
         from cloud inventory source.
         '''
-        if settings.SQL_DEBUG:
-            queries_before = len(connection.queries)
-        all_group_names = sorted(self.all_group.all_groups.keys())
-        root_group_names = set()
-        for k,v in self.all_group.all_groups.items():
-            if not v.parents:
-                root_group_names.add(k)
-            if len(v.parents) == 1 and v.parents[0].name == 'all':
-                root_group_names.add(k)
-        existing_group_names = set()
-        for offset in xrange(0, len(all_group_names), self._batch_size):
-            group_names = all_group_names[offset:(offset + self._batch_size)]
-            for group in self.inventory.groups.filter(name__in=group_names):
-                mem_group = self.all_group.all_groups[group.name]
-                db_variables = group.variables_dict
+        mem_groups = self.all_group.all_groups
+        self.group_pk_map = {}
+        updates = {}
+        for group_pk, name, variables in self.inventory.groups.values_list('pk', 'name', 'variables'):
+            mem_group = mem_groups.get(name)
+            if mem_group is None:
+                continue
+            self.group_pk_map[name] = group_pk
+            db_variables = self._parse_variables(variables)
+            if self.overwrite_vars:
+                new_variables = mem_group.variables
+            else:
+                new_variables = dict(db_variables)
+                new_variables.update(mem_group.variables)
+            if new_variables != db_variables:
+                updates[group_pk] = dict(variables=json.dumps(new_variables))
                 if self.overwrite_vars:
-                    db_variables = mem_group.variables
+                    logger.info('Group "%s" variables replaced', name)
                 else:
-                    db_variables.update(mem_group.variables)
-                if db_variables != group.variables_dict:
-                    group.variables = json.dumps(db_variables)
-                    group.save(update_fields=['variables'])
-                    if self.overwrite_vars:
-                        logger.info('Group "%s" variables replaced', group.name)
-                    else:
-                        logger.info('Group "%s" variables updated', group.name)
-                else:
-                    logger.info('Group "%s" variables unmodified', group.name)
-                existing_group_names.add(group.name)
-                self._batch_add_m2m(self.inventory_source.groups, group)
-        for group_name in all_group_names:
-            if group_name in existing_group_names:
-                continue
-            mem_group = self.all_group.all_groups[group_name]
-            group = self.inventory.groups.update_or_create(
-                name=group_name,
-                defaults={
-                    'variables':json.dumps(mem_group.variables),
-                    'description':'imported'
-                }
-            )[0]
-            logger.info('Group "%s" added', group.name)
-            self._batch_add_m2m(self.inventory_source.groups, group)
-        self._batch_add_m2m(self.inventory_source.groups, flush=True)
-        if settings.SQL_DEBUG:
-            logger.warning('group updates took %d queries for %d groups',
-                           len(connection.queries) - queries_before,
-                           len(self.all_group.all_groups))
-
-    def _update_db_host_from_mem_host(self, db_host, mem_host):
+                    logger.info('Group "%s" variables updated', name)
+            else:
+                logger.info('Group "%s" variables unmodified', name)
+        self._bulk_update(Group, updates)
+
+        new_groups = []
+        for name in sorted(set(mem_groups) - set(self.group_pk_map)):
+            new_groups.append(Group(inventory=self.inventory, name=name,
+                                    variables=json.dumps(mem_groups[name].variables),
+                                    description='imported'))
+            logger.info('Group "%s" added', name)
+        self.group_pk_map.update(self._bulk_create(self.inventory.groups, new_groups))
+
+        self._bulk_associate(InventorySource, 'groups', [
+            (self.inventory_source.pk, group_pk) for group_pk in self.group_pk_map.values()
+        ])
+
+    def _get_host_changes(self, db_host, mem_host):
+        '''
+        Return the fields that need to be updated on the database host (a
+        dict of its current values) to match the imported host.
+        '''
+        changes = {}
         # Update host variables.
-        db_variables = db_host.variables_dict
+        db_variables = self._parse_variables(db_host['variables'])
         if self.overwrite_vars:
-            db_variables = mem_host.variables
+            new_variables = mem_host.variables
         else:
-            db_variables.update(mem_host.variables)
-        update_fields = []
-        if db_variables != db_host.variables_dict:
-            db_host.variables = json.dumps(db_variables)
-            update_fields.append('variables')
+            new_variables = dict(db_variables)
+            new_variables.update(mem_host.variables)
+        if new_variables != db_variables:
+            changes['variables'] = json.dumps(new_variables)
         # Update host enabled flag.
         enabled = self._get_enabled(mem_host.variables)
-        if enabled is not None and db_host.enabled != enabled:
-            db_host.enabled = enabled
-            update_fields.append('enabled')
+        if enabled is not None and db_host['enabled'] != enabled:
+            changes['enabled'] = enabled
         # Update host name.
-        if mem_host.name != db_host.name:
-            old_name = db_host.name
-            db_host.name = mem_host.name
-            update_fields.append('name')
+        if mem_host.name != db_host['name']:
+            changes['name'] = mem_host.name
         # Update host instance_id.
         instance_id = self._get_instance_id(mem_host.variables)
-        if instance_id != db_host.instance_id:
-            old_instance_id = db_host.instance_id
-            db_host.instance_id = instance_id
-            update_fields.append('instance_id')
-        # Update host and display message(s) on what changed.
-        if update_fields:
-            db_host.save(update_fields=update_fields)
-        if 'name' in update_fields:
-            logger.info('Host renamed from "%s" to "%s"', old_name, mem_host.name)
-        if 'instance_id' in update_fields:
-            if old_instance_id:
+        if instance_id != db_host['instance_id']:
+            changes['instance_id'] = instance_id
+        # Display message(s) on what changed.
+        if 'name' in changes:
+            logger.info('Host renamed from "%s" to "%s"', db_host['name'], mem_host.name)
+        if 'instance_id' in changes:
+            if db_host['instance_id']:
                 logger.info('Host "%s" instance_id updated', mem_host.name)
             else:
                 logger.info('Host "%s" instance_id added', mem_host.name)
-        if 'variables' in update_fields:
+        if 'variables' in changes:
             if self.overwrite_vars:
                 logger.info('Host "%s" variables replaced', mem_host.name)
             else:
                 logger.info('Host "%s" variables updated', mem_host.name)
         else:
             logger.info('Host "%s" variables unmodified', mem_host.name)
-        if 'enabled' in update_fields:
+        if 'enabled' in changes:
             if enabled:
                 logger.info('Host "%s" is now enabled', mem_host.name)
             else:
                 logger.info('Host "%s" is now disabled', mem_host.name)
-        self._batch_add_m2m(self.inventory_source.hosts, db_host)
+        return changes
 
     def _create_update_hosts(self):
         '''
@@ -731,165 +844,136 @@ class Command(BaseCommand):
         imported data.  Associate with the inventory source group if importing
         from cloud inventory source.
         '''
-        if settings.SQL_DEBUG:
-            queries_before = len(connection.queries)
-        host_pks_updated = set()
-        mem_host_pk_map = {}
-        mem_host_instance_id_map = {}
-        mem_host_name_map = {}
-        mem_host_names_to_update = set(self.all_group.all_hosts.keys())
-        for k,v in self.all_group.all_hosts.iteritems():
-            mem_host_name_map[k] = v
-            instance_id = self._get_instance_id(v.variables)
-            if instance_id in self.db_instance_id_map:
-                mem_host_pk_map[self.db_instance_id_map[instance_id]] = v
-            elif instance_id:
-                mem_host_instance_id_map[instance_id] = v
-
-        # Update all existing hosts where we know the PK based on instance_id.
-        all_host_pks = sorted(mem_host_pk_map.keys())
-        for offset in xrange(0, len(all_host_pks), self._batch_size):
-            host_pks = all_host_pks[offset:(offset + self._batch_size)]
-            for db_host in self.inventory.hosts.filter( pk__in=host_pks):
-                if db_host.pk in host_pks_updated:
+        mem_hosts = self.all_group.all_hosts
+        db_hosts = {}
+        db_pk_by_instance_id = {}
+        db_pk_by_name = {}
+        for db_host in self.inventory.hosts.values('pk', 'name', 'instance_id', 'enabled', 'variables'):
+            db_hosts[db_host['pk']] = db_host
+            db_pk_by_name[db_host['name']] = db_host['pk']
+            if db_host['instance_id']:
+                db_pk_by_instance_id.setdefault(db_host['instance_id'], db_host['pk'])
+        instance_ids = dict((name, self._get_instance_id(mem_host.variables))
+                            for name, mem_host in mem_hosts.iteritems())
+
+        # Match imported hosts to existing hosts where we know the PK based on
+        # instance_id, then by instance_id, then by name.
+        self.host_pk_map = {}
+        matched_pks = set()
+        for db_pk_map, key in ((self.db_instance_id_map, instance_ids.get),
+                               (db_pk_by_instance_id, instance_ids.get),
+                               (db_pk_by_name, lambda name: name)):
+            for name in sorted(mem_hosts):
+                if name in self.host_pk_map:
                     continue
-                mem_host = mem_host_pk_map[db_host.pk]
-                self._update_db_host_from_mem_host(db_host, mem_host)
-                host_pks_updated.add(db_host.pk)
-                mem_host_names_to_update.discard(mem_host.name)
-
-        # Update all existing hosts where we know the instance_id.
-        all_instance_ids = sorted(mem_host_instance_id_map.keys())
-        for offset in xrange(0, len(all_instance_ids), self._batch_size):
-            instance_ids = all_instance_ids[offset:(offset + self._batch_size)]
-            for db_host in self.inventory.hosts.filter( instance_id__in=instance_ids):
-                if db_host.pk in host_pks_updated:
+                host_pk = db_pk_map.get(key(name))
+                if host_pk not in db_hosts or host_pk in matched_pks:
                     continue
-                mem_host = mem_host_instance_id_map[db_host.instance_id]
-                self._update_db_host_from_mem_host(db_host, mem_host)
-                host_pks_updated.add(db_host.pk)
-                mem_host_names_to_update.discard(mem_host.name)
+                self.host_pk_map[name] = host_pk
+                matched_pks.add(host_pk)
 
-        # Update all existing hosts by name.
-        all_host_names = sorted(mem_host_name_map.keys())
-        for offset in xrange(0, len(all_host_names), self._batch_size):
-            host_names = all_host_names[offset:(offset + self._batch_size)]
-            for db_host in self.inventory.hosts.filter( name__in=host_names):
-                if db_host.pk in host_pks_updated:
-                    continue
-                mem_host = mem_host_name_map[db_host.name]
-                self._update_db_host_from_mem_host(db_host, mem_host)
-                host_pks_updated.add(db_host.pk)
-                mem_host_names_to_update.discard(mem_host.name)
+        # Update all existing hosts.
+        updates = {}
+        for name, host_pk in self.host_pk_map.items():
+            changes = self._get_host_changes(db_hosts[host_pk], mem_hosts[name])
+            if changes:
+                updates[host_pk] = changes
+        self._bulk_update(Host, updates)
 
         # Create any new hosts.
-        for mem_host_name in sorted(mem_host_names_to_update):
-            mem_host = self.all_group.all_hosts[mem_host_name]
-            host_attrs = dict(variables=json.dumps(mem_host.variables),
-                              description='imported')
+        new_hosts = []
+        for name in sorted(set(mem_hosts) - set(self.host_pk_map)):
+            mem_host = mem_hosts[name]
+            db_host = Host(inventory=self.inventory, name=name,
+                           variables=json.dumps(mem_host.variables),
+                           description='imported')
             enabled = self._get_enabled(mem_host.variables)
             if enabled is not None:
-                host_attrs['enabled'] = enabled
+                db_host.enabled = enabled
             if self.instance_id_var:
-                instance_id = self._get_instance_id(mem_host.variables)
-                host_attrs['instance_id'] = instance_id
-            db_host = self.inventory.hosts.update_or_create(name=mem_host_name, defaults=host_attrs)[0]
+                db_host.instance_id = instance_ids[name]
+            new_hosts.append(db_host)
             if enabled is False:
-                logger.info('Host "%s" added (disabled)', mem_host_name)
+                logger.info('Host "%s" added (disabled)', name)
             else:
-                logger.info('Host "%s" added', mem_host_name)
-            self._batch_add_m2m(self.inventory_source.hosts, db_host)
+                logger.info('Host "%s" added', name)
+        self.host_pk_map.update(self._bulk_create(self.inventory.hosts, new_hosts))
 
-        self._batch_add_m2m(self.inventory_source.hosts, flush=True)
+        if (updates or new_hosts) and not activity_stream_enabled and settings.AWX_REBUILD_SMART_MEMBERSHIP:
+            # Host.save() would have done this for every host written above.
+            def on_commit():
+                from awx.main.tasks import update_host_smart_inventory_memberships
+                update_host_smart_inventory_memberships.delay()
+            connection.on_commit(on_commit)
 
-        if settings.SQL_DEBUG:
-            logger.warning('host updates took %d queries for %d hosts',
-                           len(connection.queries) - queries_before,
-                           len(self.all_group.all_hosts))
+        self._bulk_associate(InventorySource, 'hosts', [
+            (self.inventory_source.pk, host_pk) for host_pk in self.host_pk_map.values()
+        ])
 
     @transaction.atomic
     def _create_update_group_children(self):
         '''
         For each imported group, create all parent-child group relationships.
         '''
-        if settings.SQL_DEBUG:
-            queries_before = len(connection.queries)
-        all_group_names = sorted([k for k,v in self.all_group.all_groups.iteritems() if v.children])
-        group_group_count = 0
-        for offset in xrange(0, len(all_group_names), self._batch_size):
-            group_names = all_group_names[offset:(offset + self._batch_size)]
-            for db_group in self.inventory.groups.filter(name__in=group_names):
-                mem_group = self.all_group.all_groups[db_group.name]
-                group_group_count += len(mem_group.children)
-                all_child_names = sorted([g.name for g in mem_group.children])
-                for offset2 in xrange(0, len(all_child_names), self._batch_size):
-                    child_names = all_child_names[offset2:(offset2 + self._batch_size)]
-                    db_children_qs = self.inventory.groups.filter(name__in=child_names)
-                    for db_child in db_children_qs.filter(children__id=db_group.id):
-                        logger.info('Group "%s" already child of group "%s"', db_child.name, db_group.name)
-                    for db_child in db_children_qs.exclude(children__id=db_group.id):
-                        self._batch_add_m2m(db_group.children, db_child)
-                    logger.info('Group "%s" added as child of "%s"', db_child.name, db_group.name)
-                self._batch_add_m2m(db_group.children, flush=True)
-        if settings.SQL_DEBUG:
-            logger.warning('Group-group updates took %d queries for %d group-group relationships',
-                           len(connection.queries) - queries_before, group_group_count)
+        names = {}
+        for name, mem_group in self.all_group.all_groups.iteritems():
+            for mem_child in mem_group.children:
+                pair = (self.group_pk_map[name], self.group_pk_map[mem_child.name])
+                names[pair] = (name, mem_child.name)
+        added = set(self._bulk_associate(Group, 'children', names.keys()))
+        for pair in sorted(names, key=names.get):
+            if pair in added:
+                logger.info('Group "%s" added as child of "%s"', names[pair][1], names[pair][0])
+            else:
+                logger.info('Group "%s" already child of group "%s"', names[pair][1], names[pair][0])
 
     @transaction.atomic
     def _create_update_group_hosts(self):
         # For each host in a mem group, add it to the parent(s) to which it
         # belongs.
-        if settings.SQL_DEBUG:
-            queries_before = len(connection.queries)
-        all_group_names = sorted([k for k,v in self.all_group.all_groups.iteritems() if v.hosts])
-        group_host_count = 0
-        for offset in xrange(0, len(all_group_names), self._batch_size):
-            group_names = all_group_names[offset:(offset + self._batch_size)]
-            for db_group in self.inventory.groups.filter(name__in=group_names):
-                mem_group = self.all_group.all_groups[db_group.name]
-                group_host_count += len(mem_group.hosts)
-                all_host_names = sorted([h.name for h in mem_group.hosts if not h.instance_id])
-                for offset2 in xrange(0, len(all_host_names), self._batch_size):
-                    host_names = all_host_names[offset2:(offset2 + self._batch_size)]
-                    db_hosts_qs = self.inventory.hosts.filter(name__in=host_names)
-                    for db_host in db_hosts_qs.filter(groups__id=db_group.id):
-                        logger.info('Host "%s" already in group "%s"', db_host.name, db_group.name)
-                    for db_host in db_hosts_qs.exclude(groups__id=db_group.id):
-                        self._batch_add_m2m(db_group.hosts, db_host)
-                        logger.info('Host "%s" added to group "%s"', db_host.name, db_group.name)
-                all_instance_ids = sorted([h.instance_id for h in mem_group.hosts if h.instance_id])
-                for offset2 in xrange(0, len(all_instance_ids), self._batch_size):
-                    instance_ids = all_instance_ids[offset2:(offset2 + self._batch_size)]
-                    db_hosts_qs = self.inventory.hosts.filter(instance_id__in=instance_ids)
-                    for db_host in db_hosts_qs.filter(groups__id=db_group.id):
-                        logger.info('Host "%s" already in group "%s"', db_host.name, db_group.name)
-                    for db_host in db_hosts_qs.exclude(groups__id=db_group.id):
-                        self._batch_add_m2m(db_group.hosts, db_host)
-                        logger.info('Host "%s" added to group "%s"', db_host.name, db_group.name)
-                self._batch_add_m2m(db_group.hosts, flush=True)
-        if settings.SQL_DEBUG:
-            logger.warning('Group-host updates took %d queries for %d group-host relationships',
-                           len(connection.queries) - queries_before, group_host_count)
+        names = {}
+        for name, mem_group in self.all_group.all_groups.iteritems():
+            for mem_host in mem_group.hosts:
+                pair = (self.group_pk_map[name], self.host_pk_map[mem_host.name])
+                names[pair] = (name, mem_host.name)
+        added = set(self._bulk_associate(Group, 'hosts', names.keys()))
+        for pair in sorted(names, key=names.get):
+            if pair in added:
+                logger.info('Host "%s" added to group "%s"', names[pair][1], names[pair][0])
+            else:
+                logger.info('Host "%s" already in group "%s"', names[pair][1], names[pair][0])
 
     def load_into_database(self):
         '''
         Load inventory from in-memory groups to the database, overwriting or
-        merging as appropriate.
+        merging as appropriate.  The differences between the imported and
+        existing hosts, groups and memberships are worked out from a few bulk
+        reads and written back in batches.
         '''
         # FIXME: Attribute changes to superuser?
         # Perform __in queries in batches (mainly for unit tests using SQLite).
-        self._batch_size = 500
-        self._build_db_instance_id_map()
-        self._build_mem_instance_id_map()
+        self._batch_size = settings.AWX_INVENTORY_IMPORT_BATCH_SIZE
+        self.phase_stats = []
+        with self._phase('Building instance ID maps'):
+            self._build_db_instance_id_map()
+            self._build_mem_instance_id_map()
         if self.overwrite:
-            self._delete_hosts()
-            self._delete_groups()
-            self._delete_group_children_and_hosts()
-        self._update_inventory()
-        self._create_update_groups()
-        self._create_update_hosts()
-        self._create_update_group_children()
-        self._create_update_group_hosts()
+            with self._phase('Deleting hosts'):
+                self._delete_hosts()
+            with self._phase('Deleting groups'):
+                self._delete_groups()
+            with self._phase('Deleting group children and hosts'):
+                self._delete_group_children_and_hosts()
+        with self._phase('Updating inventory variables'):
+            self._update_inventory()
+        with self._phase('Creating/updating %d groups' % len(self.all_group.all_groups)):
+            self._create_update_groups()
+        with self._phase('Creating/updating %d hosts' % len(self.all_group.all_hosts)):
+            self._create_update_hosts()
+        with self._phase('Adding group children'):
+            self._create_update_group_children()
+        with self._phase('Adding group hosts'):
+            self._create_update_group_hosts()
 
     def check_license(self):
         license_info = get_licenser().validate()
@@ -1016,6 +1100,8 @@ class Command(BaseCommand):
                         else:
                             with disable_activity_stream():
                                 self.load_into_database()
+                        # Hosts and groups were bulk updated without signals.
+                        Inventory.bump_script_version(self.inventory.pk)
                         if settings.SQL_DEBUG:
                             queries_before2 = len(connection.queries)
                         self.inventory.update_computed_fields()
@@ -0,0 +1,45 @@
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved.
+
+# Django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+# AWX
+from awx.main.models import JobEvent, AdHocCommandEvent
+from awx.main.utils.event_partitions import (
+    MIN_SERVER_VERSION, is_partitioned, list_event_partitions,
+    partition_event_table, create_event_partitions,
+)
+
+
+class Command(BaseCommand):
+    '''
+    Management command to partition the event tables by creation time.
+    '''
+
+    help = ('Partition the job and ad hoc command event tables by creation time, so that '
+            'cleanup_jobs removes old events by dropping whole partitions. Requires '
+            'PostgreSQL 10 or later. The existing tables are locked and scanned once while '
+            'they are converted, so stop AWX services before running it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list', dest='list', action='store_true', default=False,
+                            help='List the partitions of the event tables')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql' or connection.pg_version < MIN_SERVER_VERSION:
+            raise CommandError('Partitioning the event tables requires PostgreSQL 10 or later.')
+        for model in (JobEvent, AdHocCommandEvent):
+            table = model._meta.db_table
+            if options.get('list'):
+                for name, lower, upper in list_event_partitions(model):
+                    self.stdout.write('{}\t{}\t{}'.format(name, lower or '', upper or ''))
+                continue
+            if is_partitioned(model):
+                self.stdout.write('{} is already partitioned.'.format(table))
+            else:
+                partition_event_table(model)
+                self.stdout.write('Partitioned {}.'.format(table))
+            for name in create_event_partitions(model):
+                self.stdout.write('Created partition {}.'.format(name))
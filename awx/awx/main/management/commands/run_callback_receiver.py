@@ -6,6 +6,7 @@ import logging
 import os
 import signal
 import time
+from collections import OrderedDict
 from uuid import UUID
 from multiprocessing import Process
 from multiprocessing import Queue as MPQueue
@@ -25,6 +26,11 @@ from django.core.cache import cache as django_cache
 
 # AWX
 from awx.main.models import * # noqa
+from awx.main.consumers import event_emitter
+from awx.main.utils.event_partitions import (
+    is_partitioned, extend_event_partitions, create_event_partitions,
+    is_missing_partition_error, clamp_event_times,
+)
 
 logger = logging.getLogger('awx.main.commands.run_callback_receiver')
 
@@ -43,11 +49,16 @@ class WorkerSignalHandler:
 class CallbackBrokerWorker(ConsumerMixin):
 
     MAX_RETRIES = 2
+    PARTITION_CHECK_INTERVAL = 3600
 
     def __init__(self, connection, use_workers=True):
         self.connection = connection
         self.worker_queues = []
         self.total_messages = 0
+        self.metrics_published = 0
+        self.partitions_checked = 0
+        if use_workers:
+            self.check_event_partitions()
         self.init_workers(use_workers)
 
     def init_workers(self, use_workers=True):
@@ -71,7 +82,7 @@ class CallbackBrokerWorker(ConsumerMixin):
                 w.start()
                 if settings.DEBUG:
                     logger.info('Started worker %s' % str(idx))
-                self.worker_queues.append([0, queue_actual, w])
+                self.worker_queues.append([0, queue_actual, w, 0])
         elif settings.DEBUG:
             logger.warn('Started callback receiver (no workers)')
 
@@ -79,50 +90,142 @@ class CallbackBrokerWorker(ConsumerMixin):
         signal.signal(signal.SIGTERM, shutdown_handler([p[2] for p in self.worker_queues]))
 
     def get_consumers(self, Consumer, channel):
+        # Bound the number of unacknowledged messages so that while a worker
+        # queue is full (and process_task is blocked writing to it) the broker
+        # holds on to the remaining events instead of delivering them to us.
         return [Consumer(queues=[Queue(settings.CALLBACK_QUEUE,
                                        Exchange(settings.CALLBACK_QUEUE, type='direct'),
                                        routing_key=settings.CALLBACK_QUEUE)],
                          accept=['json'],
+                         prefetch_count=settings.JOB_EVENT_PREFETCH_COUNT,
                          callbacks=[self.process_task])]
 
+    def on_iteration(self):
+        self.publish_metrics()
+        self.check_event_partitions()
+
     def process_task(self, body, message):
+        self.write_queue_worker(self.route(body), body)
+        self.total_messages += 1
+        message.ack()
+        self.publish_metrics()
+
+    def route(self, body):
+        '''
+        Pick the worker for a payload.  All of a job's events go to the same
+        worker so that they are saved (and batched) together, in order.
+        '''
+        kind, job_identifier = self.job_key(body)
+        if kind is not None:
+            try:
+                return int(job_identifier) % settings.JOB_EVENT_WORKERS
+            except (TypeError, ValueError):
+                return hash(job_identifier) % settings.JOB_EVENT_WORKERS
         if "uuid" in body and body['uuid']:
             try:
-                queue = UUID(body['uuid']).int % settings.JOB_EVENT_WORKERS
+                return UUID(body['uuid']).int % settings.JOB_EVENT_WORKERS
             except Exception:
-                queue = self.total_messages % settings.JOB_EVENT_WORKERS
-        else:
-            queue = self.total_messages % settings.JOB_EVENT_WORKERS
-        self.write_queue_worker(queue, body)
-        self.total_messages += 1
-        message.ack()
+                pass
+        return self.total_messages % settings.JOB_EVENT_WORKERS
 
     def write_queue_worker(self, preferred_queue, body):
-        queue_order = sorted(range(settings.JOB_EVENT_WORKERS), cmp=lambda x, y: -1 if x==preferred_queue else 0)
-        write_attempt_order = []
-        for queue_actual in queue_order:
+        try:
+            worker_actual = self.worker_queues[preferred_queue]
+        except (IndexError, TypeError):
+            logger.warn("Could not write payload to queue {}, there is no such worker".format(preferred_queue))
+            return None
+        waited = 0
+        while True:
             try:
-                worker_actual = self.worker_queues[queue_actual]
                 worker_actual[1].put(body, block=True, timeout=5)
                 worker_actual[0] += 1
-                return queue_actual
+                return preferred_queue
             except QueueFull:
-                pass
+                # Wait for this worker rather than handing the event to
+                # another one (which would reorder the job's events); the
+                # prefetch limit keeps the broker from sending us more.
+                if not worker_actual[2].is_alive():
+                    logger.error("Callback worker {} is not running".format(preferred_queue))
+                    break
+                waited += 5
+                logger.warn("Callback worker {} queue is full, waited {}s to write".format(preferred_queue, waited))
+                self.publish_metrics()
             except Exception:
                 import traceback
                 tb = traceback.format_exc()
                 logger.warn("Could not write to queue %s" % preferred_queue)
                 logger.warn("Detail: {}".format(tb))
-            write_attempt_order.append(preferred_queue)
-        logger.warn("Could not write payload to any queue, attempted order: {}".format(write_attempt_order))
+                break
+        worker_actual[3] += 1
+        logger.warn("Could not write payload to queue {}, {} payloads dropped".format(
+            preferred_queue, worker_actual[3]))
         return None
 
+    def get_metrics(self):
+        metrics = {'messages': self.total_messages, 'queue_depth': 0, 'dropped': 0}
+        for idx, (received, queue_actual, w, dropped) in enumerate(self.worker_queues):
+            try:
+                depth = queue_actual.qsize()
+            except NotImplementedError:
+                depth = 0
+            metrics['worker_{}_received'.format(idx)] = received
+            metrics['worker_{}_queue_depth'.format(idx)] = depth
+            metrics['worker_{}_dropped'.format(idx)] = dropped
+            metrics['queue_depth'] += depth
+            metrics['dropped'] += dropped
+        return metrics
+
+    def publish_metrics(self, now=None):
+        '''
+        Periodically store per-worker queue depth and drop counters in the
+        cache for `awx-manage stats --stat callback_receiver_<metric>`.
+        '''
+        now = now or time.time()
+        if now - self.metrics_published < settings.JOB_EVENT_METRICS_INTERVAL:
+            return
+        self.metrics_published = now
+        try:
+            django_cache.set('callback_receiver_metrics', self.get_metrics())
+        except Exception:
+            logger.exception('Failed to publish callback receiver metrics')
+
+    def check_event_partitions(self, now=None):
+        '''
+        On startup and then hourly, create the event partitions ahead of time
+        so that events still have somewhere to go if the periodic task that
+        normally creates them stops running.
+        '''
+        now = now or time.time()
+        if now - self.partitions_checked < self.PARTITION_CHECK_INTERVAL:
+            return
+        self.partitions_checked = now
+        try:
+            for model in (JobEvent, AdHocCommandEvent):
+                if is_partitioned(model):
+                    extend_event_partitions(model)
+        except Exception:
+            logger.exception('Failed to create event partitions')
+        finally:
+            # The workers do the saving; don't hold on to a connection here.
+            django_connection.close()
+
     def callback_worker(self, queue_actual, idx):
         signal_handler = WorkerSignalHandler()
+        buffered = getattr(settings, 'JOB_EVENT_BUFFERED_WRITES', False)
+        event_buffer = JobEventBuffer(settings.JOB_EVENT_BUFFER_SIZE,
+                                      settings.JOB_EVENT_BUFFER_FLUSH_INTERVAL)
+        stats = EventRateCounter(idx, settings.JOB_EVENT_STATS_INTERVAL)
+        event_emitter.coalesce = True
         while not signal_handler.kill_now:
+            timeout = event_buffer.next_flush_in(default=1) if buffered else 1
+            timeout = event_emitter.next_flush_in(default=timeout)
             try:
-                body = queue_actual.get(block=True, timeout=1)
+                body = queue_actual.get(block=True, timeout=timeout)
             except QueueEmpty:
+                if not self.flush_events(event_buffer.ready(), stats):
+                    return
+                event_emitter.flush()
+                stats.report()
                 continue
             except Exception as e:
                 logger.error("Exception on worker thread, restarting: " + str(e))
@@ -139,44 +242,210 @@ class CallbackBrokerWorker(ConsumerMixin):
                         highlight(pformat(body, width=160), PythonLexer(), Terminal256Formatter(style='friendly'))
                     ))
 
-                def _save_event_data():
-                    if 'job_id' in body:
-                        JobEvent.create_from_data(**body)
-                    elif 'ad_hoc_command_id' in body:
-                        AdHocCommandEvent.create_from_data(**body)
-
-                job_identifier = 'unknown job'
-                if 'job_id' in body:
-                    job_identifier = body['job_id']
-                elif 'ad_hoc_command_id' in body:
-                    job_identifier = body['ad_hoc_command_id']
-
-                retries = 0
-                while retries <= self.MAX_RETRIES:
-                    try:
-                        _save_event_data()
-                        break
-                    except (OperationalError, InterfaceError, InternalError) as e:
-                        if retries >= self.MAX_RETRIES:
-                            logger.exception('Worker could not re-establish database connectivity, shutting down gracefully: Job {}'.format(job_identifier))
-                            os.kill(os.getppid(), signal.SIGINT)
-                            return
-                        delay = 60 * retries
-                        logger.exception('Database Error Saving Job Event, retry #{i} in {delay} seconds:'.format(
-                            i=retries + 1,
-                            delay=delay
-                        ))
-                        django_connection.close()
-                        time.sleep(delay)
-                        retries += 1
-                    except DatabaseError as e:
-                        logger.exception('Database Error Saving Job Event for Job {}'.format(job_identifier))
-                        break
+                if buffered:
+                    event_buffer.add(self.job_key(body), body)
+                    if not self.flush_events(event_buffer.ready(), stats):
+                        return
+                else:
+                    def _save_event_data():
+                        if 'job_id' in body:
+                            self.save_events(JobEvent, [body], lambda: JobEvent.create_from_data(**body))
+                        elif 'ad_hoc_command_id' in body:
+                            self.save_events(AdHocCommandEvent, [body], lambda: AdHocCommandEvent.create_from_data(**body))
+
+                    if not self.save_with_retries(_save_event_data, self.job_key(body)[1]):
+                        return
+                    stats.count(1)
+                event_emitter.flush()
+                stats.report()
+            except Exception as exc:
+                import traceback
+                tb = traceback.format_exc()
+                logger.error('Callback Task Processor Raised Exception: %r', exc)
+                logger.error('Detail: {}'.format(tb))
+        self.flush_events(event_buffer.drain(), stats)
+        event_emitter.flush(drain=True)
+
+    def job_key(self, body):
+        if 'job_id' in body:
+            return ('job_id', body['job_id'])
+        elif 'ad_hoc_command_id' in body:
+            return ('ad_hoc_command_id', body['ad_hoc_command_id'])
+        return (None, 'unknown job')
+
+    def save_events(self, model, bodies, save):
+        '''
+        Call `save` to save callback payloads for `model`, creating the
+        missing partitions and retrying if PostgreSQL had none to put an
+        event in (e.g. it is timestamped in the future, or the partitions
+        weren't created ahead of time).  Events timestamped too far in the
+        future to create partitions for are saved as created now.
+        '''
+        try:
+            return save()
+        except DatabaseError as e:
+            if not is_missing_partition_error(e):
+                raise
+            logger.error('No partition of {} for events, creating the missing partitions: {}'.format(
+                model._meta.db_table, e
+            ))
+            create_event_partitions(model, until=clamp_event_times(bodies))
+            return save()
+
+    def flush_events(self, batches, stats):
+        '''
+        Save each (job key, payloads) batch with a single bulk insert.
+        Returns False if database connectivity could not be re-established
+        and the worker should shut down.
+        '''
+        for (kind, job_identifier), bodies in batches:
+            model = JobEvent if kind == 'job_id' else AdHocCommandEvent
+            # The payloads left to save, and whether this is a retry
+            remaining = list(bodies)
+            attempts = []
+
+            def _save_event_data():
+                if attempts:
+                    remaining[:] = self.unsaved_events(model, kind, job_identifier, remaining)
+                attempts.append(True)
+                if not remaining:
+                    return
+                try:
+                    self.save_events(model, remaining, lambda: model.bulk_create_from_data(job_identifier, remaining))
+                    del remaining[:]
+                except (OperationalError, InterfaceError, InternalError):
+                    raise
+                except DatabaseError:
+                    # Don't lose the whole batch to one bad event; save what
+                    # we can one at a time.
+                    logger.exception('Database Error bulk saving {} events for {}, retrying individually'.format(
+                        len(remaining), job_identifier
+                    ))
+                    while remaining:
+                        body = remaining[0]
+                        try:
+                            self.save_events(model, [body], lambda: model.create_from_data(**body))
+                        except (OperationalError, InterfaceError, InternalError):
+                            raise
+                        except DatabaseError:
+                            logger.exception('Database Error Saving Job Event for Job {}'.format(job_identifier))
+                        remaining.pop(0)
+
+            try:
+                if not self.save_with_retries(_save_event_data, job_identifier):
+                    return False
             except Exception as exc:
                 import traceback
                 tb = traceback.format_exc()
                 logger.error('Callback Task Processor Raised Exception: %r', exc)
                 logger.error('Detail: {}'.format(tb))
+            stats.count(len(bodies))
+        return True
+
+    def unsaved_events(self, model, kind, job_identifier, bodies):
+        '''
+        Return the payloads of `bodies` whose event hasn't been saved, so that
+        retrying a batch after losing the database connection doesn't save
+        the events that made it again.
+        '''
+        uuids = [body['uuid'] for body in bodies if body.get('uuid')]
+        if not uuids:
+            return bodies
+        saved = set(model.objects.filter(**{kind: job_identifier, 'uuid__in': uuids}).values_list('uuid', flat=True))
+        return [body for body in bodies if not body.get('uuid') or body['uuid'] not in saved]
+
+    def save_with_retries(self, save_event_data, job_identifier):
+        retries = 0
+        while retries <= self.MAX_RETRIES:
+            try:
+                save_event_data()
+                break
+            except (OperationalError, InterfaceError, InternalError) as e:
+                if retries >= self.MAX_RETRIES:
+                    logger.exception('Worker could not re-establish database connectivity, shutting down gracefully: Job {}'.format(job_identifier))
+                    os.kill(os.getppid(), signal.SIGINT)
+                    return False
+                delay = 60 * retries
+                logger.exception('Database Error Saving Job Event, retry #{i} in {delay} seconds:'.format(
+                    i=retries + 1,
+                    delay=delay
+                ))
+                django_connection.close()
+                time.sleep(delay)
+                retries += 1
+            except DatabaseError as e:
+                logger.exception('Database Error Saving Job Event for Job {}'.format(job_identifier))
+                break
+        return True
+
+
+class JobEventBuffer(object):
+    '''
+    Per-job batches of callback payloads held by a single worker.  A batch is
+    ready to be flushed once it holds `size` events, or once its oldest event
+    has waited `interval` seconds.
+    '''
+
+    def __init__(self, size, interval):
+        self.size = max(int(size), 1)
+        self.interval = interval
+        self.batches = OrderedDict()
+
+    def add(self, key, body, now=None):
+        if key not in self.batches:
+            self.batches[key] = (now or time.time(), [])
+        self.batches[key][1].append(body)
+
+    def next_flush_in(self, default=1, now=None):
+        if not self.batches:
+            return default
+        oldest = min(first_seen for first_seen, _ in self.batches.values())
+        remaining = oldest + self.interval - (now or time.time())
+        return min(max(remaining, 0.01), default)
+
+    def ready(self, now=None):
+        now = now or time.time()
+        ready = []
+        for key, (first_seen, bodies) in self.batches.items():
+            if len(bodies) >= self.size or now - first_seen >= self.interval:
+                ready.append((key, bodies))
+        for key, _ in ready:
+            del self.batches[key]
+        return ready
+
+    def drain(self):
+        batches = [(key, bodies) for key, (_, bodies) in self.batches.items()]
+        self.batches.clear()
+        return batches
+
+
+class EventRateCounter(object):
+    '''
+    Periodically logs how many events a worker has saved (and events/sec).
+    '''
+
+    def __init__(self, idx, interval):
+        self.idx = idx
+        self.interval = interval
+        self.events = 0
+        self.total = 0
+        self.started = time.time()
+
+    def count(self, n):
+        self.events += n
+        self.total += n
+
+    def report(self, now=None):
+        now = now or time.time()
+        elapsed = now - self.started
+        if elapsed < self.interval:
+            return
+        if self.events:
+            logger.info('Callback worker {} saved {} events in {:.1f}s ({:.1f} events/sec, {} total)'.format(
+                self.idx, self.events, elapsed, self.events / elapsed, self.total
+            ))
+        self.events = 0
+        self.started = now
 
 
 class Command(BaseCommand):
@@ -2,6 +2,7 @@
 # All Rights Reserved
 
 # Django
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
 
 # AWX
@@ -26,8 +27,24 @@ class Command(BaseCommand):
     def job_stats(self, state):
         return UnifiedJob.objects.filter(status=state).count()
 
+    def task_manager_stats(self, metric):
+        return (cache.get('task_manager_metrics') or {}).get(metric, '')
+
+    def callback_receiver_stats(self, metric):
+        return (cache.get('callback_receiver_metrics') or {}).get(metric, '')
+
+    def scheduler_stats(self, metric):
+        return (cache.get('scheduler_metrics') or {}).get(metric, '')
+
     def handle(self, *args, **options):
         if options['stat'].startswith("jobs_"):
             self.stdout.write(str(self.job_stats(options['stat'][5:])))
+        elif options['stat'].startswith("task_manager_"):
+            self.stdout.write(str(self.task_manager_stats(options['stat'][13:])))
+        elif options['stat'].startswith("callback_receiver_"):
+            self.stdout.write(str(self.callback_receiver_stats(options['stat'][18:])))
+        elif options['stat'].startswith("scheduler_"):
+            self.stdout.write(str(self.scheduler_stats(options['stat'][10:])))
         else:
-            self.stdout.write("Supported stats:  jobs_{state}")
+            self.stdout.write("Supported stats:  jobs_{state}, task_manager_{metric}, callback_receiver_{metric}, "
+                              "scheduler_{metric}")
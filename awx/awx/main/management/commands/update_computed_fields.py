@@ -0,0 +1,37 @@
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved
+
+from django.core.management.base import BaseCommand, CommandError
+
+from awx.main.models import Inventory
+
+
+class Command(BaseCommand):
+    """
+    Rebuild inventory computed fields (host and group counts and failure
+    flags) from scratch, repairing any drift left by incremental updates.
+    """
+
+    help = (
+        'Rebuild the computed fields of an inventory. '
+        'Specify `--inventory-id` or `--all`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inventory-id', dest='inventory_id', type=int,
+                            help='Inventory to rebuild')
+        parser.add_argument('--all', dest='all', action='store_true', default=False,
+                            help='Rebuild every inventory')
+
+    def handle(self, *args, **options):
+        if options.get('all'):
+            inventories = Inventory.objects.filter(pending_deletion=False)
+        elif options.get('inventory_id'):
+            inventories = Inventory.objects.filter(pk=options['inventory_id'])
+            if not inventories.exists():
+                raise CommandError('No inventory found with id {}'.format(options['inventory_id']))
+        else:
+            raise CommandError('Specify --inventory-id or --all.')
+        for inventory in inventories.iterator():
+            inventory.update_computed_fields(update_groups=True, update_hosts=True)
+            self.stdout.write(u'Rebuilt computed fields for inventory {} ({})'.format(inventory.pk, inventory.name))
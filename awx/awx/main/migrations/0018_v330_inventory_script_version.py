@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2017-12-14 15:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_v330_move_deprecated_stdout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='script_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Counter incremented whenever the hosts, groups or variables of this inventory change.'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2017-12-15 10:21
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_v330_inventory_script_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='schedule',
+            name='next_run',
+            field=models.DateTimeField(db_index=True, default=None, editable=False, help_text='The next time that the scheduled action will run.', null=True),
+        ),
+    ]
@@ -1,16 +1,25 @@
 # Copyright (c) 2015 Ansible, Inc.
 # All Rights Reserved.
 
+# Python
+from collections import defaultdict
+import logging
+
 # Tower
 from awx.api.versioning import reverse
 from awx.main.fields import JSONField
 
 # Django
-from django.db import models
+from django.db import connection, models
+from django.db.models.signals import post_save
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 
 __all__ = ['ActivityStream']
 
+analytics_logger = logging.getLogger('awx.analytics.activity_stream')
+
 
 class ActivityStream(models.Model):
     '''
@@ -31,7 +40,9 @@ class ActivityStream(models.Model):
 
     actor = models.ForeignKey('auth.User', null=True, on_delete=models.SET_NULL, related_name='activity_stream')
     operation = models.CharField(max_length=13, choices=OPERATION_CHOICES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Stamped when the entry is recorded, which may be well before it is
+    # written (see ACTIVITY_STREAM_WRITE_MODE).
+    timestamp = models.DateTimeField(default=now, editable=False)
     changes = models.TextField(blank=True)
 
     object_relationship_type = models.TextField(blank=True)
@@ -82,3 +93,71 @@ class ActivityStream(models.Model):
                 raise
             kwargs.pop('update_fields')
             super(ActivityStream, self).save(*args, **kwargs)
+
+    @classmethod
+    def bulk_write(cls, entries):
+        '''
+        Inserts `entries`, a list of (unsaved ActivityStream, {m2m field name:
+        set of related object ids}) pairs, with one insert for the entries and
+        one per kind of related object.  Links to objects that have been
+        deleted since their entry was recorded are skipped.
+        '''
+        if not entries:
+            return
+        if connection.vendor == 'postgresql':
+            cls.objects.bulk_create([entry for entry, links in entries])
+            # bulk_create sends no signals, and ActivityStreamMiddleware
+            # relies on post_save to fill in the actor of the entries.
+            for entry, links in entries:
+                post_save.send(sender=cls, instance=entry, created=True,
+                               update_fields=None, raw=False, using=entry._state.db)
+        else:
+            # Only PostgreSQL returns the ids of bulk created rows.
+            for entry, links in entries:
+                entry.save()
+
+        related_ids = defaultdict(set)
+        for entry, links in entries:
+            for name, ids in links.items():
+                related_ids[name].update(ids)
+        for name, ids in related_ids.items():
+            field = cls._meta.get_field(name)
+            existing_ids = set(field.related_model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+            through = field.remote_field.through
+            through.objects.bulk_create([
+                through(**{field.m2m_column_name(): entry.pk, field.m2m_reverse_name(): related_id})
+                for entry, links in entries
+                for related_id in links.get(name, ())
+                if related_id in existing_ids
+            ])
+
+    def log_to_analytics(self, actor):
+        analytics_logger.info('Activity Stream update entry for %s' % str(self.object1),
+                              extra=dict(changes=self.changes, relationship=self.object_relationship_type,
+                                         actor=actor.username, operation=self.operation,
+                                         object1=self.object1, object2=self.object2))
+
+    def to_write_dict(self, links):
+        '''
+        Returns this unsaved entry and its `links` (see `bulk_write`) as a
+        dict that can be passed to a celery task, and back with
+        `from_write_dict`.
+        '''
+        return dict(
+            operation=self.operation,
+            timestamp=self.timestamp.isoformat(),
+            changes=self.changes,
+            object_relationship_type=self.object_relationship_type,
+            object1=self.object1,
+            object2=self.object2,
+            actor_id=self.actor_id,
+            setting=self.setting,
+            links=dict((name, list(ids)) for name, ids in links.items()),
+        )
+
+    @classmethod
+    def from_write_dict(cls, data):
+        data = dict(data)
+        links = dict((name, set(ids)) for name, ids in data.pop('links').items())
+        data['timestamp'] = parse_datetime(data['timestamp'])
+        return cls(**data), links
@@ -8,10 +8,11 @@ from urlparse import urljoin
 
 # Django
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save
 from django.utils.dateparse import parse_datetime
 from django.utils.text import Truncator
-from django.utils.timezone import utc
+from django.utils.timezone import now, utc
 from django.utils.translation import ugettext_lazy as _
 from django.core.exceptions import ValidationError
 
@@ -337,10 +338,7 @@ class AdHocCommandEvent(CreatedModifiedModel):
     def __unicode__(self):
         return u'%s @ %s' % (self.get_event_display(), self.created.isoformat())
 
-    def save(self, *args, **kwargs):
-        # If update_fields has been specified, add our field names to it,
-        # if it hasn't been specified, then we're just doing a normal save.
-        update_fields = kwargs.get('update_fields', [])
+    def _update_from_event_data(self, update_fields):
         res = self.event_data.get('res', None)
         if self.event in self.FAILED_EVENTS:
             if not self.event_data.get('ignore_errors', False):
@@ -354,6 +352,12 @@ class AdHocCommandEvent(CreatedModifiedModel):
         self.host_name = self.event_data.get('host', '').strip()
         if 'host_name' not in update_fields:
             update_fields.append('host_name')
+
+    def save(self, *args, **kwargs):
+        # If update_fields has been specified, add our field names to it,
+        # if it hasn't been specified, then we're just doing a normal save.
+        update_fields = kwargs.get('update_fields', [])
+        self._update_from_event_data(update_fields)
         if not self.host_id and self.host_name:
             host_qs = self.ad_hoc_command.inventory.hosts.filter(name=self.host_name)
             try:
@@ -367,7 +371,7 @@ class AdHocCommandEvent(CreatedModifiedModel):
         super(AdHocCommandEvent, self).save(*args, **kwargs)
 
     @classmethod
-    def create_from_data(self, **kwargs):
+    def _clean_data(cls, **kwargs):
         # Convert the datetime for the ad hoc command event's creation
         # appropriately, and include a time zone for it.
         #
@@ -388,5 +392,43 @@ class AdHocCommandEvent(CreatedModifiedModel):
         for key in kwargs.keys():
             if key not in valid_keys:
                 kwargs.pop(key)
+        return kwargs
 
+    @classmethod
+    def create_from_data(self, **kwargs):
+        kwargs = AdHocCommandEvent._clean_data(**kwargs)
         return AdHocCommandEvent.objects.create(**kwargs)
+
+    @classmethod
+    def bulk_create_from_data(cls, ad_hoc_command_id, events):
+        '''
+        Save a batch of callback payloads for a single ad hoc command with one
+        INSERT; websocket emits are sent once the batch has been committed.
+        '''
+        ad_hoc_command = AdHocCommand.objects.filter(pk=ad_hoc_command_id).select_related('inventory').first()
+        if ad_hoc_command is None:
+            return []
+
+        ad_hoc_command_events = []
+        for data in events:
+            kwargs = cls._clean_data(**data)
+            kwargs.pop('ad_hoc_command_id', None)
+            event = cls(ad_hoc_command=ad_hoc_command, **kwargs)
+            event._update_from_event_data([])
+            event.created = event.created or now()
+            event.modified = now()
+            ad_hoc_command_events.append(event)
+
+        hostnames = set(e.host_name for e in ad_hoc_command_events if e.host_name)
+        if hostnames and ad_hoc_command.inventory_id:
+            host_map = dict(ad_hoc_command.inventory.hosts.filter(name__in=hostnames).values_list('name', 'id'))
+            for event in ad_hoc_command_events:
+                event.host_id = host_map.get(event.host_name, None)
+
+        with transaction.atomic():
+            ad_hoc_command_events = cls.objects.bulk_create(ad_hoc_command_events)
+
+        for event in ad_hoc_command_events:
+            post_save.send(sender=cls, instance=event, created=True,
+                           update_fields=None, raw=False, using=event._state.db)
+        return ad_hoc_command_events
@@ -3,9 +3,14 @@
 
 # Python
 import datetime
+import errno
+import glob
+import json
 import logging
 import re
 import copy
+import tempfile
+import threading
 from urlparse import urljoin
 import os.path
 
@@ -16,7 +21,7 @@ from django.utils.translation import ugettext_lazy as _
 from django.db import transaction
 from django.core.exceptions import ValidationError
 from django.utils.timezone import now
-from django.db.models import Q
+from django.db.models import F, Q
 
 # AWX
 from awx.api.versioning import reverse
@@ -43,6 +48,55 @@ __all__ = ['Inventory', 'Host', 'Group', 'InventorySource', 'InventoryUpdate',
 logger = logging.getLogger('awx.main.models.inventory')
 
 
+class ScriptVersionBumps(threading.local):
+    '''
+    Remembers which inventories have had their script_version incremented by
+    the current transaction, so that saving thousands of hosts in one
+    transaction updates the inventory row once.  Increments made inside a
+    savepoint are not remembered, since the savepoint could be rolled back
+    on its own.
+    '''
+
+    def __init__(self):
+        self.inventory_ids = set()
+        self.registration = (0, None)
+
+    def reset(self):
+        self.inventory_ids = set()
+
+    def pending(self):
+        '''
+        Return True if the current transaction has uncommitted changes to
+        the script of any inventory.
+        '''
+        if not connection.in_atomic_block:
+            return False
+        # Savepoint rollbacks only remove callbacks added within them, so
+        # unless it was removed, the reset stays where it was added until
+        # the transaction ends and the list is replaced.
+        index, registration = self.registration
+        run_on_commit = connection.run_on_commit
+        return index < len(run_on_commit) and run_on_commit[index] is registration
+
+    def bump(self, inventory_id):
+        if inventory_id is None:
+            return
+        if connection.in_atomic_block:
+            if not self.pending():
+                # Anything left over is from a transaction that was rolled back.
+                self.reset()
+                connection.on_commit(self.reset)
+                self.registration = (len(connection.run_on_commit) - 1, connection.run_on_commit[-1])
+            if inventory_id in self.inventory_ids:
+                return
+            if not connection.savepoint_ids:
+                self.inventory_ids.add(inventory_id)
+        Inventory.objects.filter(pk=inventory_id).update(script_version=F('script_version') + 1)
+
+
+script_version_bumps = ScriptVersionBumps()
+
+
 class Inventory(CommonModelNameNotUnique, ResourceMixin):
     '''
     an inventory source contains lists and hosts.
@@ -160,6 +214,11 @@ class Inventory(CommonModelNameNotUnique, ResourceMixin):
         editable=False,
         help_text=_('Flag indicating the inventory is being deleted.'),
     )
+    script_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text=_('Counter incremented whenever the hosts, groups or variables of this inventory change.'),
+    )
 
 
     def get_absolute_url(self, request=None):
@@ -278,6 +337,84 @@ class Inventory(CommonModelNameNotUnique, ResourceMixin):
 
         return data
 
+    @staticmethod
+    def bump_script_version(inventory_id):
+        '''
+        Mark the compiled scripts of the given inventory as out of date.
+        Changes that bypass model signals (queryset updates, bulk inserts)
+        must call this themselves.
+        '''
+        script_version_bumps.bump(inventory_id)
+
+    @staticmethod
+    def prune_script_cache(inventory_id, version=None):
+        '''
+        Remove the compiled scripts of an inventory for versions other than
+        `version`, or all of them if no version is given.  Newer versions go
+        too, in case the database was restored from a backup.
+        '''
+        root = getattr(settings, 'INVENTORY_SCRIPT_CACHE_ROOT', None)
+        if not root:
+            return
+        for path in glob.glob(os.path.join(root, '{}-*.json'.format(inventory_id))):
+            try:
+                path_version = int(os.path.basename(path).split('-')[1])
+            except (IndexError, ValueError):
+                continue
+            if path_version != version:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def open_script_data(self, hostvars=False, towervars=False, show_all=False):
+        '''
+        Return an open file holding the JSON output of get_script_data for the
+        current script_version of this inventory, compiling it first if no
+        job or request has done so yet.  Return None if the script can't be
+        cached, in which case callers should use get_script_data.
+        '''
+        root = getattr(settings, 'INVENTORY_SCRIPT_CACHE_ROOT', None)
+        if not root or not self.pk or self.kind == 'smart':
+            return None
+        if script_version_bumps.pending():
+            # The script would include changes that may yet be rolled back.
+            return None
+        version = Inventory.objects.filter(pk=self.pk).values_list('script_version', flat=True).first()
+        if version is None:
+            return None
+        path = os.path.join(root, '{}-{}-{:d}{:d}{:d}.json'.format(
+            self.pk, version, bool(hostvars), bool(towervars), bool(show_all)))
+        try:
+            return open(path, 'rb')
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        data = self.get_script_data(hostvars=hostvars, towervars=towervars, show_all=show_all)
+        f = None
+        try:
+            try:
+                os.makedirs(root)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            handle, tmp_path = tempfile.mkstemp(dir=root, prefix='.{}-'.format(self.pk))
+            f = os.fdopen(handle, 'w+b')
+            json.dump(data, f)
+            f.flush()
+            # Whoever renames last wins; either file holds the same script.
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            logger.exception('Could not write compiled script of inventory %s', self.pk)
+            if f is not None:
+                f.close()
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            return None
+        Inventory.prune_script_cache(self.pk, version)
+        f.seek(0)
+        return f
+
     def update_host_computed_fields(self):
         '''
         Update computed fields for all hosts in this inventory.
@@ -391,6 +528,115 @@ class Inventory(CommonModelNameNotUnique, ResourceMixin):
                 if group_updates:
                     group.save(update_fields=group_updates.keys())
 
+    def update_host_computed_fields_for(self, host_ids):
+        '''
+        Update computed fields for the given hosts in this inventory.
+        '''
+        hosts_qs = self.hosts.filter(pk__in=host_ids)
+        hosts_with_active_failures = hosts_qs.filter(last_job_host_summary__failed=True).values_list('pk', flat=True)
+        hosts_qs.filter(has_active_failures=False, pk__in=hosts_with_active_failures).update(has_active_failures=True)
+        hosts_qs.filter(has_active_failures=True).exclude(pk__in=hosts_with_active_failures).update(has_active_failures=False)
+        hosts_with_cloud_inventory = hosts_qs.filter(inventory_sources__source__in=CLOUD_INVENTORY_SOURCES).values_list('pk', flat=True)
+        hosts_qs.filter(has_inventory_sources=False, pk__in=hosts_with_cloud_inventory).update(has_inventory_sources=True)
+        hosts_qs.filter(has_inventory_sources=True).exclude(pk__in=hosts_with_cloud_inventory).update(has_inventory_sources=False)
+
+    def update_group_computed_fields_for(self, host_ids=(), group_ids=()):
+        '''
+        Update computed fields for the groups containing the given hosts or
+        groups, and all of their ancestors, in a single statement.
+        '''
+        # The affected groups are found by walking up the group tree from the
+        # changed hosts/groups; each affected group's counters are then
+        # recomputed from the closure of its descendants.  UNION (rather than
+        # UNION ALL) makes the recursive walks terminate on group cycles.
+        seeds = []
+        if group_ids:
+            seeds.append('id IN (%s)' % ','.join(str(int(pk)) for pk in group_ids))
+        if host_ids:
+            seeds.append('id IN (SELECT group_id FROM %s WHERE host_id IN (%s))' % (
+                Group.hosts.through._meta.db_table, ','.join(str(int(pk)) for pk in host_ids)))
+        if not seeds:
+            return
+        sql_params = {
+            'inventory_id': int(self.pk),
+            'seeds': ' OR '.join(seeds),
+            'groups_table': Group._meta.db_table,
+            'hosts_table': Host._meta.db_table,
+            'group_hosts_table': Group.hosts.through._meta.db_table,
+            'group_parents_table': Group.parents.through._meta.db_table,
+            'group_sources_table': Group.inventory_sources.through._meta.db_table,
+            'group_sources_column': Group.inventory_sources.field.m2m_reverse_name(),
+            'sources_table': InventorySource._meta.db_table,
+            'summaries_table': Host.last_job_host_summary.field.related_model._meta.db_table,
+            'cloud_sources': ','.join("'%s'" % source for source in CLOUD_INVENTORY_SOURCES),
+        }
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                WITH RECURSIVE affected(group_id) AS (
+                    SELECT id FROM %(groups_table)s
+                    WHERE inventory_id = %(inventory_id)d AND (%(seeds)s)
+                  UNION
+                    SELECT p.to_group_id FROM affected a
+                    JOIN %(group_parents_table)s p ON p.from_group_id = a.group_id
+                ), subtree(ancestor_id, group_id) AS (
+                    SELECT group_id, group_id FROM affected
+                  UNION
+                    SELECT s.ancestor_id, p.from_group_id FROM subtree s
+                    JOIN %(group_parents_table)s p ON p.to_group_id = s.group_id
+                ), failed_hosts(host_id) AS (
+                    SELECT h.id FROM %(hosts_table)s h
+                    JOIN %(summaries_table)s jhs ON jhs.id = h.last_job_host_summary_id
+                    WHERE h.inventory_id = %(inventory_id)d AND jhs.failed = %%s
+                ), failed_groups(group_id) AS (
+                    SELECT gh.group_id FROM %(group_hosts_table)s gh
+                    JOIN failed_hosts f ON f.host_id = gh.host_id
+                  UNION
+                    SELECT p.to_group_id FROM failed_groups f
+                    JOIN %(group_parents_table)s p ON p.from_group_id = f.group_id
+                )
+                UPDATE %(groups_table)s SET
+                    total_hosts = (
+                        SELECT COUNT(DISTINCT gh.host_id) FROM subtree s
+                        JOIN %(group_hosts_table)s gh ON gh.group_id = s.group_id
+                        JOIN %(hosts_table)s h ON h.id = gh.host_id
+                        WHERE s.ancestor_id = %(groups_table)s.id AND h.inventory_id = %(inventory_id)d
+                    ),
+                    hosts_with_active_failures = (
+                        SELECT COUNT(DISTINCT gh.host_id) FROM subtree s
+                        JOIN %(group_hosts_table)s gh ON gh.group_id = s.group_id
+                        JOIN failed_hosts f ON f.host_id = gh.host_id
+                        WHERE s.ancestor_id = %(groups_table)s.id
+                    ),
+                    has_active_failures = %(groups_table)s.id IN (SELECT group_id FROM failed_groups),
+                    total_groups = (
+                        SELECT COUNT(*) FROM subtree s
+                        WHERE s.ancestor_id = %(groups_table)s.id AND s.group_id != %(groups_table)s.id
+                    ),
+                    groups_with_active_failures = (
+                        SELECT COUNT(*) FROM subtree s
+                        JOIN failed_groups f ON f.group_id = s.group_id
+                        WHERE s.ancestor_id = %(groups_table)s.id AND s.group_id != %(groups_table)s.id
+                    ),
+                    has_inventory_sources = EXISTS (
+                        SELECT 1 FROM %(group_sources_table)s gs
+                        JOIN %(sources_table)s src ON src.id = gs.%(group_sources_column)s
+                        WHERE gs.group_id = %(groups_table)s.id AND src.source IN (%(cloud_sources)s)
+                    )
+                WHERE id IN (SELECT group_id FROM affected)
+            ''' % sql_params, [True])
+
+    def update_computed_fields_for(self, host_ids=(), group_ids=()):
+        '''
+        Update the computed fields affected by changes to the given hosts or
+        groups, rather than rebuilding them for the whole inventory.
+        '''
+        logger.debug("Going to update inventory computed fields for %d hosts, %d groups",
+                     len(host_ids), len(group_ids))
+        if host_ids:
+            self.update_host_computed_fields_for(host_ids)
+        self.update_group_computed_fields_for(host_ids, group_ids)
+        self.update_computed_fields(update_groups=False, update_hosts=False)
+
     def update_computed_fields(self, update_groups=True, update_hosts=True):
         '''
         Update model fields that are computed from database relationships.
@@ -482,7 +728,9 @@ class Inventory(CommonModelNameNotUnique, ResourceMixin):
 
     def delete(self, *args, **kwargs):
         self._update_host_smart_inventory_memeberships()
+        inventory_id = self.pk
         super(Inventory, self).delete(*args, **kwargs)
+        Inventory.prune_script_cache(inventory_id)
 
 
 class SmartInventoryMembership(BaseModel):
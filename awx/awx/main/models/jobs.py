@@ -3,6 +3,7 @@
 
 # Python
 import datetime
+import itertools
 import logging
 import time
 import json
@@ -11,15 +12,16 @@ from urlparse import urljoin
 
 # Django
 from django.conf import settings
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models.signals import post_save
 #from django.core.cache import cache
 import memcache
-from django.db.models import Q, Count
+from django.db.models import Count, OuterRef, Subquery
 from django.utils.dateparse import parse_datetime
 from dateutil import parser
 from dateutil.tz import tzutc
 from django.utils.encoding import force_text, smart_str
-from django.utils.timezone import utc
+from django.utils.timezone import now, utc
 from django.utils.translation import ugettext_lazy as _
 from django.core.exceptions import ValidationError, FieldDoesNotExist
 
@@ -41,6 +43,7 @@ from awx.main.utils import (
 from awx.main.fields import ImplicitRoleField
 from awx.main.models.mixins import ResourceMixin, SurveyJobTemplateMixin, SurveyJobMixin, TaskManagerJobMixin
 from awx.main.fields import JSONField, AskForField
+from awx.main.utils.pglock import advisory_lock
 
 from awx.main.consumers import emit_channel_notification
 
@@ -734,12 +737,21 @@ class Job(UnifiedJob, JobOptions, SurveyJobMixin, JobNotificationMixin, TaskMana
     def memcached_fact_modified_key(self, host_name):
         return '{}-{}-modified'.format(self.inventory.id, base64.b64encode(host_name.encode('utf-8')))
 
-    def _get_inventory_hosts(self, only=['name', 'ansible_facts', 'modified',]):
-        return self.inventory.hosts.only(*only)
+    def _get_inventory_hosts(self, only=['name', 'ansible_facts', 'ansible_facts_modified', 'modified',]):
+        return self.inventory.hosts.only(*only).iterator()
 
     def _get_memcache_connection(self):
         return memcache.Client([settings.CACHES['default']['LOCATION']], debug=0)
 
+    def _iter_inventory_host_batches(self, **kwargs):
+        hosts = iter(self._get_inventory_hosts(**kwargs))
+        batch_size = settings.AWX_FACT_CACHE_BATCH_SIZE
+        while True:
+            batch = list(itertools.islice(hosts, batch_size))
+            if not batch:
+                return
+            yield batch
+
     def start_job_fact_cache(self):
         if not self.inventory:
             return
@@ -748,19 +760,22 @@ class Job(UnifiedJob, JobOptions, SurveyJobMixin, JobNotificationMixin, TaskMana
 
         host_names = []
 
-        for host in self._get_inventory_hosts():
-            host_key = self.memcached_fact_host_key(host.name)
-            modified_key = self.memcached_fact_modified_key(host.name)
-
-            if cache.get(modified_key) is None:
-                if host.ansible_facts_modified:
-                    host_modified = host.ansible_facts_modified.replace(tzinfo=tzutc()).isoformat()
-                else:
-                    host_modified = datetime.datetime.now(tzutc()).isoformat()
-                cache.set(host_key, json.dumps(host.ansible_facts))
-                cache.set(modified_key, host_modified)
+        for hosts in self._iter_inventory_host_batches():
+            modified_keys = [self.memcached_fact_modified_key(host.name) for host in hosts]
+            cached = cache.get_multi(modified_keys)
+            to_cache = {}
+            for host, modified_key in zip(hosts, modified_keys):
+                if cached.get(modified_key) is None:
+                    if host.ansible_facts_modified:
+                        host_modified = host.ansible_facts_modified.replace(tzinfo=tzutc()).isoformat()
+                    else:
+                        host_modified = datetime.datetime.now(tzutc()).isoformat()
+                    to_cache[self.memcached_fact_host_key(host.name)] = json.dumps(host.ansible_facts)
+                    to_cache[modified_key] = host_modified
 
-            host_names.append(host.name)
+                host_names.append(host.name)
+            if to_cache:
+                cache.set_multi(to_cache)
 
         cache.set(self.memcached_fact_key, host_names)
 
@@ -770,39 +785,96 @@ class Job(UnifiedJob, JobOptions, SurveyJobMixin, JobNotificationMixin, TaskMana
 
         cache = self._get_memcache_connection()
 
-        hosts = self._get_inventory_hosts()
-        for host in hosts:
-            host_key = self.memcached_fact_host_key(host.name)
-            modified_key = self.memcached_fact_modified_key(host.name)
+        only = ['name', 'ansible_facts_modified']
+        for hosts in self._iter_inventory_host_batches(only=only):
+            host_keys = [self.memcached_fact_host_key(host.name) for host in hosts]
+            modified_keys = [self.memcached_fact_modified_key(host.name) for host in hosts]
+            cached_modified = cache.get_multi(modified_keys)
+
+            to_delete = []
+            changed = []
+            for host, host_key, modified_key in zip(hosts, host_keys, modified_keys):
+                modified = cached_modified.get(modified_key)
+                if modified is None:
+                    to_delete.append(host_key)
+                    continue
 
-            modified = cache.get(modified_key)
-            if modified is None:
-                cache.delete(host_key)
-                continue
+                # Save facts if cache is newer than DB
+                modified = parser.parse(modified, tzinfos=[tzutc()])
+                if not host.ansible_facts_modified or modified > host.ansible_facts_modified:
+                    changed.append((host, host_key, modified))
 
-            # Save facts if cache is newer than DB
-            modified = parser.parse(modified, tzinfos=[tzutc()])
-            if not host.ansible_facts_modified or modified > host.ansible_facts_modified:
-                ansible_facts = cache.get(host_key)
+            cached_facts = cache.get_multi([c[1] for c in changed]) if changed else {}
+            updated = []
+            for host, host_key, modified in changed:
                 try:
-                    ansible_facts = json.loads(ansible_facts)
+                    ansible_facts = json.loads(cached_facts.get(host_key))
                 except Exception:
                     ansible_facts = None
 
                 if ansible_facts is None:
-                    cache.delete(host_key)
+                    to_delete.append(host_key)
                     continue
                 host.ansible_facts = ansible_facts
                 host.ansible_facts_modified = modified
                 if 'insights' in ansible_facts and 'system_id' in ansible_facts['insights']:
                     host.insights_system_id = ansible_facts['insights']['system_id']
-                host.save()
-                system_tracking_logger.info(
-                    'New fact for inventory {} host {}'.format(
-                        smart_str(host.inventory.name), smart_str(host.name)),
-                    extra=dict(inventory_id=host.inventory.id, host_name=host.name,
-                               ansible_facts=host.ansible_facts,
-                               ansible_facts_modified=host.ansible_facts_modified.isoformat()))
+                updated.append(host)
+
+            if to_delete:
+                cache.delete_multi(to_delete)
+            if updated:
+                self._update_host_facts(updated)
+                self._log_host_facts(updated)
+
+    @staticmethod
+    def _update_host_facts(hosts):
+        '''
+        Write the ansible_facts (and insights_system_id) harvested for a batch
+        of hosts with a single UPDATE.
+        '''
+        from awx.main.models.inventory import Host
+
+        def insights_system_id(host):
+            if 'insights_system_id' in host.get_deferred_fields():
+                return None
+            return host.insights_system_id
+
+        if connection.vendor != 'postgresql':
+            for host in hosts:
+                update_fields = dict(ansible_facts=host.ansible_facts,
+                                     ansible_facts_modified=host.ansible_facts_modified)
+                if insights_system_id(host) is not None:
+                    update_fields['insights_system_id'] = insights_system_id(host)
+                Host.objects.filter(pk=host.pk).update(**update_fields)
+            return
+        values = []
+        params = []
+        for host in hosts:
+            values.append('(%s, %s, %s, %s)')
+            params.extend([host.pk, json.dumps(host.ansible_facts), host.ansible_facts_modified,
+                           insights_system_id(host)])
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                UPDATE {hosts_table} AS h SET
+                    ansible_facts = v.ansible_facts::jsonb,
+                    ansible_facts_modified = v.ansible_facts_modified::timestamptz,
+                    insights_system_id = COALESCE(v.insights_system_id, h.insights_system_id)
+                FROM (VALUES {values}) AS v(id, ansible_facts, ansible_facts_modified, insights_system_id)
+                WHERE h.id = v.id
+            '''.format(hosts_table=Host._meta.db_table, values=', '.join(values)), params)
+
+    def _log_host_facts(self, hosts):
+        if not system_tracking_logger.isEnabledFor(logging.INFO):
+            return
+        inventory_name = smart_str(self.inventory.name)
+        for host in hosts:
+            system_tracking_logger.info(
+                'New fact for inventory {} host {}'.format(
+                    inventory_name, smart_str(host.name)),
+                extra=dict(inventory_id=self.inventory.id, host_name=host.name,
+                           ansible_facts=host.ansible_facts,
+                           ansible_facts_modified=host.ansible_facts_modified.isoformat()))
 
 
 # Add on aliases for the non-related-model fields
@@ -1330,29 +1402,6 @@ class JobEvent(CreatedModifiedModel):
         JobEvent.objects.filter(uuid__in=changed_events.values_list('parent_uuid', flat=True)).update(changed=True)
         JobEvent.objects.filter(uuid__in=failed_events.values_list('parent_uuid', flat=True)).update(failed=True)
 
-    def _update_hosts(self, extra_host_pks=None):
-        # Update job event hosts m2m from host_name, propagate to parent events.
-        extra_host_pks = set(extra_host_pks or [])
-        hostnames = set()
-        if self.host_name:
-            hostnames.add(self.host_name)
-        if self.event == 'playbook_on_stats':
-            try:
-                for v in self.event_data.values():
-                    hostnames.update(v.keys())
-            except AttributeError: # In case event_data or v isn't a dict.
-                pass
-        qs = self.job.inventory.hosts.all()
-        qs = qs.filter(Q(name__in=hostnames) | Q(pk__in=extra_host_pks))
-        qs = qs.exclude(job_events__pk=self.id).only('id')
-        for host in qs:
-            self.hosts.add(host)
-        if self.parent_uuid:
-            parent = JobEvent.objects.filter(uuid=self.parent_uuid)
-            if parent.exists():
-                parent = parent[0]
-                parent._update_hosts(qs.values_list('id', flat=True))
-
     def _hostnames(self):
         hostnames = set()
         try:
@@ -1364,8 +1413,15 @@ class JobEvent(CreatedModifiedModel):
 
     def _update_host_summary_from_stats(self, hostnames):
         with ignore_inventory_computed_fields():
-            qs = self.job.inventory.hosts.filter(name__in=hostnames)
             job = self.job
+            host_map = {}
+            if job.inventory_id:
+                host_map = dict(job.inventory.hosts.filter(name__in=hostnames).values_list('name', 'id'))
+            existing_summaries = dict(
+                (summary.host_name, summary) for summary in
+                job.job_host_summaries.filter(host_name__in=hostnames)
+            )
+            summaries_to_create = []
             for host in hostnames:
                 host_stats = {}
                 for stat in ('changed', 'dark', 'failures', 'ok', 'processed', 'skipped'):
@@ -1373,20 +1429,41 @@ class JobEvent(CreatedModifiedModel):
                         host_stats[stat] = self.event_data.get(stat, {}).get(host, 0)
                     except AttributeError:  # in case event_data[stat] isn't a dict.
                         pass
-                if qs.filter(name=host).exists():
-                    host_actual = qs.get(name=host)
-                    host_summary, created = job.job_host_summaries.get_or_create(host=host_actual, host_name=host_actual.name, defaults=host_stats)
+                host_summary = existing_summaries.get(host, None)
+                if host_summary is None:
+                    host_summary = JobHostSummary(job=job, host_id=host_map.get(host, None), host_name=host, **host_stats)
+                    host_summary.failed = bool(host_summary.dark or host_summary.failures)
+                    host_summary.created = host_summary.modified = now()
+                    summaries_to_create.append(host_summary)
                 else:
-                    host_summary, created = job.job_host_summaries.get_or_create(host_name=host, defaults=host_stats)
-
-                if not created:
-                    update_fields = []
+                    update_fields = {}
                     for stat, value in host_stats.items():
                         if getattr(host_summary, stat) != value:
                             setattr(host_summary, stat, value)
-                            update_fields.append(stat)
+                            update_fields[stat] = value
                     if update_fields:
-                        host_summary.save(update_fields=update_fields)
+                        update_fields['failed'] = bool(host_summary.dark or host_summary.failures)
+                        update_fields['modified'] = now()
+                        JobHostSummary.objects.filter(pk=host_summary.pk).update(**update_fields)
+            JobHostSummary.objects.bulk_create(summaries_to_create, batch_size=500)
+
+            # Point each host at this job and its summary in a single UPDATE.
+            host_ids = host_map.values()
+            if host_ids:
+                from awx.main.models.inventory import Host
+                Host.objects.filter(pk__in=host_ids).update(
+                    last_job_id=job.id,
+                    last_job_host_summary_id=Subquery(
+                        JobHostSummary.objects.filter(job_id=job.id, host_id=OuterRef('pk')).values('pk')[:1]
+                    ),
+                )
+            return host_ids
+
+    def _update_inventory_computed_fields(self, host_ids):
+        from awx.main.tasks import queue_inventory_computed_fields_update
+        inventory_id = self.job.inventory_id
+        if inventory_id:
+            queue_inventory_computed_fields_update(inventory_id, host_ids=host_ids)
 
     def save(self, *args, **kwargs):
         # If update_fields has been specified, add our field names to it,
@@ -1412,23 +1489,74 @@ class JobEvent(CreatedModifiedModel):
         super(JobEvent, self).save(*args, **kwargs)
         # Update related objects after this event is saved.
         if not from_parent_update:
-            if getattr(settings, 'CAPTURE_JOB_EVENT_HOSTS', False):
-                self._update_hosts()
-            if self.event == 'playbook_on_stats':
-                self._update_parents_failed_and_changed()
+            self._update_related_after_save()
 
-                hostnames = self._hostnames()
-                self._update_host_summary_from_stats(hostnames)
-                self.job.inventory.update_computed_fields()
+    def _update_related_after_save(self):
+        if self.event == 'playbook_on_stats':
+            self._update_parents_failed_and_changed()
+
+            hostnames = self._hostnames()
+            host_ids = self._update_host_summary_from_stats(hostnames)
+            self._update_inventory_computed_fields(host_ids)
+            if getattr(settings, 'CAPTURE_JOB_EVENT_HOSTS', False):
+                from awx.main.tasks import update_job_event_hosts
+                job_id = self.job_id
+                connection.on_commit(lambda: update_job_event_hosts.delay(job_id))
 
-                emit_channel_notification('jobs-summary', dict(group_name='jobs', unified_job_id=self.job.id))
+            emit_channel_notification('jobs-summary', dict(group_name='jobs', unified_job_id=self.job.id))
 
     @classmethod
-    def create_from_data(self, **kwargs):
-        # Must have a job_id specified.
-        if not kwargs.get('job_id', None):
-            return
+    def update_hosts_for_job(cls, job):
+        '''
+        Associate each event of `job` with its host (every host listed, for
+        playbook_on_stats) and propagate those hosts up the chain of parent
+        events, inserting only the missing hosts m2m rows in bulk.
+        '''
+        if not job.inventory_id:
+            return 0
+        events_by_uuid = {}
+        event_hostnames = []
+        for pk, uuid, parent_uuid, host_name in cls.objects.filter(job=job).values_list(
+                'pk', 'uuid', 'parent_uuid', 'host_name').iterator():
+            events_by_uuid[uuid] = (pk, parent_uuid)
+            if host_name:
+                event_hostnames.append((pk, parent_uuid, set([host_name])))
+        for stats_event in cls.objects.filter(job=job, event='playbook_on_stats').only('pk', 'parent_uuid', 'event_data'):
+            event_hostnames.append((stats_event.pk, stats_event.parent_uuid, stats_event._hostnames()))
+
+        all_hostnames = set()
+        for event_host in event_hostnames:
+            all_hostnames.update(event_host[2])
+        if not all_hostnames:
+            return 0
+        host_map = dict(job.inventory.hosts.filter(name__in=all_hostnames).values_list('name', 'id'))
+
+        event_hosts = set()
+        for pk, parent_uuid, hostnames in event_hostnames:
+            host_ids = [host_map[name] for name in hostnames if name in host_map]
+            if not host_ids:
+                continue
+            seen = set()
+            while True:
+                event_hosts.update((pk, host_id) for host_id in host_ids)
+                if not parent_uuid or parent_uuid in seen or parent_uuid not in events_by_uuid:
+                    break
+                seen.add(parent_uuid)
+                pk, parent_uuid = events_by_uuid[parent_uuid]
+
+        through = cls.hosts.through
+        # This runs both on playbook_on_stats and after the job finishes,
+        # possibly at the same time; only one of them may insert at once.
+        with advisory_lock('job_event_hosts_%s' % job.id):
+            event_hosts -= set(through.objects.filter(jobevent__job=job).values_list('jobevent_id', 'host_id'))
+            through.objects.bulk_create(
+                [through(jobevent_id=event_pk, host_id=host_id) for event_pk, host_id in event_hosts],
+                batch_size=1000,
+            )
+        return len(event_hosts)
 
+    @classmethod
+    def _clean_data(cls, **kwargs):
         # Convert the datetime for the job event's creation appropriately,
         # and include a time zone for it.
         #
@@ -1453,12 +1581,73 @@ class JobEvent(CreatedModifiedModel):
         event_data = kwargs.get('event_data', None)
         artifact_dict = None
         if event_data:
+            # Leave the payload as is, so that it can be saved again.
+            event_data = kwargs['event_data'] = dict(event_data)
             artifact_dict = event_data.pop('artifact_data', None)
+        return kwargs, artifact_dict
+
+    @classmethod
+    def create_from_data(self, **kwargs):
+        # Must have a job_id specified.
+        if not kwargs.get('job_id', None):
+            return
+
+        kwargs, artifact_dict = JobEvent._clean_data(**kwargs)
 
         job_event = JobEvent.objects.create(**kwargs)
 
         analytics_logger.info('Job event data saved.', extra=dict(python_objects=dict(job_event=job_event)))
 
+        JobEvent._save_artifacts(kwargs['job_id'], kwargs.get('event_data', None), artifact_dict)
+
+        return job_event
+
+    @classmethod
+    def bulk_create_from_data(cls, job_id, events):
+        '''
+        Save a batch of callback payloads for a single job with one INSERT.
+
+        Model fields normally derived in `save()` are computed up front, and
+        the per-event side effects (host summaries, artifacts, websocket
+        emits) run only after the batch has been committed.
+        '''
+        job = Job.objects.filter(pk=job_id).select_related('inventory').first()
+        if job is None:
+            return []
+
+        job_events = []
+        artifacts = []
+        for data in events:
+            kwargs, artifact_dict = cls._clean_data(**data)
+            kwargs.pop('job_id', None)
+            job_event = cls(job=job, **kwargs)
+            job_event._update_from_event_data()
+            job_event.created = job_event.created or now()
+            job_event.modified = now()
+            job_events.append(job_event)
+            if artifact_dict:
+                artifacts.append((kwargs.get('event_data', None), artifact_dict))
+
+        hostnames = set(e.host_name for e in job_events if e.host_name)
+        if hostnames and job.inventory_id:
+            host_map = dict(job.inventory.hosts.filter(name__in=hostnames).values_list('name', 'id'))
+            for job_event in job_events:
+                job_event.host_id = host_map.get(job_event.host_name, None)
+
+        with transaction.atomic():
+            job_events = cls.objects.bulk_create(job_events)
+
+        for job_event in job_events:
+            job_event._update_related_after_save()
+            post_save.send(sender=cls, instance=job_event, created=True,
+                           update_fields=None, raw=False, using=job_event._state.db)
+            analytics_logger.info('Job event data saved.', extra=dict(python_objects=dict(job_event=job_event)))
+        for event_data, artifact_dict in artifacts:
+            cls._save_artifacts(job_id, event_data, artifact_dict)
+        return job_events
+
+    @classmethod
+    def _save_artifacts(cls, job_id, event_data, artifact_dict):
         # Save artifact data to parent job (if provided).
         if artifact_dict:
             if event_data and isinstance(event_data, dict):
@@ -1476,13 +1665,11 @@ class JobEvent(CreatedModifiedModel):
                 # senstive
                 # artifact_dict['_ansible_no_log'] = True
                 #
-                parent_job = Job.objects.filter(pk=kwargs['job_id']).first()
+                parent_job = Job.objects.filter(pk=job_id).first()
                 if parent_job and parent_job.artifacts != artifact_dict:
                     parent_job.artifacts = artifact_dict
                     parent_job.save(update_fields=['artifacts'])
 
-        return job_event
-
     @classmethod
     def get_startevent_queryset(cls, parent_task, starting_events, ordering=None):
         '''
@@ -11,7 +11,7 @@ from django.utils.translation import ugettext_lazy as _
 # AWX
 from awx.main.models.base import prevent_search
 from awx.main.models.rbac import (
-    Role, RoleAncestorEntry, get_roles_on_resource
+    Role, RoleAncestorEntry, cached_accessible_pks, get_roles_on_resource
 )
 from awx.main.utils import parse_yaml_or_json
 from awx.main.utils.encryption import decrypt_value, get_encryption_key, is_encrypted
@@ -42,11 +42,11 @@ class ResourceMixin(models.Model):
         return ResourceMixin._accessible_objects(cls, accessor, role_field)
 
     @classmethod
-    def accessible_pk_qs(cls, accessor, role_field):
-        return ResourceMixin._accessible_pk_qs(cls, accessor, role_field)
+    def accessible_pk_qs(cls, accessor, role_field, cached=True):
+        return ResourceMixin._accessible_pk_qs(cls, accessor, role_field, cached=cached)
 
     @staticmethod
-    def _accessible_pk_qs(cls, accessor, role_field, content_types=None):
+    def _accessible_pk_qs(cls, accessor, role_field, content_types=None, cached=True):
         if type(accessor) == User:
             ancestor_roles = accessor.roles.all()
         elif type(accessor) == Role:
@@ -57,15 +57,24 @@ class ResourceMixin(models.Model):
                                                  object_id=accessor.id)
 
         if content_types is None:
-            ct_kwarg = dict(content_type_id = ContentType.objects.get_for_model(cls).id)
+            content_types = [ContentType.objects.get_for_model(cls).id]
+            ct_kwarg = dict(content_type_id = content_types[0])
         else:
             ct_kwarg = dict(content_type_id__in = content_types)
 
-        return RoleAncestorEntry.objects.filter(
+        qs = RoleAncestorEntry.objects.filter(
             ancestor__in = ancestor_roles,
             role_field = role_field,
             **ct_kwarg
         ).values_list('object_id').distinct()
+        if cached and type(accessor) == User:
+            # A list of ids works anywhere the queryset is used as an `__in`
+            # subquery, and saves re-walking the role ancestry on every request.
+            # Callers that embed it in a larger query pass cached=False.
+            pks = cached_accessible_pks(accessor, role_field, content_types, qs)
+            if pks is not None:
+                return pks
+        return qs
 
 
     @staticmethod
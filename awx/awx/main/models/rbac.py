@@ -6,8 +6,14 @@ import logging
 import threading
 import contextlib
 import re
+import time
+from collections import defaultdict, deque
+
+import six
 
 # Django
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models, transaction, connection
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -21,6 +27,9 @@ from awx.main.models.base import * # noqa
 __all__ = [
     'Role',
     'batch_role_ancestor_rebuilding',
+    'cached_accessible_pks',
+    'compute_role_ancestors',
+    'invalidate_accessible_pk_cache',
     'get_roles_on_resource',
     'ROLE_SINGLETON_SYSTEM_ADMINISTRATOR',
     'ROLE_SINGLETON_SYSTEM_AUDITOR',
@@ -62,6 +71,59 @@ role_descriptions = {
 tls = threading.local() # thread local storage
 
 
+def split_ids_for_sqlite(role_ids):
+    '''
+    SQLlite has a 1M sql statement limit.. since the django sqllite
+    driver isn't letting us pass in the ids through the preferred
+    parameter binding system, this function exists to obey this.
+    est max 12 bytes per number, used up to 2 times in a query,
+    minus 4k of padding for the other parts of the query, leads us
+    to the magic number of 41496, or 40000 for a nice round number
+    '''
+    role_ids = list(role_ids)
+    for i in xrange(0, len(role_ids), 40000):
+        yield role_ids[i:i + 40000]
+
+
+def compute_role_ancestors(role_ids, parents, ancestors_of):
+    '''
+    Returns a dict mapping each of `role_ids` to the set of its ancestors
+    (including itself), given the parents of each of those roles and the
+    ancestors of every parent that isn't one of `role_ids`.
+
+    Role relations may contain loops, so ancestor sets are pushed down to
+    children until nothing changes; only children whose set grew are
+    revisited.  Roles are visited in the order given, so passing them in
+    top down order avoids most of the revisits.
+    '''
+    role_ids = list(role_ids)
+    ancestors = {}
+    children = defaultdict(list)
+    for role_id in role_ids:
+        ancestors[role_id] = set([role_id])
+    for role_id in role_ids:
+        for parent_id in parents.get(role_id, ()):
+            if parent_id in ancestors:
+                children[parent_id].append(role_id)
+            else:
+                ancestors[role_id].update(ancestors_of.get(parent_id, ()))
+
+    pending = deque(role_ids)
+    queued = set(role_ids)
+    while pending:
+        role_id = pending.popleft()
+        queued.discard(role_id)
+        role_ancestors = ancestors[role_id]
+        for child_id in children[role_id]:
+            child_ancestors = ancestors[child_id]
+            if not role_ancestors <= child_ancestors:
+                child_ancestors |= role_ancestors
+                if child_id not in queued:
+                    pending.append(child_id)
+                    queued.add(child_id)
+    return ancestors
+
+
 def check_singleton(func):
     '''
     check_singleton is a decorator that checks if a user given
@@ -81,12 +143,18 @@ def check_singleton(func):
 
 
 @contextlib.contextmanager
-def batch_role_ancestor_rebuilding(allow_nesting=False):
+def batch_role_ancestor_rebuilding(allow_nesting=False, in_memory=False):
     '''
     Batches the role ancestor rebuild work necessary whenever role-role
     relations change. This can result in a big speedup when performing
     any bulk manipulation.
 
+    With `in_memory`, the batched rebuild computes the new ancestry in
+    Python rather than with the layer by layer SQL sweep, which is faster
+    when many roles or deep hierarchies are affected (see
+    `Role.rebuild_role_ancestor_list`).  Nested batches use the engine chosen
+    by the outermost one, unless any of them asks for `in_memory`.
+
     WARNING: Calls to anything related to checking access/permissions
     while within the context of the batch_role_ancestor_rebuilding will
     likely not work.
@@ -99,6 +167,9 @@ def batch_role_ancestor_rebuilding(allow_nesting=False):
         if not batch_role_rebuilding:
             setattr(tls, 'additions', set())
             setattr(tls, 'removals', set())
+            setattr(tls, 'in_memory', in_memory)
+        elif in_memory:
+            setattr(tls, 'in_memory', True)
         yield
 
     finally:
@@ -107,9 +178,78 @@ def batch_role_ancestor_rebuilding(allow_nesting=False):
             additions = getattr(tls, 'additions')
             removals = getattr(tls, 'removals')
             with transaction.atomic():
-                Role.rebuild_role_ancestor_list(list(additions), list(removals))
+                Role.rebuild_role_ancestor_list(list(additions), list(removals),
+                                                in_memory=getattr(tls, 'in_memory'))
             delattr(tls, 'additions')
             delattr(tls, 'removals')
+            delattr(tls, 'in_memory')
+
+
+ACCESSIBLE_PK_CACHE_VERSION_KEY = 'rbac_accessible_pk_cache_version'
+
+
+def _new_accessible_pk_cache_version():
+    # Versions start from the clock rather than 1, so that a version evicted
+    # from the cache and recreated can't collide with one used before it.
+    cache.add(ACCESSIBLE_PK_CACHE_VERSION_KEY, int(time.time() * 1000000), None)
+    return cache.get(ACCESSIBLE_PK_CACHE_VERSION_KEY)
+
+
+def _bump_accessible_pk_cache_version():
+    try:
+        cache.incr(ACCESSIBLE_PK_CACHE_VERSION_KEY)
+    except ValueError:
+        _new_accessible_pk_cache_version()
+
+
+def _accessible_pk_cache_version_bump_pending():
+    return any(func is _bump_accessible_pk_cache_version
+               for sids, func in connection.run_on_commit)
+
+
+def invalidate_accessible_pk_cache():
+    '''
+    Discard the accessible object ids cached for every user by
+    `cached_accessible_pks`; called whenever role ancestry or membership
+    changes.  The version is bumped both now and once the surrounding
+    transaction commits, so that no other process can cache a set computed
+    from data read before the change was visible to it.
+    '''
+    _bump_accessible_pk_cache_version()
+    if connection.in_atomic_block and not _accessible_pk_cache_version_bump_pending():
+        connection.on_commit(_bump_accessible_pk_cache_version)
+
+
+def cached_accessible_pks(user, role_field, content_type_ids, queryset):
+    '''
+    Return the list of object ids selected by `queryset`, the accessible pk
+    queryset of `user` for `role_field` on `content_type_ids`, from the cache
+    shared by all processes, evaluating and caching it on a miss.
+
+    Returns None when the ids should not be cached, in which case the caller
+    should use `queryset` as a subquery instead: caching is disabled, the set
+    is too large, or roles were changed by the current transaction.
+    '''
+    timeout = getattr(settings, 'RBAC_ACCESSIBLE_PK_CACHE_TIMEOUT', 0)
+    if not timeout or _accessible_pk_cache_version_bump_pending():
+        return None
+    version = cache.get(ACCESSIBLE_PK_CACHE_VERSION_KEY) or _new_accessible_pk_cache_version()
+    if version is None:
+        return None
+    key = 'rbac_accessible_pks-{}-{}-{}-{}'.format(
+        version, user.pk, role_field,
+        '_'.join(str(ct_id) for ct_id in sorted(content_type_ids))
+    )
+    pks = cache.get(key)
+    if pks is None:
+        pks = [object_id for (object_id,) in queryset]
+        if len(pks) > getattr(settings, 'RBAC_ACCESSIBLE_PK_CACHE_MAX_SIZE', 10000):
+            # Remember that this set is too big, so it isn't fetched again.
+            pks = False
+        cache.set(key, pks, timeout)
+    if pks is False:
+        return None
+    return pks
 
 
 class Role(models.Model):
@@ -178,12 +318,15 @@ class Role(models.Model):
         return description
 
     @staticmethod
-    def rebuild_role_ancestor_list(additions, removals):
+    def rebuild_role_ancestor_list(additions, removals, in_memory=False):
         '''
         Updates our `ancestors` map to accurately reflect all of the ancestors for a role
 
         You should never need to call this. Signal handlers should be calling
         this method when the role hierachy changes automatically.
+
+        By default the ancestry is updated by the SQL sweep described below;
+        `in_memory` selects `_rebuild_role_ancestor_list_in_memory` instead.
         '''
         # The ancestry table
         # =================================================
@@ -268,6 +411,13 @@ class Role(models.Model):
             getattr(tls, 'removals').update(set(removals))
             return
 
+        invalidate_accessible_pk_cache()
+
+        if in_memory:
+            with transaction.atomic():
+                Role._rebuild_role_ancestor_list_in_memory(set(additions) | set(removals))
+            return
+
         cursor = connection.cursor()
         loop_ct = 0
 
@@ -277,17 +427,6 @@ class Role(models.Model):
             'roles_table': Role._meta.db_table,
         }
 
-        # SQLlite has a 1M sql statement limit.. since the django sqllite
-        # driver isn't letting us pass in the ids through the preferred
-        # parameter binding system, this function exists to obey this.
-        # est max 12 bytes per number, used up to 2 times in a query,
-        # minus 4k of padding for the other parts of the query, leads us
-        # to the magic number of 41496, or 40000 for a nice round number
-        def split_ids_for_sqlite(role_ids):
-            for i in xrange(0, len(role_ids), 40000):
-                yield role_ids[i:i + 40000]
-
-
         with transaction.atomic():
             while len(additions) > 0 or len(removals) > 0:
                 if loop_ct > 100:
@@ -370,6 +509,109 @@ class Role(models.Model):
                     new_removals.update([row[0] for row in cursor.fetchall()])
                 removals = list(new_removals)
 
+    @staticmethod
+    def _rebuild_role_ancestor_list_in_memory(role_ids):
+        '''
+        Rebuilds the ancestry of `role_ids` and of all of their descendents
+        by loading that part of the role graph, computing the ancestors of
+        every role in it with `compute_role_ancestors`, and writing only the
+        difference back with one bulk delete and one bulk insert (COPY on
+        PostgreSQL).  Like the SQL sweep, this trusts the stored ancestry of
+        every role outside of that part of the graph.
+        '''
+        cursor = connection.cursor()
+        sql_params = {
+            'ancestors_table': Role.ancestors.through._meta.db_table,
+            'parents_table': Role.parents.through._meta.db_table,
+            'roles_table': Role._meta.db_table,
+        }
+
+        def select(query, ids):
+            for chunk in split_ids_for_sqlite(ids):
+                sql_params['ids'] = ','.join(str(x) for x in chunk)
+                cursor.execute(query % sql_params)
+                for row in cursor.fetchall():
+                    yield row
+
+        # Find every role below the changed ones, top down
+        affected = list(role_ids)
+        seen = set(affected)
+        frontier = affected
+        while frontier:
+            children = []
+            for (child_id,) in select(
+                    'SELECT DISTINCT from_role_id FROM %(parents_table)s WHERE to_role_id IN (%(ids)s)',
+                    frontier):
+                if child_id not in seen:
+                    seen.add(child_id)
+                    children.append(child_id)
+            affected.extend(children)
+            frontier = children
+
+        role_info = dict(
+            (role_id, (role_field, content_type_id, object_id))
+            for role_id, role_field, content_type_id, object_id in select('''
+                SELECT id, role_field, COALESCE(content_type_id, 0), COALESCE(object_id, 0)
+                  FROM %(roles_table)s WHERE id IN (%(ids)s)
+            ''', affected)
+        )
+        # Roles that have since been deleted take their ancestry with them
+        affected = [role_id for role_id in affected if role_id in role_info]
+
+        parents = defaultdict(list)
+        for role_id, parent_id in select(
+                'SELECT from_role_id, to_role_id FROM %(parents_table)s WHERE from_role_id IN (%(ids)s)',
+                affected):
+            parents[role_id].append(parent_id)
+
+        external_parents = set(
+            parent_id for role_parents in parents.values() for parent_id in role_parents
+        ).difference(role_info)
+        ancestors_of = defaultdict(list)
+        for role_id, ancestor_id in select(
+                'SELECT descendent_id, ancestor_id FROM %(ancestors_table)s WHERE descendent_id IN (%(ids)s)',
+                external_parents):
+            ancestors_of[role_id].append(ancestor_id)
+
+        ancestors = compute_role_ancestors(affected, parents, ancestors_of)
+
+        stale_ids = []
+        for entry_id, role_id, ancestor_id in select(
+                'SELECT id, descendent_id, ancestor_id FROM %(ancestors_table)s WHERE descendent_id IN (%(ids)s)',
+                affected):
+            role_ancestors = ancestors[role_id]
+            if ancestor_id in role_ancestors:
+                # Already stored, leaving only the missing entries in the set
+                role_ancestors.discard(ancestor_id)
+            else:
+                stale_ids.append(entry_id)
+
+        for ids in split_ids_for_sqlite(stale_ids):
+            sql_params['ids'] = ','.join(str(x) for x in ids)
+            cursor.execute('DELETE FROM %(ancestors_table)s WHERE id IN (%(ids)s)' % sql_params)
+
+        new_entries = [
+            (role_id, ancestor_id) + role_info[role_id]
+            for role_id, missing_ancestors in ancestors.items()
+            for ancestor_id in missing_ancestors
+        ]
+        if not new_entries:
+            return
+        if connection.vendor == 'postgresql':
+            cursor.copy_from(
+                six.StringIO(u''.join(
+                    u'{}\t{}\t{}\t{}\t{}\n'.format(role_id, ancestor_id, role_field, content_type_id, object_id)
+                    for role_id, ancestor_id, role_field, content_type_id, object_id in new_entries
+                )),
+                sql_params['ancestors_table'],
+                columns=('descendent_id', 'ancestor_id', 'role_field', 'content_type_id', 'object_id'),
+            )
+        else:
+            RoleAncestorEntry.objects.bulk_create([
+                RoleAncestorEntry(descendent_id=role_id, ancestor_id=ancestor_id, role_field=role_field,
+                                  content_type_id=content_type_id, object_id=object_id)
+                for role_id, ancestor_id, role_field, content_type_id, object_id in new_entries
+            ], batch_size=1000)
 
     @staticmethod
     def visible_roles(user):
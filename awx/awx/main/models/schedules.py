@@ -8,6 +8,7 @@ import dateutil.rrule
 
 # Django
 from django.db import models
+from django.db.models import Case, Value, When
 from django.db.models.query import QuerySet
 from django.utils.timezone import now, make_aware, get_default_timezone
 from django.utils.translation import ugettext_lazy as _
@@ -23,6 +24,42 @@ logger = logging.getLogger('awx.main.models.schedule')
 
 __all__ = ['Schedule']
 
+# Parsed recurrence rules are kept per process, up to this many distinct rules.
+RRULE_CACHE_SIZE = 10000
+
+# Number of distinct next run times set by each UPDATE of update_next_runs().
+NEXT_RUN_UPDATE_BATCH_SIZE = 100
+
+_rrule_cache = {}
+
+
+def parse_rrule(rrule):
+    '''
+    Return the recurrence set defined by the iCal `rrule` string with its
+    first and last occurrences (None when there are none, or no end), parsing
+    it and expanding counted recurrences only once per process.
+    '''
+    try:
+        return _rrule_cache[rrule]
+    except KeyError:
+        pass
+    future_rs = dateutil.rrule.rrulestr(rrule, forceset=True)
+    try:
+        dtstart = future_rs[0]
+    except IndexError:
+        dtstart = None
+    dtend = None
+    if 'until' in rrule.lower():
+        match_until = re.match(".*?(UNTIL\=[0-9]+T[0-9]+Z)", rrule)
+        until_date = match_until.groups()[0].split("=")[1]
+        dtend = make_aware(datetime.datetime.strptime(until_date, "%Y%m%dT%H%M%SZ"), get_default_timezone())
+    if 'count' in rrule.lower():
+        dtend = future_rs[-1]
+    if len(_rrule_cache) >= RRULE_CACHE_SIZE:
+        _rrule_cache.clear()
+    _rrule_cache[rrule] = (future_rs, dtstart, dtend)
+    return _rrule_cache[rrule]
+
 
 class ScheduleFilterMethods(object):
 
@@ -40,7 +77,39 @@ class ScheduleFilterMethods(object):
 
 
 class ScheduleQuerySet(ScheduleFilterMethods, QuerySet):
-    pass
+
+    def update_next_runs(self, when=None):
+        '''
+        Move the next run of these schedules to their first occurrence after
+        `when` (now by default) with a few bulk UPDATEs instead of saving each
+        schedule, then update the computed fields of each of their templates
+        once.  Returns the ids of the schedules whose next run changed.
+        '''
+        when = when or now()
+        changed = {}
+        template_ids = set()
+        for pk, rrule, next_run, template_id in self.values_list('pk', 'rrule', 'next_run',
+                                                                 'unified_job_template_id'):
+            new_next_run = parse_rrule(rrule)[0].after(when)
+            if new_next_run != next_run:
+                changed.setdefault(new_next_run, []).append(pk)
+                template_ids.add(template_id)
+
+        batches = changed.items()
+        for i in range(0, len(batches), NEXT_RUN_UPDATE_BATCH_SIZE):
+            batch = batches[i:i + NEXT_RUN_UPDATE_BATCH_SIZE]
+            self.model.objects.filter(pk__in=[pk for next_run, pks in batch for pk in pks]).update(
+                next_run=Case(*[When(pk__in=pks, then=Value(next_run)) for next_run, pks in batch],
+                              output_field=models.DateTimeField()))
+
+        changed_ids = sorted(pk for pks in changed.values() for pk in pks)
+        for pk in changed_ids:
+            emit_channel_notification('schedules-changed', dict(id=pk, group_name='schedules'))
+        UnifiedJobTemplate = self.model._meta.get_field('unified_job_template').related_model
+        with ignore_inventory_computed_fields():
+            for template in UnifiedJobTemplate.objects.filter(pk__in=template_ids):
+                template.update_computed_fields()
+        return changed_ids
 
 
 class ScheduleManager(ScheduleFilterMethods, models.Manager):
@@ -88,6 +157,7 @@ class Schedule(CommonModel, LaunchTimeConfig):
         null=True,
         default=None,
         editable=False,
+        db_index=True,
         help_text=_("The next time that the scheduled action will run.")
     )
 
@@ -140,21 +210,8 @@ class Schedule(CommonModel, LaunchTimeConfig):
         return job_kwargs
 
     def update_computed_fields(self):
-        future_rs = dateutil.rrule.rrulestr(self.rrule, forceset=True)
-        next_run_actual = future_rs.after(now())
-
-        self.next_run = next_run_actual
-        try:
-            self.dtstart = future_rs[0]
-        except IndexError:
-            self.dtstart = None
-        self.dtend = None
-        if 'until' in self.rrule.lower():
-            match_until = re.match(".*?(UNTIL\=[0-9]+T[0-9]+Z)", self.rrule)
-            until_date = match_until.groups()[0].split("=")[1]
-            self.dtend = make_aware(datetime.datetime.strptime(until_date, "%Y%m%dT%H%M%SZ"), get_default_timezone())
-        if 'count' in self.rrule.lower():
-            self.dtend = future_rs[-1]
+        future_rs, self.dtstart, self.dtend = parse_rrule(self.rrule)
+        self.next_run = future_rs.after(now())
         emit_channel_notification('schedules-changed', dict(id=self.id, group_name='schedules'))
         with ignore_inventory_computed_fields():
             self.unified_job_template.update_computed_fields()
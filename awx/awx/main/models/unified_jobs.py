@@ -38,6 +38,7 @@ from awx.main.utils import (
     copy_model_by_class, copy_m2m_relationships,
     get_type_for_model, parse_yaml_or_json
 )
+from awx.main.utils.stdout_index import get_line_index_path, StdoutLineReader
 from awx.main.redact import UriCleaner, REPLACE_STR
 from awx.main.consumers import emit_channel_notification
 from awx.main.fields import JSONField, AskForField
@@ -194,7 +195,7 @@ class UnifiedJobTemplate(PolymorphicModel, CommonModelNameNotUnique, Notificatio
         return [ct.id for ct in ct_dict.values()]
 
     @classmethod
-    def accessible_pk_qs(cls, accessor, role_field):
+    def accessible_pk_qs(cls, accessor, role_field, cached=True):
         '''
         A re-implementation of accessible pk queryset for the "normal" unified JTs.
         Does not return inventory sources or system JTs, these should
@@ -202,9 +203,9 @@ class UnifiedJobTemplate(PolymorphicModel, CommonModelNameNotUnique, Notificatio
         '''
         # do not use this if in a subclass
         if cls != UnifiedJobTemplate:
-            return super(UnifiedJobTemplate, cls).accessible_pk_qs(accessor, role_field)
+            return super(UnifiedJobTemplate, cls).accessible_pk_qs(accessor, role_field, cached=cached)
         return ResourceMixin._accessible_pk_qs(
-            cls, accessor, role_field, content_types=cls._submodels_with_roles())
+            cls, accessor, role_field, content_types=cls._submodels_with_roles(), cached=cached)
 
     def _perform_unique_checks(self, unique_checks):
         # Handle the list of unique fields returned above. Replace with an
@@ -824,10 +825,11 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
 
     def delete(self):
         if self.result_stdout_file != "":
-            try:
-                os.remove(self.result_stdout_file)
-            except Exception:
-                pass
+            for path in (self.result_stdout_file, get_line_index_path(self.result_stdout_file)):
+                try:
+                    os.remove(path)
+                except Exception:
+                    pass
         super(UnifiedJob, self).delete()
 
     def copy_unified_job(self, limit=None):
@@ -974,22 +976,31 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
             return len(self.result_stdout)
 
     def _result_stdout_raw_limited(self, start_line=0, end_line=None, redact_sensitive=True, escape_ascii=False):
-        return_buffer = u""
+        start_line = int(start_line)
         if end_line is not None:
             end_line = int(end_line)
-        stdout_lines = self.result_stdout_raw_handle().readlines()
-        absolute_end = len(stdout_lines)
-        for line in stdout_lines[int(start_line):end_line]:
-            return_buffer += line
-        if int(start_line) < 0:
-            start_actual = len(stdout_lines) + int(start_line)
-            end_actual = len(stdout_lines)
-        else:
-            start_actual = int(start_line)
-            if end_line is not None:
-                end_actual = min(int(end_line), len(stdout_lines))
-            else:
+        return_buffer = None
+        try:
+            if not self.result_stdout_text and os.stat(self.result_stdout_file).st_size > 0:
+                # Seek straight to the requested lines using the stdout file's
+                # line index rather than reading the whole file.
+                return_buffer, start_actual, end_actual, absolute_end = \
+                    StdoutLineReader(self.result_stdout_file).read_lines(start_line, end_line)
+        except (IOError, OSError, ValueError):
+            return_buffer = None
+        if return_buffer is None:
+            stdout_lines = self.result_stdout_raw_handle().readlines()
+            absolute_end = len(stdout_lines)
+            return_buffer = u''.join(stdout_lines[start_line:end_line])
+            if start_line < 0:
+                start_actual = len(stdout_lines) + start_line
                 end_actual = len(stdout_lines)
+            else:
+                start_actual = start_line
+                if end_line is not None:
+                    end_actual = min(end_line, len(stdout_lines))
+                else:
+                    end_actual = len(stdout_lines)
 
         if redact_sensitive:
             return_buffer = UriCleaner.remove_sensitive(return_buffer)
@@ -1259,6 +1270,15 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
                    (self.model_to_str(), self.name, self.id)
         return None
 
+    def _broadcast_cancel(self):
+        # Running tasks also poll their cancel flag from the database now and
+        # then, so a cancel is only delayed if the broadcast fails.
+        from awx.main.tasks import handle_cancel_request
+        try:
+            handle_cancel_request.delay(self.pk)
+        except Exception:
+            logger.exception('Failed to broadcast the cancel request of %s', self.log_format)
+
     def cancel(self, job_explanation=None, is_chain=False):
         if self.can_cancel:
             if not is_chain:
@@ -1276,6 +1296,8 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
                     cancel_fields.append('job_explanation')
                 self.save(update_fields=cancel_fields)
                 self.websocket_emit_status("canceled")
+                if 'status' not in cancel_fields:
+                    connection.on_commit(self._broadcast_cancel)
             if settings.CELERY_BROKER_URL.startswith('amqp://'):
                 self._force_cancel()
         return self.cancel_flag
@@ -1,4 +1,8 @@
 
+# Python
+from collections import defaultdict
+
+# AWX
 from awx.main.models import (
     Job,
     AdHocCommand,
@@ -14,12 +18,15 @@ class SimpleDAG(object):
     def __init__(self):
         self.nodes = []
         self.edges = []
+        # node_object -> ordinal in self.nodes
+        self.node_obj_to_ord = {}
+        # ordinal -> [(ordinal, label), ...] for outgoing (from) and
+        # incoming (to) edges, in the order the edges were added
+        self.node_from_edges = defaultdict(list)
+        self.node_to_edges = defaultdict(list)
 
     def __contains__(self, obj):
-        for node in self.nodes:
-            if node['node_object'] == obj:
-                return True
-        return False
+        return self.find_ord(obj) is not None
 
     def __len__(self):
         return len(self.nodes)
@@ -66,59 +73,56 @@ class SimpleDAG(object):
 
     def add_node(self, obj, metadata=None):
         if self.find_ord(obj) is None:
+            self._index_node(obj, len(self.nodes))
             self.nodes.append(dict(node_object=obj, metadata=metadata))
 
+    def _index_node(self, obj, ord):
+        try:
+            self.node_obj_to_ord[obj] = ord
+        except TypeError:
+            # Unhashable (e.g. unsaved model instance); find_ord falls back to
+            # a linear scan for these.
+            pass
+
     def add_edge(self, from_obj, to_obj, label=None):
         from_obj_ord = self.find_ord(from_obj)
         to_obj_ord = self.find_ord(to_obj)
         if from_obj_ord is None or to_obj_ord is None:
             raise LookupError("Object not found")
         self.edges.append((from_obj_ord, to_obj_ord, label))
+        self.node_from_edges[from_obj_ord].append((to_obj_ord, label))
+        self.node_to_edges[to_obj_ord].append((from_obj_ord, label))
 
     def add_edges(self, edgelist):
         for edge_pair in edgelist:
             self.add_edge(edge_pair[0], edge_pair[1], edge_pair[2])
 
     def find_ord(self, obj):
-        for idx in range(len(self.nodes)):
-            if obj == self.nodes[idx]['node_object']:
-                return idx
-        return None
+        try:
+            return self.node_obj_to_ord.get(obj, None)
+        except TypeError:
+            for idx in range(len(self.nodes)):
+                if obj == self.nodes[idx]['node_object']:
+                    return idx
+            return None
+
+    def _get_adjacent(self, edges, label=None):
+        return [self.nodes[ord] for ord, lbl in edges if not label or lbl == label]
 
     def get_dependencies(self, obj, label=None):
-        antecedents = []
         this_ord = self.find_ord(obj)
-        for node, dep, lbl in self.edges:
-            if label:
-                if node == this_ord and lbl == label:
-                    antecedents.append(self.nodes[dep])
-            else:
-                if node == this_ord:
-                    antecedents.append(self.nodes[dep])
-        return antecedents
+        if this_ord is None:
+            return []
+        return self._get_adjacent(self.node_from_edges.get(this_ord, []), label)
 
     def get_dependents(self, obj, label=None):
-        decendents = []
         this_ord = self.find_ord(obj)
-        for node, dep, lbl in self.edges:
-            if label:
-                if dep == this_ord and lbl == label:
-                    decendents.append(self.nodes[node])
-            else:
-                if dep == this_ord:
-                    decendents.append(self.nodes[node])
-        return decendents
+        if this_ord is None:
+            return []
+        return self._get_adjacent(self.node_to_edges.get(this_ord, []), label)
 
     def get_leaf_nodes(self):
-        leafs = []
-        for n in self.nodes:
-            if len(self.get_dependencies(n['node_object'])) < 1:
-                leafs.append(n)
-        return leafs
+        return [n for ord, n in enumerate(self.nodes) if not self.node_from_edges.get(ord)]
 
     def get_root_nodes(self):
-        roots = []
-        for n in self.nodes:
-            if len(self.get_dependents(n['node_object'])) < 1:
-                roots.append(n)
-        return roots
+        return [n for ord, n in enumerate(self.nodes) if not self.node_to_edges.get(ord)]
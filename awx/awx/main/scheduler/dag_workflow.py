@@ -25,8 +25,13 @@ class WorkflowDAG(SimpleDAG):
         root_nodes = self.get_root_nodes()
         nodes = root_nodes
         nodes_found = []
+        visited = set()
 
         for index, n in enumerate(nodes):
+            # Nodes reachable by more than one path only need visiting once
+            if id(n) in visited:
+                continue
+            visited.add(id(n))
             obj = n['node_object']
             job = obj.job
 
@@ -63,8 +68,12 @@ class WorkflowDAG(SimpleDAG):
         root_nodes = self.get_root_nodes()
         nodes = root_nodes
         is_failed = False
+        visited = set()
 
         for index, n in enumerate(nodes):
+            if id(n) in visited:
+                continue
+            visited.add(id(n))
             obj = n['node_object']
             job = obj.job
 
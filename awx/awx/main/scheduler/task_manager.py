@@ -2,8 +2,11 @@
 # All Rights Reserved
 
 # Python
+from collections import OrderedDict
 from datetime import datetime, timedelta
+import contextlib
 import logging
+import time
 import uuid
 import json
 from sets import Set
@@ -48,9 +51,80 @@ from celery.app.control import Inspect
 logger = logging.getLogger('awx.main.scheduler')
 
 
+class IncrementalTaskCache(object):
+    '''
+    Process-local view of the pending, waiting and running tasks, kept
+    between task manager runs.
+
+    Each run lists the (pk, status, modified) of the active tasks with one
+    narrow query and only loads the tasks that were created or changed since
+    the previous run; tasks that finished, were canceled or deleted are
+    dropped.  A full reload happens every
+    AWX_TASK_MANAGER_FULL_RECONCILE_INTERVAL seconds.
+    '''
+
+    def __init__(self):
+        self.tasks = {}
+        self.ignored = {}
+        self.last_full_sync = None
+
+    def _state(self, task):
+        return (task.status, task.modified)
+
+    def _add(self, task):
+        if isinstance(task, InventoryUpdate) and task.source == 'file':
+            self.ignored[task.pk] = self._state(task)
+            self.tasks.pop(task.pk, None)
+        else:
+            self.tasks[task.pk] = task
+
+    def reset(self, tasks):
+        self.tasks = dict((task.pk, task) for task in tasks)
+        self.ignored = {}
+        self.last_full_sync = time.time()
+
+    def needs_full_sync(self):
+        return (self.last_full_sync is None or
+                time.time() - self.last_full_sync >= settings.AWX_TASK_MANAGER_FULL_RECONCILE_INTERVAL)
+
+    def apply_deltas(self, status_list=('pending', 'waiting', 'running')):
+        '''
+        Bring the cached tasks up to date; returns the number of tasks that
+        had to be (re)loaded or dropped.
+        '''
+        current = dict(
+            (pk, (status, modified)) for pk, status, modified in
+            UnifiedJob.objects.filter(status__in=status_list).values_list('pk', 'status', 'modified')
+        )
+        removed = [pk for pk in self.tasks if pk not in current]
+        for pk in removed:
+            del self.tasks[pk]
+        for pk in [pk for pk in self.ignored if pk not in current]:
+            del self.ignored[pk]
+
+        # Compare against the cached objects themselves, so tasks modified by
+        # a scheduling run that was rolled back are reloaded as well.
+        changed = [
+            pk for pk, state in current.items()
+            if self.ignored.get(pk, None) != state and
+            (pk not in self.tasks or self._state(self.tasks[pk]) != state)
+        ]
+        if changed:
+            for task in UnifiedJob.objects.filter(pk__in=changed).prefetch_related('instance_group'):
+                self._add(task)
+        return len(removed) + len(changed)
+
+    def sorted_tasks(self):
+        return sorted(self.tasks.values(), key=lambda task: task.created)
+
+
+incremental_task_cache = IncrementalTaskCache()
+
+
 class TaskManager():
 
     def __init__(self):
+        self.timings = OrderedDict()
         self.graph = dict()
         for rampart_group in InstanceGroup.objects.prefetch_related('instances'):
             self.graph[rampart_group.name] = dict(graph=DependencyGraph(rampart_group.name),
@@ -594,9 +668,40 @@ class TaskManager():
         pending_tasks = filter(lambda t: t.status in 'pending', all_sorted_tasks)
         self.process_pending_tasks(pending_tasks)
 
+    @contextlib.contextmanager
+    def timed(self, phase):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.timings[phase] = time.time() - start
+
+    def get_sorted_tasks(self):
+        if not getattr(settings, 'AWX_INCREMENTAL_TASK_MANAGER', False):
+            self.timings['mode'] = 'full'
+            return self.get_tasks()
+        if incremental_task_cache.needs_full_sync():
+            self.timings['mode'] = 'full'
+            incremental_task_cache.reset(self.get_tasks())
+        else:
+            self.timings['mode'] = 'incremental'
+            self.timings['deltas'] = incremental_task_cache.apply_deltas()
+        return incremental_task_cache.sorted_tasks()
+
+    def record_metrics(self):
+        logger.debug('Task manager cycle timings: %s', ', '.join(
+            '{}={}'.format(k, '{:.3f}s'.format(v) if isinstance(v, float) else v)
+            for k, v in self.timings.items()
+        ))
+        metrics = dict(self.timings)
+        metrics['finished'] = tz_now().isoformat()
+        cache.set('task_manager_metrics', metrics)
+
     def _schedule(self):
         finished_wfjs = []
-        all_sorted_tasks = self.get_tasks()
+        with self.timed('get_tasks'):
+            all_sorted_tasks = self.get_sorted_tasks()
+        self.timings['tasks'] = len(all_sorted_tasks)
         if len(all_sorted_tasks) > 0:
             # TODO: Deal with
             # latest_project_updates = self.get_latest_project_update_tasks(all_sorted_tasks)
@@ -607,12 +712,14 @@ class TaskManager():
 
             self.all_inventory_sources = self.get_inventory_source_tasks(all_sorted_tasks)
 
-            running_workflow_tasks = self.get_running_workflow_jobs()
-            finished_wfjs = self.process_finished_workflow_jobs(running_workflow_tasks)
+            with self.timed('workflows'):
+                running_workflow_tasks = self.get_running_workflow_jobs()
+                finished_wfjs = self.process_finished_workflow_jobs(running_workflow_tasks)
 
-            self.spawn_workflow_graph_jobs(running_workflow_tasks)
+                self.spawn_workflow_graph_jobs(running_workflow_tasks)
 
-            self.process_tasks(all_sorted_tasks)
+            with self.timed('process_tasks'):
+                self.process_tasks(all_sorted_tasks)
         return finished_wfjs
 
     def schedule(self):
@@ -624,8 +731,11 @@ class TaskManager():
                     return
                 logger.debug("Starting Scheduler")
 
-                self.cleanup_inconsistent_celery_tasks()
-                finished_wfjs = self._schedule()
+                with self.timed('total'):
+                    with self.timed('cleanup'):
+                        self.cleanup_inconsistent_celery_tasks()
+                    finished_wfjs = self._schedule()
+                self.record_metrics()
 
                 # Operations whose queries rely on modifications made during the atomic scheduling session
                 for wfj in WorkflowJob.objects.filter(id__in=finished_wfjs):
@@ -2,6 +2,7 @@
 # All Rights Reserved.
 
 # Python
+from collections import defaultdict
 import contextlib
 import logging
 import threading
@@ -9,6 +10,7 @@ import json
 
 # Django
 from django.conf import settings
+from django.db import connection
 from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 
@@ -21,10 +23,13 @@ from awx.main.models import * # noqa
 from awx.api.serializers import * # noqa
 from awx.main.utils import model_instance_diff, model_to_dict, camelcase_to_underscore
 from awx.main.utils import ignore_inventory_computed_fields, ignore_inventory_group_removal, _inventory_updates
-from awx.main.tasks import update_inventory_computed_fields
+from awx.main.utils.common import get_allowed_fields
+from awx.main.tasks import (
+    update_inventory_computed_fields, queue_inventory_computed_fields_update, write_activity_stream_entries
+)
 from awx.main.fields import is_implicit_parent
 
-from awx.main.consumers import emit_channel_notification
+from awx.main.consumers import event_emitter
 
 from awx.conf.utils import conf_to_dict
 
@@ -48,7 +53,7 @@ def emit_job_event_detail(sender, **kwargs):
     created = kwargs['created']
     if created:
         event_serialized = JobEventWebSocketSerializer(instance).data
-        emit_channel_notification('job_events-' + str(instance.job.id), event_serialized)
+        event_emitter.emit('job_events-' + str(instance.job.id), event_serialized)
 
 
 def emit_ad_hoc_command_event_detail(sender, **kwargs):
@@ -56,7 +61,7 @@ def emit_ad_hoc_command_event_detail(sender, **kwargs):
     created = kwargs['created']
     if created:
         event_serialized = AdHocCommandEventWebSocketSerializer(instance).data
-        emit_channel_notification('ad_hoc_command_events-' + str(instance.ad_hoc_command_id), event_serialized)
+        event_emitter.emit('ad_hoc_command_events-' + str(instance.ad_hoc_command_id), event_serialized)
 
 
 def emit_update_inventory_computed_fields(sender, **kwargs):
@@ -91,7 +96,28 @@ def emit_update_inventory_computed_fields(sender, **kwargs):
     except Inventory.DoesNotExist:
         pass
     else:
-        update_inventory_computed_fields.delay(inventory.id, True)
+        host_ids, group_ids = _computed_fields_delta(instance, kwargs)
+        if host_ids is None and group_ids is None:
+            update_inventory_computed_fields.delay(inventory.id, True)
+        else:
+            queue_inventory_computed_fields_update(inventory.id, host_ids=host_ids, group_ids=group_ids)
+
+
+def _computed_fields_delta(instance, kwargs):
+    '''
+    Return the (host_ids, group_ids) whose computed fields are affected by an
+    m2m change, or (None, None) if they can't be determined (e.g. on clear).
+    '''
+    pk_set = kwargs.get('pk_set', None)
+    if kwargs['signal'] != m2m_changed or pk_set is None:
+        return None, None
+    host_ids = list(pk_set) if kwargs['model'] == Host else []
+    group_ids = list(pk_set) if kwargs['model'] == Group else []
+    if isinstance(instance, Host):
+        host_ids.append(instance.pk)
+    elif isinstance(instance, Group):
+        group_ids.append(instance.pk)
+    return host_ids, group_ids
 
 
 def emit_update_inventory_on_created_or_deleted(sender, **kwargs):
@@ -111,12 +137,45 @@ def emit_update_inventory_on_created_or_deleted(sender, **kwargs):
     except Inventory.DoesNotExist:
         pass
     else:
-        if inventory is not None:
+        if inventory is None:
+            return
+        if kwargs.get('created', False) and isinstance(instance, Host):
+            queue_inventory_computed_fields_update(inventory.id, host_ids=[instance.pk])
+        elif kwargs.get('created', False) and isinstance(instance, Group):
+            queue_inventory_computed_fields_update(inventory.id, group_ids=[instance.pk])
+        else:
             update_inventory_computed_fields.delay(inventory.id, True)
 
 
+# Fields of each model that appear in the output of Inventory.get_script_data.
+INVENTORY_SCRIPT_FIELDS = {
+    Inventory: frozenset(['variables']),
+    Host: frozenset(['name', 'enabled', 'variables', 'inventory']),
+    Group: frozenset(['name', 'variables', 'inventory']),
+}
+
+
+def bump_inventory_script_version(sender, **kwargs):
+    instance = kwargs['instance']
+    if kwargs['signal'] == m2m_changed:
+        if kwargs['action'] not in ('post_add', 'post_remove', 'post_clear'):
+            return
+    elif kwargs['signal'] == post_save:
+        update_fields = kwargs.get('update_fields')
+        if update_fields and not INVENTORY_SCRIPT_FIELDS[sender] & set(update_fields):
+            return
+        if sender == Inventory and kwargs.get('created', False):
+            return
+    if isinstance(instance, Inventory):
+        Inventory.bump_script_version(instance.pk)
+    else:
+        Inventory.bump_script_version(instance.inventory_id)
+
+
 def rebuild_role_ancestor_list(reverse, model, instance, pk_set, action, **kwargs):
     'When a role parent is added or removed, update our role hierarchy list'
+    # Role.rebuild_role_ancestor_list also invalidates the cached accessible
+    # objects of every user (see invalidate_accessible_pk_cache).
     if action == 'post_add':
         if reverse:
             model.rebuild_role_ancestor_list(list(pk_set), [])
@@ -130,6 +189,12 @@ def rebuild_role_ancestor_list(reverse, model, instance, pk_set, action, **kwarg
             model.rebuild_role_ancestor_list([], [instance.id])
 
 
+def invalidate_accessible_pk_cache_on_members_changed(action, **kwargs):
+    'When users are added to or removed from a role, the objects they can access change'
+    if action in ['post_add', 'post_remove', 'post_clear']:
+        invalidate_accessible_pk_cache()
+
+
 def sync_superuser_status_to_rbac(instance, **kwargs):
     'When the is_superuser flag is changed on a user, reflect that in the membership of the System Admnistrator role'
     update_fields = kwargs.get('update_fields', None)
@@ -222,8 +287,16 @@ connect_computed_field_signals()
 
 post_save.connect(emit_job_event_detail, sender=JobEvent)
 post_save.connect(emit_ad_hoc_command_event_detail, sender=AdHocCommandEvent)
+post_save.connect(bump_inventory_script_version, sender=Inventory)
+post_save.connect(bump_inventory_script_version, sender=Host)
+post_delete.connect(bump_inventory_script_version, sender=Host)
+post_save.connect(bump_inventory_script_version, sender=Group)
+post_delete.connect(bump_inventory_script_version, sender=Group)
+m2m_changed.connect(bump_inventory_script_version, sender=Group.hosts.through)
+m2m_changed.connect(bump_inventory_script_version, sender=Group.parents.through)
 m2m_changed.connect(rebuild_role_ancestor_list, Role.parents.through)
 m2m_changed.connect(org_admin_edit_members, Role.members.through)
+m2m_changed.connect(invalidate_accessible_pk_cache_on_members_changed, Role.members.through)
 m2m_changed.connect(rbac_activity_stream, Role.members.through)
 m2m_changed.connect(rbac_activity_stream, Role.parents.through)
 post_save.connect(sync_superuser_status_to_rbac, sender=User)
@@ -343,6 +416,68 @@ def disable_activity_stream():
         activity_stream_enabled.enabled = previous_value
 
 
+class ActivityStreamBatch(threading.local):
+    '''
+    Collects the activity stream entries recorded by a transaction and, once
+    it commits, writes them with a few bulk inserts ('batch') or hands them
+    to the write_activity_stream_entries task ('buffered'), according to
+    ACTIVITY_STREAM_WRITE_MODE.  Entries recorded outside of a transaction,
+    or inside a savepoint (which could be rolled back on its own), are
+    written right away, as in the 'immediate' mode.
+    '''
+
+    def __init__(self):
+        self.entries = []
+        self.registration = (0, None)
+
+    def _flush_pending(self):
+        # The flush is registered outside of any savepoint, so no savepoint
+        # rollback removes it or anything before it: it stays where it was
+        # added until the transaction ends and the list is replaced.
+        index, registration = self.registration
+        run_on_commit = connection.run_on_commit
+        return index < len(run_on_commit) and run_on_commit[index] is registration
+
+    def add(self, entry, **links):
+        '''
+        Record `entry`, an unsaved ActivityStream, and the objects it should
+        be linked to, keyed by ActivityStream m2m field name.
+        '''
+        mode = getattr(settings, 'ACTIVITY_STREAM_WRITE_MODE', 'immediate')
+        if mode == 'immediate' or not connection.in_atomic_block or connection.savepoint_ids:
+            entry.save()
+            for name, objs in links.items():
+                getattr(entry, name).add(*objs)
+            return
+        if not self._flush_pending():
+            # Anything left over is from a transaction that was rolled back.
+            self.entries = []
+            connection.on_commit(self.flush)
+            self.registration = (len(connection.run_on_commit) - 1, connection.run_on_commit[-1])
+        self.entries.append((entry, dict(
+            (name, set(obj.pk for obj in objs)) for name, objs in links.items()
+        )))
+
+    def flush(self):
+        entries, self.entries = self.entries, []
+        if not entries:
+            return
+        if getattr(settings, 'ACTIVITY_STREAM_WRITE_MODE', 'immediate') == 'buffered':
+            # These entries are written after ActivityStreamMiddleware is done
+            # with the request, so set their actor to the API user here, as it
+            # does; the task forwards them to external logging.
+            drf_user = getattr(getattr(get_current_request(), 'drf_request', None), 'user', None)
+            if drf_user and drf_user.id:
+                for entry, links in entries:
+                    entry.actor = drf_user
+            write_activity_stream_entries.delay([entry.to_write_dict(links) for entry, links in entries])
+        else:
+            ActivityStream.bulk_write(entries)
+
+
+activity_stream_batch = ActivityStreamBatch()
+
+
 @contextlib.contextmanager
 def disable_computed_fields():
     post_save.disconnect(emit_update_inventory_on_created_or_deleted, sender=Host)
@@ -403,11 +538,10 @@ def activity_stream_create(sender, instance, created, **kwargs):
         #      it might actually be a good idea to remove all of these FK references since
         #      we don't really use them anyway.
         if instance._meta.model_name != 'setting':  # Is not conf.Setting instance
-            activity_entry.save()
-            getattr(activity_entry, object1).add(instance)
+            activity_stream_batch.add(activity_entry, **{object1: [instance]})
         else:
             activity_entry.setting = conf_to_dict(instance)
-            activity_entry.save()
+            activity_stream_batch.add(activity_entry)
 
 
 def activity_stream_update(sender, instance, **kwargs):
@@ -415,18 +549,26 @@ def activity_stream_update(sender, instance, **kwargs):
         return
     if not activity_stream_enabled:
         return
+    _type = type(instance)
+    if getattr(_type, '_deferred', False):
+        return
+    fields = None
+    if kwargs.get('update_fields') is not None:
+        # Only the fields being saved can have changed; when none of them are
+        # recorded (e.g., a job's status), there is nothing to look up.
+        fields = set(sender._meta.get_field(name).name for name in kwargs['update_fields'])
+        fields.intersection_update(get_allowed_fields(instance, model_serializer_mapping))
+        if not fields:
+            return
     try:
         old = sender.objects.get(id=instance.id)
     except sender.DoesNotExist:
         return
 
     new = instance
-    changes = model_instance_diff(old, new, model_serializer_mapping)
+    changes = model_instance_diff(old, new, model_serializer_mapping, fields=fields)
     if changes is None:
         return
-    _type = type(instance)
-    if getattr(_type, '_deferred', False):
-        return
     object1 = camelcase_to_underscore(instance.__class__.__name__)
     activity_entry = ActivityStream(
         operation='update',
@@ -434,11 +576,10 @@ def activity_stream_update(sender, instance, **kwargs):
         changes=json.dumps(changes),
         actor=get_current_user_or_none())
     if instance._meta.model_name != 'setting':  # Is not conf.Setting instance
-        activity_entry.save()
-        getattr(activity_entry, object1).add(instance)
+        activity_stream_batch.add(activity_entry, **{object1: [instance]})
     else:
         activity_entry.setting = conf_to_dict(instance)
-        activity_entry.save()
+        activity_stream_batch.add(activity_entry)
 
 
 def activity_stream_delete(sender, instance, **kwargs):
@@ -464,7 +605,7 @@ def activity_stream_delete(sender, instance, **kwargs):
         changes=json.dumps(changes),
         object1=object1,
         actor=get_current_user_or_none())
-    activity_entry.save()
+    activity_stream_batch.add(activity_entry)
 
 
 def activity_stream_associate(sender, instance, **kwargs):
@@ -518,9 +659,9 @@ def activity_stream_associate(sender, instance, **kwargs):
                 object2=object2,
                 object_relationship_type=obj_rel,
                 actor=get_current_user_or_none())
-            activity_entry.save()
-            getattr(activity_entry, object1).add(obj1)
-            getattr(activity_entry, object2).add(obj2_actual)
+            links = defaultdict(list)
+            links[object1].append(obj1)
+            links[object2].append(obj2_actual)
 
             # Record the role for RBAC changes
             if 'role' in kwargs:
@@ -533,11 +674,11 @@ def activity_stream_associate(sender, instance, **kwargs):
                 # If the m2m is from the User side we need to
                 # set the content_object of the Role for our entry.
                 if type(instance) == User and role.content_object is not None:
-                    getattr(activity_entry, role.content_type.name.replace(' ', '_')).add(role.content_object)
+                    links[role.content_type.name.replace(' ', '_')].append(role.content_object)
 
-                activity_entry.role.add(role)
+                links['role'].append(role)
                 activity_entry.object_relationship_type = obj_rel
-                activity_entry.save()
+            activity_stream_batch.add(activity_entry, **links)
 
 
 @receiver(current_user_getter)
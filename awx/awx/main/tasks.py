@@ -32,7 +32,7 @@ from celery.signals import celeryd_init, worker_process_init, worker_shutdown
 
 # Django
 from django.conf import settings
-from django.db import transaction, DatabaseError, IntegrityError
+from django.db import connection, transaction, DatabaseError, IntegrityError
 from django.utils.timezone import now, timedelta
 from django.utils.encoding import smart_str
 from django.core.mail import send_mail
@@ -58,15 +58,20 @@ from awx.main.utils import (get_ansible_version, get_ssh_version, decrypt_field,
                             wrap_args_with_proot, get_system_task_capacity, OutputEventFilter,
                             ignore_inventory_computed_fields, ignore_inventory_group_removal,
                             get_type_for_model, extract_ansible_vars)
+from awx.main.utils.partial_events import get_partial_event_store
+from awx.main.utils import event_partitions
 from awx.main.utils.reload import restart_local_services, stop_local_services
 from awx.main.utils.handlers import configure_external_logger
-from awx.main.consumers import emit_channel_notification
+from awx.main.consumers import emit_channel_notification, batched_subscription_key, BATCH_SUBSCRIPTION_TIMEOUT
 from awx.conf import settings_registry
+from awx.conf.settings import bump_setting_cache_generation
 
 __all__ = ['RunJob', 'RunSystemJob', 'RunProjectUpdate', 'RunInventoryUpdate',
            'RunAdHocCommand', 'handle_work_error', 'handle_work_success',
-           'update_inventory_computed_fields', 'update_host_smart_inventory_memberships',
-           'send_notifications', 'run_administrative_checks', 'purge_old_stdout_files']
+           'update_inventory_computed_fields', 'update_inventory_computed_fields_delta',
+           'queue_inventory_computed_fields_update', 'update_host_smart_inventory_memberships',
+           'update_job_event_hosts', 'write_activity_stream_entries', 'send_notifications',
+           'run_administrative_checks', 'purge_old_stdout_files']
 
 HIDDEN_PASSWORD = '**********'
 
@@ -143,12 +148,36 @@ def handle_setting_changes(self, setting_keys):
     cache_keys = set(setting_keys)
     logger.debug('cache delete_many(%r)', cache_keys)
     cache.delete_many(cache_keys)
+    bump_setting_cache_generation(cache)
     for key in cache_keys:
         if key.startswith('LOG_AGGREGATOR_'):
             restart_local_services(['uwsgi', 'celery', 'beat', 'callback'])
             break
 
 
+def _cancel_key(unified_job_id):
+    return 'unified-job-cancel-{}'.format(unified_job_id)
+
+
+@shared_task(queue='tower_broadcast_all', base=LogErrorsTask)
+def handle_cancel_request(unified_job_id):
+    '''
+    Record in the cache of this node that a unified job has been canceled,
+    for CancelWatcher to notice if the job is running here.
+    '''
+    cache.set(_cancel_key(unified_job_id), True, 3600)
+
+
+@shared_task(queue='tower_broadcast_all', base=LogErrorsTask)
+def handle_batched_subscription(group):
+    '''
+    Record in the cache of this node that a websocket client subscribed to
+    the events of `group` with "batch": true, for EventEmitter to start
+    sending them in batches.
+    '''
+    cache.set(batched_subscription_key(group), True, BATCH_SUBSCRIPTION_TIMEOUT)
+
+
 @shared_task(queue='tower', base=LogErrorsTask)
 def send_notifications(notification_list, job_id=None):
     if not isinstance(notification_list, list):
@@ -210,6 +239,13 @@ def purge_old_stdout_files(self):
             logger.info("Removing {}".format(os.path.join(settings.JOBOUTPUT_ROOT,f)))
 
 
+@shared_task(bind=True, queue='tower', base=LogErrorsTask)
+def extend_event_partitions(self):
+    for model in (JobEvent, AdHocCommandEvent):
+        if event_partitions.is_partitioned(model):
+            event_partitions.extend_event_partitions(model)
+
+
 @shared_task(bind=True, base=LogErrorsTask)
 def cluster_node_heartbeat(self):
     logger.debug("Cluster node heartbeat task.")
@@ -289,6 +325,7 @@ def awx_isolated_heartbeat(self):
 
 @shared_task(bind=True, queue='tower', base=LogErrorsTask)
 def awx_periodic_scheduler(self):
+    started = time.time()
     run_now = now()
     state = TowerScheduleState.get_solo()
     last_run = state.schedule_last_run
@@ -296,13 +333,13 @@ def awx_periodic_scheduler(self):
     state.schedule_last_run = run_now
     state.save()
 
-    old_schedules = Schedule.objects.enabled().before(last_run)
-    for schedule in old_schedules:
-        schedule.save()
-    schedules = Schedule.objects.enabled().between(last_run, run_now)
+    # Schedules that fell behind are only moved to their next run.
+    behind = Schedule.objects.enabled().before(last_run).update_next_runs(run_now)
+    schedules = list(Schedule.objects.enabled().between(last_run, run_now))
+    Schedule.objects.filter(pk__in=[schedule.pk for schedule in schedules]).update_next_runs(run_now)
+    launched = 0
     for schedule in schedules:
         template = schedule.unified_job_template
-        schedule.save() # To update next_run timestamp.
         if template.cache_timeout_blocked:
             logger.warn("Cache timeout is in the future, bypassing schedule for template %s" % str(template.id))
             continue
@@ -318,9 +355,23 @@ def awx_periodic_scheduler(self):
             new_unified_job.job_explanation = "Scheduled job could not start because it was not in the right state or required manual credentials"
             new_unified_job.save(update_fields=['status', 'job_explanation'])
             new_unified_job.websocket_emit_status("failed")
+        else:
+            launched += 1
         emit_channel_notification('schedules-changed', dict(id=schedule.id, group_name="schedules"))
     state.save()
 
+    metrics = OrderedDict([
+        ('duration', time.time() - started),
+        ('behind', len(behind)),
+        ('due', len(schedules)),
+        ('launched', launched),
+        # How late the most overdue schedule of this tick was launched.
+        ('lag', max([(run_now - schedule.next_run).total_seconds() for schedule in schedules] or [0])),
+        ('finished', now().isoformat()),
+    ])
+    logger.debug('Scheduler tick: %s', ', '.join('{}={}'.format(k, v) for k, v in metrics.items()))
+    cache.set('scheduler_metrics', metrics)
+
 
 def _send_notification_templates(instance, status_str):
     if status_str not in ['succeeded', 'failed']:
@@ -425,6 +476,113 @@ def update_inventory_computed_fields(inventory_id, should_update_hosts=True):
         raise
 
 
+def _computed_fields_key(inventory_id, suffix):
+    return 'inventory-computed-fields-{}-{}'.format(inventory_id, suffix)
+
+
+def queue_inventory_computed_fields_update(inventory_id, host_ids=None, group_ids=None):
+    '''
+    Request an update of the computed fields affected by changes to the given
+    hosts/groups once the current transaction commits.  Requests for an
+    inventory are recorded in the cache and merged into a single queued
+    update_inventory_computed_fields_delta task; with neither hosts nor groups
+    the whole inventory is rebuilt.
+    '''
+    if host_ids is None and group_ids is None:
+        delta = {'full': True}
+    else:
+        delta = {'hosts': list(host_ids or []), 'groups': list(group_ids or [])}
+
+    def _queue():
+        seq_key = _computed_fields_key(inventory_id, 'seq')
+        cache.add(seq_key, 0, None)
+        seq = cache.incr(seq_key)
+        cache.set(_computed_fields_key(inventory_id, seq), delta, settings.INVENTORY_COMPUTED_FIELDS_DELTA_TIMEOUT)
+        if cache.add(_computed_fields_key(inventory_id, 'queued'), True,
+                     settings.INVENTORY_COMPUTED_FIELDS_QUEUED_TIMEOUT):
+            update_inventory_computed_fields_delta.delay(inventory_id)
+    connection.on_commit(_queue)
+
+
+@shared_task(queue='tower', base=LogErrorsTask)
+def update_inventory_computed_fields_delta(inventory_id):
+    '''
+    Apply all of the computed field updates requested for an inventory with
+    queue_inventory_computed_fields_update since the last run.
+    '''
+    # Requests made from here on queue another task.
+    cache.delete(_computed_fields_key(inventory_id, 'queued'))
+    seq_key = _computed_fields_key(inventory_id, 'seq')
+    done_key = _computed_fields_key(inventory_id, 'done')
+    done = cache.get(done_key) or 0
+    current = cache.get(seq_key) or 0
+    if current == done:
+        return
+    # Past INVENTORY_COMPUTED_FIELDS_MAX_DELTAS requests, or when a counter
+    # was lost (e.g. evicted from the cache), rebuild without fetching them.
+    full = current < done or current - done > settings.INVENTORY_COMPUTED_FIELDS_MAX_DELTAS
+    deltas = {}
+    if not full:
+        cache.set(done_key, current, None)
+        delta_keys = [_computed_fields_key(inventory_id, seq) for seq in xrange(done + 1, current + 1)]
+        deltas = cache.get_many(delta_keys)
+        cache.delete_many(delta_keys)
+        # Also rebuild if any request asked for it or was lost.
+        full = len(deltas) < len(delta_keys) or any(d.get('full') for d in deltas.values())
+    if full:
+        # Number requests from 1 again.  This is done before rebuilding, so
+        # that requests counted before the reset, whose changes have been
+        # committed, are covered by the rebuild.
+        cache.set(seq_key, 0, None)
+        cache.set(done_key, 0, None)
+
+    i = Inventory.objects.filter(id=inventory_id).first()
+    if i is None:
+        logger.error("Update Inventory Computed Fields failed due to missing inventory: " + str(inventory_id))
+        return
+    host_ids, group_ids = set(), set()
+    for delta in deltas.values():
+        host_ids.update(delta.get('hosts', []))
+        group_ids.update(delta.get('groups', []))
+    try:
+        if full:
+            i.update_computed_fields(update_hosts=True)
+        else:
+            i.update_computed_fields_for(host_ids, group_ids)
+    except DatabaseError as e:
+        if 'did not affect any rows' in str(e):
+            logger.debug('Exiting duplicate update_inventory_computed_fields_delta task.')
+            return
+        raise
+
+
+@shared_task(queue='tower', base=LogErrorsTask)
+def update_job_event_hosts(job_id):
+    '''
+    Write the job event -> host associations for a job (and its parent
+    events) in bulk, see CAPTURE_JOB_EVENT_HOSTS.
+    '''
+    job = Job.objects.filter(id=job_id).first()
+    if job is None:
+        return
+    created = JobEvent.update_hosts_for_job(job)
+    logger.debug('Associated %d job event hosts for %s', created, job.log_format)
+
+
+@shared_task(queue='tower', base=LogErrorsTask)
+def write_activity_stream_entries(entries):
+    '''
+    Write activity stream entries handed off by transactions that committed
+    while ACTIVITY_STREAM_WRITE_MODE is 'buffered'.
+    '''
+    entries = [ActivityStream.from_write_dict(entry) for entry in entries]
+    ActivityStream.bulk_write(entries)
+    actors = User.objects.in_bulk(set(entry.actor_id for entry, links in entries if entry.actor_id))
+    for entry, links in entries:
+        if entry.actor_id in actors:
+            entry.log_to_analytics(actors[entry.actor_id])
+
+
 @shared_task(queue='tower', base=LogErrorsTask)
 def update_host_smart_inventory_memberships():
     try:
@@ -495,6 +653,34 @@ def with_path_cleanup(f):
     return _wrapped
 
 
+class CancelWatcher(object):
+    '''
+    Callable telling whether a running unified job has been canceled, for the
+    `cancelled_callback` of run_pexpect, which calls it on every chunk of
+    output.  The cache key set by handle_cancel_request is looked up at most
+    once per AWX_CANCEL_CHECK_INTERVAL seconds, and the cancel flag is read
+    from the database once per AWX_CANCEL_DB_CHECK_INTERVAL seconds.
+    '''
+
+    def __init__(self, model, pk):
+        self.model = model
+        self.pk = pk
+        self.canceled = False
+        self.last_check = self.last_db_check = time.time()
+
+    def __call__(self):
+        current_time = time.time()
+        if self.canceled or current_time - self.last_check < settings.AWX_CANCEL_CHECK_INTERVAL:
+            return self.canceled
+        self.last_check = current_time
+        if cache.get(_cancel_key(self.pk)):
+            self.canceled = True
+        elif current_time - self.last_db_check >= settings.AWX_CANCEL_DB_CHECK_INTERVAL:
+            self.last_db_check = current_time
+            self.canceled = bool(self.model.objects.filter(pk=self.pk).values_list('cancel_flag', flat=True).first())
+        return self.canceled
+
+
 class BaseTask(LogErrorsTask):
     name = None
     model = None
@@ -694,10 +880,22 @@ class BaseTask(LogErrorsTask):
         return False
 
     def build_inventory(self, instance, **kwargs):
-        json_data = json.dumps(instance.inventory.get_script_data(hostvars=True))
         handle, path = tempfile.mkstemp(dir=kwargs.get('private_data_dir', None))
+        # The script prints a JSON file written next to it, which is copied
+        # from the compiled script of the inventory when there is one.
+        json_path = path + '.json'
+        script_data = instance.inventory.open_script_data(hostvars=True)
+        with open(json_path, 'wb') as f:
+            if script_data is None:
+                json.dump(instance.inventory.get_script_data(hostvars=True), f)
+            else:
+                with script_data:
+                    shutil.copyfileobj(script_data, f)
         f = os.fdopen(handle, 'w')
-        f.write('#! /usr/bin/env python\n# -*- coding: utf-8 -*-\nprint %r\n' % json_data)
+        f.write('#! /usr/bin/env python\n# -*- coding: utf-8 -*-\n'
+                'import os, sys\n'
+                'with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), %r)) as f:\n'
+                '    sys.stdout.write(f.read())\n' % os.path.basename(json_path))
         f.close()
         os.chmod(path, stat.S_IRUSR | stat.S_IXUSR | stat.S_IWUSR)
         return path
@@ -736,7 +934,7 @@ class BaseTask(LogErrorsTask):
         '''
         return OrderedDict()
 
-    def get_stdout_handle(self, instance):
+    def get_stdout_handle(self, instance, **kwargs):
         '''
         Return an open file object for capturing stdout.
         '''
@@ -825,7 +1023,7 @@ class BaseTask(LogErrorsTask):
                     )
 
             if isolated_host is None:
-                stdout_handle = self.get_stdout_handle(instance)
+                stdout_handle = self.get_stdout_handle(instance, private_data_dir=kwargs['private_data_dir'])
             else:
                 base_handle = super(self.__class__, self).get_stdout_handle(instance)
                 stdout_handle = isolated_manager.IsolatedManager.wrap_stdout_handle(
@@ -854,7 +1052,7 @@ class BaseTask(LogErrorsTask):
                 expect_passwords[k] = kwargs['passwords'].get(v, '') or ''
             _kw = dict(
                 expect_passwords=expect_passwords,
-                cancelled_callback=lambda: self.update_model(instance.pk).cancel_flag,
+                cancelled_callback=CancelWatcher(self.model, instance.pk),
                 job_timeout=self.get_instance_timeout(instance),
                 idle_timeout=self.get_idle_timeout(),
                 extra_update_fields=extra_update_fields,
@@ -1042,6 +1240,8 @@ class RunJob(BaseTask):
             env['TOWER_HOST'] = settings.TOWER_URL_BASE
             env['AWX_HOST'] = settings.TOWER_URL_BASE
         env['CACHE'] = settings.CACHES['default']['LOCATION'] if 'LOCATION' in settings.CACHES['default'] else ''
+        if getattr(settings, 'AWX_PARTIAL_EVENT_TRANSPORT', 'memcache') == 'file':
+            env['AWX_PARTIAL_EVENT_DATA_DIR'] = kwargs['private_data_dir']
 
         # Create a directory for ControlPath sockets that is unique to each
         # job and visible inside the proot environment (when enabled).
@@ -1207,28 +1407,26 @@ class RunJob(BaseTask):
                 d[re.compile(r'Vault password \({}\):\s*?$'.format(vault_id), re.M)] = k
         return d
 
-    def get_stdout_handle(self, instance):
+    def get_stdout_handle(self, instance, **kwargs):
         '''
         Wrap stdout file object to capture events.
         '''
         stdout_handle = super(RunJob, self).get_stdout_handle(instance)
+        partial_event_store = get_partial_event_store(kwargs.get('private_data_dir', None))
 
         if getattr(settings, 'USE_CALLBACK_QUEUE', False):
             dispatcher = CallbackQueueDispatcher()
 
             def job_event_callback(event_data):
                 event_data.setdefault(self.event_data_key, instance.id)
-                if 'uuid' in event_data:
-                    cache_event = cache.get('ev-{}'.format(event_data['uuid']), None)
-                    if cache_event is not None:
-                        event_data.update(cache_event)
                 dispatcher.dispatch(event_data)
         else:
             def job_event_callback(event_data):
                 event_data.setdefault(self.event_data_key, instance.id)
                 JobEvent.create_from_data(**event_data)
 
-        return OutputEventFilter(stdout_handle, job_event_callback)
+        return OutputEventFilter(stdout_handle, job_event_callback,
+                                 partial_event_store=partial_event_store)
 
     def should_use_proot(self, instance, **kwargs):
         '''
@@ -1278,12 +1476,19 @@ class RunJob(BaseTask):
         super(RunJob, self).final_run_hook(job, status, **kwargs)
         if job.use_fact_cache and not kwargs.get('isolated'):
             job.finish_job_fact_cache()
+        if getattr(settings, 'CAPTURE_JOB_EVENT_HOSTS', False):
+            # Events may still be arriving from the callback receiver; the
+            # association only inserts the missing rows, under a per-job lock
+            # since it also runs on playbook_on_stats.
+            update_job_event_hosts.apply_async([job.id], countdown=settings.CAPTURE_JOB_EVENT_HOSTS_DELAY)
         try:
             inventory = job.inventory
         except Inventory.DoesNotExist:
             pass
         else:
-            update_inventory_computed_fields.delay(inventory.id, True)
+            # Only the hosts this job ran against can have changed.
+            host_ids = job.job_host_summaries.exclude(host_id=None).values_list('host_id', flat=True)
+            queue_inventory_computed_fields_update(inventory.id, host_ids=list(host_ids))
 
 
 class RunProjectUpdate(BaseTask):
@@ -1480,7 +1685,7 @@ class RunProjectUpdate(BaseTask):
     def get_idle_timeout(self):
         return getattr(settings, 'PROJECT_UPDATE_IDLE_TIMEOUT', None)
 
-    def get_stdout_handle(self, instance):
+    def get_stdout_handle(self, instance, **kwargs):
         stdout_handle = super(RunProjectUpdate, self).get_stdout_handle(instance)
         pk = instance.pk
 
@@ -1986,7 +2191,7 @@ class RunInventoryUpdate(BaseTask):
             args.append('--traceback')
         return args
 
-    def get_stdout_handle(self, instance):
+    def get_stdout_handle(self, instance, **kwargs):
         stdout_handle = super(RunInventoryUpdate, self).get_stdout_handle(instance)
         pk = instance.pk
 
@@ -2100,6 +2305,8 @@ class RunAdHocCommand(BaseTask):
         env['ANSIBLE_STDOUT_CALLBACK'] = 'minimal'  # Hardcoded by Ansible for ad-hoc commands (either minimal or oneline).
         env['ANSIBLE_SFTP_BATCH_MODE'] = 'False'
         env['CACHE'] = settings.CACHES['default']['LOCATION'] if 'LOCATION' in settings.CACHES['default'] else ''
+        if getattr(settings, 'AWX_PARTIAL_EVENT_TRANSPORT', 'memcache') == 'file':
+            env['AWX_PARTIAL_EVENT_DATA_DIR'] = kwargs['private_data_dir']
 
         # Specify empty SSH args (should disable ControlPersist entirely for
         # ad hoc commands).
@@ -2199,28 +2406,26 @@ class RunAdHocCommand(BaseTask):
         d[re.compile(r'Password:\s*?$', re.M)] = 'ssh_password'
         return d
 
-    def get_stdout_handle(self, instance):
+    def get_stdout_handle(self, instance, **kwargs):
         '''
         Wrap stdout file object to capture events.
         '''
         stdout_handle = super(RunAdHocCommand, self).get_stdout_handle(instance)
+        partial_event_store = get_partial_event_store(kwargs.get('private_data_dir', None))
 
         if getattr(settings, 'USE_CALLBACK_QUEUE', False):
             dispatcher = CallbackQueueDispatcher()
 
             def ad_hoc_command_event_callback(event_data):
                 event_data.setdefault(self.event_data_key, instance.id)
-                if 'uuid' in event_data:
-                    cache_event = cache.get('ev-{}'.format(event_data['uuid']), None)
-                    if cache_event is not None:
-                        event_data.update(cache_event)
                 dispatcher.dispatch(event_data)
         else:
             def ad_hoc_command_event_callback(event_data):
                 event_data.setdefault(self.event_data_key, instance.id)
                 AdHocCommandEvent.create_from_data(**event_data)
 
-        return OutputEventFilter(stdout_handle, ad_hoc_command_event_callback)
+        return OutputEventFilter(stdout_handle, ad_hoc_command_event_callback,
+                                 partial_event_store=partial_event_store)
 
     def should_use_proot(self, instance, **kwargs):
         '''
@@ -2250,6 +2455,8 @@ class RunSystemJob(BaseTask):
                 args.extend(['--jobs', '--project-updates', '--inventory-updates',
                              '--management-jobs', '--ad-hoc-commands', '--workflow-jobs',
                              '--notifications'])
+                if json_vars.get('bulk'):
+                    args.append('--bulk')
             if system_job.job_type == 'cleanup_facts':
                 if 'older_than' in json_vars:
                     args.extend(['--older_than', str(json_vars['older_than'])])
@@ -2259,7 +2466,7 @@ class RunSystemJob(BaseTask):
             logger.exception("%s Failed to parse system job", system_job.log_format)
         return args
 
-    def get_stdout_handle(self, instance):
+    def get_stdout_handle(self, instance, **kwargs):
         stdout_handle = super(RunSystemJob, self).get_stdout_handle(instance)
         pk = instance.pk
 
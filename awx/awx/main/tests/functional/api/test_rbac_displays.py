@@ -1,10 +1,16 @@
 import pytest
 
 from awx.api.versioning import reverse
+from django.db import connection
 from django.test.client import RequestFactory
-
-from awx.main.models import Role, Group, UnifiedJobTemplate, JobTemplate
-from awx.main.access import access_registry
+from django.test.utils import CaptureQueriesContext
+
+from awx.main.models import (
+    Role, Group, UnifiedJobTemplate, JobTemplate, Credential, CredentialType, Project, WorkflowJobTemplate,
+    Organization
+)
+from awx.main.access import access_registry, get_user_capabilities
+from awx.main.models.rbac import _bump_accessible_pk_cache_version
 from awx.main.utils import cache_list_capabilities
 from awx.api.serializers import JobTemplateSerializer
 
@@ -320,3 +326,64 @@ def test_license_check_not_called(mocker, job_template, project, org_admin, get)
     with mocker.patch('awx.main.access.BaseAccess.check_license', mock_license_check):
         get(reverse('api:job_template_detail', kwargs={'pk': job_template.pk}), org_admin, expect=200)
         assert not mock_license_check.called
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url_name, create', [
+    ('api:organization_list', lambda org, inv, i: None),
+    ('api:team_list', lambda org, inv, i: org.teams.create(name='team-%d' % i)),
+    ('api:inventory_list', lambda org, inv, i: org.inventories.create(name='inv-%d' % i)),
+    ('api:host_list', lambda org, inv, i: inv.hosts.create(name='host-%d' % i)),
+    ('api:group_list', lambda org, inv, i: inv.groups.create(name='group-%d' % i)),
+    ('api:credential_list', lambda org, inv, i: Credential.objects.create(
+        credential_type=CredentialType.objects.get(kind='cloud', name='Amazon Web Services'),
+        name='cred-%d' % i, organization=org)),
+    ('api:project_list', lambda org, inv, i: Project.objects.create(name='proj-%d' % i, organization=org)),
+    ('api:job_template_list', lambda org, inv, i: JobTemplate.objects.create(
+        name='jt-%d' % i, inventory=inv, project=Project.objects.create(name='jt-proj-%d' % i, organization=org))),
+    ('api:workflow_job_template_list', lambda org, inv, i: WorkflowJobTemplate.objects.create(
+        name='wfjt-%d' % i, organization=org)),
+    ('api:workflow_job_template_list', lambda org, inv, i: WorkflowJobTemplate.objects.create(
+        name='orgless-wfjt-%d' % i).admin_role.members.add(*org.admin_role.members.all())),
+])
+def test_list_capabilities_query_count(url_name, create, organization, inventory, credentialtype_aws,
+                                       org_admin, get, mocker, settings):
+    """
+    The RBAC checks behind the user_capabilities of a list page all come from
+    one prefetch query, whatever the number of items on the page, with the
+    accessible pk cache enabled as it is by default.
+    """
+    assert settings.RBAC_ACCESSIBLE_PK_CACHE_TIMEOUT
+    for i in range(3):
+        create(organization, inventory, i)
+    # Let the role changes above count as committed, so that the accessible
+    # pk cache is in use, as it is for requests
+    connection.run_on_commit = [(sids, func) for sids, func in connection.run_on_commit
+                                if func is not _bump_accessible_pk_cache_version]
+    assert isinstance(Organization.accessible_pk_qs(org_admin, 'admin_role'), list)
+
+    prefetch_queries = []
+    capability_queries = []
+
+    def count_queries(func, queries):
+        def _wrapped(*args, **kwargs):
+            with CaptureQueriesContext(connection) as context:
+                ret = func(*args, **kwargs)
+            queries.extend(context.captured_queries)
+            return ret
+        return _wrapped
+
+    mocker.patch('awx.api.generics.cache_list_capabilities',
+                 count_queries(cache_list_capabilities, prefetch_queries))
+    mocker.patch('awx.api.serializers.get_user_capabilities',
+                 count_queries(get_user_capabilities, capability_queries))
+
+    response = get(reverse(url_name), org_admin, expect=200)
+    assert response.data['count'] >= 1
+    for item in response.data['results']:
+        assert item['summary_fields']['user_capabilities']['edit']
+        if item['type'] == 'workflow_job_template':
+            # Only superusers can copy a workflow without an organization
+            assert item['summary_fields']['user_capabilities']['copy'] is (item['organization'] is not None)
+    assert len(prefetch_queries) == 1
+    assert [q['sql'] for q in capability_queries if 'main_rbac_' in q['sql']] == []
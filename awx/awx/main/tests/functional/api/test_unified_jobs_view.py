@@ -1,9 +1,13 @@
 import pytest
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from awx.api.versioning import reverse
-from awx.main.models import UnifiedJob, ProjectUpdate, InventoryUpdate
+from awx.main.models import UnifiedJob, ProjectUpdate, InventoryUpdate, Job, JobTemplate, Project, Schedule
 from awx.main.tests.base import URI
 from awx.main.models.unified_jobs import ACTIVE_STATES
+from awx.main.utils import get_type_for_model
 
 
 TEST_STATES = list(ACTIVE_STATES)
@@ -146,3 +150,89 @@ def test_delete_ad_hoc_command_in_active_state(ad_hoc_command_factory, delete, a
     adhoc = ad_hoc_command_factory(initial_state=status)
     url = reverse('api:ad_hoc_command_detail', kwargs={'pk': adhoc.pk})
     delete(url, None, admin, expect=403)
+
+
+# Tables of the objects shown in the summary fields of each endpoint's items
+SUMMARY_TABLES = {
+    'api:job_list': ['main_inventory', 'main_project', 'main_jobtemplate', 'auth_user'],
+    'api:unified_job_list': ['main_unifiedjobtemplate', 'auth_user'],
+    'api:unified_job_template_list': ['main_unifiedjobtemplate', 'auth_user', 'main_schedule'],
+}
+
+
+@pytest.mark.parametrize("endpoint", sorted(SUMMARY_TABLES))
+@pytest.mark.django_db
+def test_list_summary_fields_query_budget(get, admin, organization, user, endpoint):
+    def create_jobs(n, offset):
+        for i in range(offset, offset + n):
+            inventory = organization.inventories.create(name='inv-{}'.format(i))
+            project = Project.objects.create(name='proj-{}'.format(i), organization=organization)
+            jt = JobTemplate.objects.create(name='jt-{}'.format(i), inventory=inventory,
+                                            project=project, playbook='helloworld.yml')
+            Schedule.objects.create(name='schedule-{}'.format(i), unified_job_template=jt,
+                                    rrule='DTSTART:20151117T050000Z RRULE:FREQ=HOURLY;INTERVAL=1')
+            Job.objects.create(name='job-{}'.format(i), job_template=jt, inventory=inventory,
+                               project=project, created_by=user('user-{}'.format(i), False))
+
+    def summary_queries():
+        with CaptureQueriesContext(connection) as context:
+            response = get(reverse(endpoint) + '?page_size=100', admin, expect=200)
+        counts = dict(
+            (table, sum(1 for q in context.captured_queries if 'FROM "{}"'.format(table) in q['sql']))
+            for table in SUMMARY_TABLES[endpoint]
+        )
+        return response.data['count'], counts
+
+    create_jobs(2, 0)
+    few_count, few = summary_queries()
+    create_jobs(4, 2)
+    many_count, many = summary_queries()
+    assert many_count > few_count
+    # The related objects of a page are loaded in bulk, not once per item
+    assert many == few
+
+
+@pytest.mark.django_db
+def test_unified_job_list_loads_each_type_once(get, admin, project, inventory_source, job_factory,
+                                               system_job_factory, workflow_job_factory):
+    def create_jobs():
+        return [
+            job_factory(),
+            ProjectUpdate.objects.create(project=project),
+            system_job_factory(),
+            InventoryUpdate.objects.create(inventory_source=inventory_source),
+            workflow_job_factory(),
+        ]
+
+    def list_jobs():
+        with CaptureQueriesContext(connection) as context:
+            response = get(reverse('api:unified_job_list') + '?order_by=-id&page_size=100', admin, expect=200)
+        counts = dict(
+            (table, sum(1 for q in context.captured_queries if 'FROM "{}"'.format(table) in q['sql']))
+            for table in ('main_job', 'main_projectupdate', 'main_systemjob', 'main_inventoryupdate',
+                          'main_workflowjob')
+        )
+        return [(r['id'], r['type']) for r in response.data['results']], counts
+
+    def expected(jobs):
+        return [(j.id, get_type_for_model(type(j))) for j in reversed(jobs)]
+
+    jobs = create_jobs()
+    results, few = list_jobs()
+    assert [r for r in results if r in expected(jobs)] == expected(jobs)
+    jobs += create_jobs()
+    results, many = list_jobs()
+    # Rows keep the requested order, and each type is loaded with one query
+    assert [r for r in results if r in expected(jobs)] == expected(jobs)
+    assert many == few
+
+
+@pytest.mark.django_db
+def test_unified_job_template_list_mixed_types(get, admin, project, inventory_source, job_template,
+                                               workflow_job_template):
+    response = get(reverse('api:unified_job_template_list') + '?order_by=id', admin, expect=200)
+    templates = [project, inventory_source, job_template, workflow_job_template]
+    expected = [(t.id, get_type_for_model(type(t))) for t in sorted(templates, key=lambda t: t.id)]
+    results = [r for r in response.data['results'] if (r['id'], r['type']) in expected]
+    assert [(r['id'], r['type']) for r in results] == expected
+    assert [r for r in results if r['type'] == 'project'][0]['scm_type'] == 'git'
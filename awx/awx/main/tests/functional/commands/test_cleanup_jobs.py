@@ -0,0 +1,64 @@
+# Python
+import pytest
+from datetime import timedelta
+
+# Django
+from django.core.management import call_command
+from django.utils import timezone
+
+# AWX
+from awx.main.models import (
+    Job, JobEvent, JobHostSummary, AdHocCommand, AdHocCommandEvent, ProjectUpdate,
+)
+
+
+@pytest.mark.django_db
+def test_bulk_cleanup_jobs(inventory, project, tmpdir):
+    old = timezone.now() - timedelta(days=100)
+    host = inventory.hosts.create(name='cleanup-host')
+    stdout = tmpdir.join('old-job.out')
+    stdout.write('output')
+    old_jobs = []
+    for i in range(3):
+        job = Job.objects.create(name='old-job-%d' % i, status='successful', created=old + timedelta(minutes=i),
+                                 result_stdout_file=str(stdout) if i == 0 else '')
+        event = job.job_events.create(event='runner_on_ok', host=host)
+        event.hosts.add(host)
+        summary = JobHostSummary.objects.create(job=job, host=host, host_name=host.name)
+        old_jobs.append(job)
+    host.last_job_host_summary = summary
+    host.save(update_fields=['last_job_host_summary'])
+    running = Job.objects.create(name='running-job', status='running', created=old)
+    recent = Job.objects.create(name='recent-job', status='successful')
+    ad_hoc_command = AdHocCommand.objects.create(inventory=inventory, status='failed', created=old)
+    ad_hoc_command.ad_hoc_command_events.create(event='runner_on_failed', host=host)
+    # The last update of a project is kept however old it is.
+    project_update = ProjectUpdate.objects.create(project=project, status='successful', created=old)
+    project.last_job = project_update
+    project.save(update_fields=['last_job'])
+
+    call_command('cleanup_jobs', '--bulk', '--chunk-size', '2', '--jobs', '--ad-hoc-commands',
+                 '--project-updates', verbosity=0)
+
+    assert set(Job.objects.values_list('pk', flat=True)) == set([running.pk, recent.pk])
+    assert not JobEvent.objects.filter(job__in=old_jobs).exists()
+    assert not JobEvent.hosts.through.objects.exists()
+    assert not JobHostSummary.objects.exists()
+    assert not AdHocCommand.objects.exists()
+    assert not AdHocCommandEvent.objects.exists()
+    assert ProjectUpdate.objects.filter(pk=project_update.pk).exists()
+    host.refresh_from_db()
+    assert host.last_job_host_summary is None
+    assert not stdout.exists()
+
+
+@pytest.mark.django_db
+def test_bulk_cleanup_dry_run(inventory):
+    old = timezone.now() - timedelta(days=100)
+    job = Job.objects.create(name='old-job', status='successful', created=old)
+    job.job_events.create(event='runner_on_ok')
+
+    call_command('cleanup_jobs', '--bulk', '--dry-run', '--jobs', verbosity=0)
+
+    assert Job.objects.filter(pk=job.pk).exists()
+    assert JobEvent.objects.filter(job=job).exists()
@@ -222,6 +222,51 @@ class TestINIImports:
         cmd.handle(inventory_id=inventory.pk, source='doesnt matter')
 
 
+@pytest.mark.django_db
+@pytest.mark.inventory_import
+@mock.patch.object(inventory_import.InstanceGroup.objects, 'get', new=mock.MagicMock(return_value=None))
+@mock.patch.object(inventory_import.Command, 'check_license', new=mock.MagicMock())
+@mock.patch.object(inventory_import.Command, 'set_logging_level', new=mock_logging)
+class TestOverwriteSync:
+
+    def sync(self, inventory, data):
+        cmd = inventory_import.Command()
+        with mock.patch.object(inventory_import, 'load_inventory_source',
+                               mock.MagicMock(return_value=dict_to_mem_data(data).all_group)):
+            cmd.handle(inventory_id=inventory.pk, source='doesnt matter', overwrite=True)
+        return cmd
+
+    def test_resync_applies_differences(self, inventory):
+        self.sync(inventory, {
+            "_meta": {"hostvars": {"web1": {"a": 1}, "web2": {}}},
+            "all": {"children": ["web", "db"]},
+            "web": {"hosts": ["web1", "web2"], "children": ["db"]},
+            "db": {"hosts": ["db1"], "vars": {"b": 1}},
+        })
+        web1 = inventory.hosts.get(name='web1')
+        assert set(Group.objects.get(name='web').hosts.values_list('name', flat=True)) == {'web1', 'web2'}
+        assert set(Group.objects.get(name='web').children.values_list('name', flat=True)) == {'db'}
+
+        cmd = self.sync(inventory, {
+            "_meta": {"hostvars": {"web1": {"a": 2}, "web3": {}}},
+            "all": {"children": ["web", "db"]},
+            "web": {"hosts": ["web1", "web3"]},
+            "db": {"hosts": ["db1", "web1"], "vars": {"b": 2}},
+        })
+        assert set(inventory.hosts.values_list('name', flat=True)) == {'web1', 'web3', 'db1'}
+        assert inventory.hosts.get(name='web1').pk == web1.pk
+        assert inventory.hosts.get(name='web1').variables_dict == {'a': 2}
+        web = Group.objects.get(name='web')
+        assert set(web.hosts.values_list('name', flat=True)) == {'web1', 'web3'}
+        assert web.children.count() == 0
+        db = Group.objects.get(name='db')
+        assert db.variables_dict == {'b': 2}
+        assert set(db.hosts.values_list('name', flat=True)) == {'db1', 'web1'}
+        assert set(cmd.inventory_source.hosts.values_list('name', flat=True)) == {'web1', 'web3', 'db1'}
+        assert set(cmd.inventory_source.groups.values_list('name', flat=True)) == {'web', 'db'}
+        assert [phase for phase, _, _ in cmd.phase_stats][-2:] == ['Adding group children', 'Adding group hosts']
+
+
 @pytest.mark.django_db
 @pytest.mark.inventory_import
 class TestEnabledVar:
@@ -16,10 +16,15 @@ from awx.main.models import (
 
 # other AWX
 from awx.main.utils import model_to_dict
+from awx.main.signals import activity_stream_batch
+from awx.main.tasks import write_activity_stream_entries
 from awx.api.serializers import InventorySourceSerializer
 
 # Django
 from django.contrib.auth.models import AnonymousUser
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.utils.timezone import now
 
 # Django-CRUM
 from crum import impersonate
@@ -181,3 +186,113 @@ def test_annon_user_action():
         inv = Inventory.objects.create(name='ainventory')
     entry = inv.activitystream_set.filter(operation='create').first()
     assert not entry.actor
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('mode', ['batch', 'buffered'])
+def test_activity_stream_written_on_commit(settings, mocker, mode):
+    settings.ACTIVITY_STREAM_WRITE_MODE = mode
+    mocker.patch('awx.main.signals.write_activity_stream_entries.delay',
+                 side_effect=write_activity_stream_entries)
+    with transaction.atomic():
+        org = Organization.objects.create(name='batched-org')
+        org.description = 'changed'
+        org.save()
+        assert not org.activitystream_set.exists()
+    assert [entry.operation for entry in org.activitystream_set.order_by('pk')] == ['create', 'update']
+
+    # Entries of a transaction that is rolled back are never written
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            org.description = 'rolled back'
+            org.save()
+            raise RuntimeError()
+    org.refresh_from_db()
+    with transaction.atomic():
+        org.name = 'renamed-org'
+        org.save()
+    assert org.activitystream_set.count() == 3
+    assert not org.activitystream_set.filter(changes__contains='rolled back').exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_activity_stream_flush_registered_once(settings, mocker):
+    settings.ACTIVITY_STREAM_WRITE_MODE = 'batch'
+    with transaction.atomic():
+        org = Organization.objects.create(name='batched-org')
+        # A savepoint rolled back in between doesn't lose the pending flush
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                connection.on_commit(lambda: None)
+                raise RuntimeError()
+        for i in range(3):
+            org.description = 'changed-%d' % i
+            org.save()
+        assert [func for sids, func in connection.run_on_commit].count(activity_stream_batch.flush) == 1
+    assert org.activitystream_set.count() == 4
+
+
+@pytest.mark.django_db(transaction=True)
+def test_buffered_entries_keep_their_timestamp(settings, mocker):
+    settings.ACTIVITY_STREAM_WRITE_MODE = 'buffered'
+    delay = mocker.patch('awx.main.signals.write_activity_stream_entries.delay')
+    before = now()
+    with transaction.atomic():
+        org = Organization.objects.create(name='buffered-org')
+    after = now()
+    # The task runs later on
+    write_activity_stream_entries(*delay.call_args[0])
+    assert before <= org.activitystream_set.get(operation='create').timestamp <= after
+
+
+@pytest.mark.django_db
+def test_activity_stream_skips_unrecorded_update_fields(organization, mocker):
+    get = mocker.spy(Organization.objects, 'get')
+    organization.save(update_fields=['modified'])
+    assert get.call_count == 0
+    organization.description = 'changed'
+    organization.save(update_fields=['description'])
+    assert get.call_count == 1
+    assert organization.activitystream_set.filter(operation='update').count() == 1
+
+
+@pytest.mark.django_db
+def test_bulk_write_sends_post_save(mocker, organization):
+    # Stand in for PostgreSQL, whose bulk_create sets the ids of the new rows
+    mocker.patch('awx.main.models.activity_stream.connection', vendor='postgresql')
+    bulk_create = mocker.patch.object(ActivityStream.objects, 'bulk_create',
+                                      side_effect=lambda objs: [obj.save_base(raw=True) or obj for obj in objs])
+    saved = []
+
+    def record(sender, instance, created, raw, **kwargs):
+        if not raw:
+            saved.append((instance.pk, created))
+
+    entries = [
+        (ActivityStream(operation='update', object1='organization', changes='{}'), {'organization': {organization.pk}})
+        for i in range(2)
+    ]
+    post_save.connect(record, sender=ActivityStream, dispatch_uid='test_bulk_write_sends_post_save')
+    try:
+        ActivityStream.bulk_write(entries)
+    finally:
+        post_save.disconnect(sender=ActivityStream, dispatch_uid='test_bulk_write_sends_post_save')
+    assert bulk_create.call_count == 1
+    assert saved == [(entry.pk, True) for entry, links in entries]
+    assert organization.activitystream_set.filter(operation='update').count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_buffered_entries_get_api_user(settings, mocker, admin_user):
+    settings.ACTIVITY_STREAM_WRITE_MODE = 'buffered'
+    mocker.patch('awx.main.signals.write_activity_stream_entries.delay',
+                 side_effect=write_activity_stream_entries)
+    mocker.patch('awx.main.signals.get_current_request',
+                 return_value=mock.Mock(drf_request=mock.Mock(user=admin_user)))
+    analytics_logger = mocker.patch('awx.main.models.activity_stream.analytics_logger')
+    with transaction.atomic():
+        org = Organization.objects.create(name='buffered-org')
+    entry = org.activitystream_set.get(operation='create')
+    assert entry.actor == admin_user
+    assert any(call[1]['extra']['actor'] == admin_user.username and call[1]['extra']['object1'] == 'organization'
+               for call in analytics_logger.info.call_args_list)
@@ -0,0 +1,83 @@
+import mock
+import pytest
+
+from awx.main.models import Job, JobEvent, JobHostSummary
+
+
+@pytest.mark.django_db
+class TestPlaybookOnStats:
+
+    @pytest.fixture
+    def job(self, inventory):
+        return Job.objects.create(inventory=inventory)
+
+    def stats(self, job, **event_data):
+        with mock.patch('awx.main.models.jobs.emit_channel_notification'):
+            return JobEvent.create_from_data(job_id=job.pk, event='playbook_on_stats', event_data=event_data)
+
+    def test_host_summaries_created(self, job, inventory):
+        hosts = [inventory.hosts.create(name='host-{}'.format(i)) for i in range(3)]
+        self.stats(
+            job,
+            ok={'host-0': 2, 'host-1': 1, 'missing-host': 1},
+            failures={'host-1': 1},
+            changed={'host-2': 3},
+        )
+
+        summaries = dict((s.host_name, s) for s in JobHostSummary.objects.filter(job=job))
+        assert set(summaries) == {'host-0', 'host-1', 'host-2', 'missing-host'}
+        assert summaries['host-0'].ok == 2
+        assert summaries['host-0'].failed is False
+        assert summaries['host-1'].failed is True
+        assert summaries['host-2'].changed == 3
+        assert summaries['missing-host'].host is None
+
+        for host in hosts:
+            host.refresh_from_db()
+            assert host.last_job_id == job.id
+            assert host.last_job_host_summary_id == summaries[host.name].id
+
+    def test_existing_host_summaries_updated(self, job, inventory):
+        host = inventory.hosts.create(name='host-0')
+        JobHostSummary.objects.create(job=job, host=host, ok=1)
+        self.stats(job, ok={'host-0': 1}, dark={'host-0': 1})
+
+        summary = JobHostSummary.objects.get(job=job, host_name='host-0')
+        assert summary.ok == 1
+        assert summary.dark == 1
+        assert summary.failed is True
+
+
+@pytest.mark.django_db
+class TestUpdateHostsForJob:
+
+    def test_hosts_propagate_to_parent_events(self, inventory):
+        job = Job.objects.create(inventory=inventory)
+        host1 = inventory.hosts.create(name='host1')
+        host2 = inventory.hosts.create(name='host2')
+        play = JobEvent.objects.create(job=job, event='playbook_on_play_start', uuid='play')
+        task = JobEvent.objects.create(job=job, event='playbook_on_task_start', uuid='task', parent_uuid='play')
+        ok1 = JobEvent.objects.create(job=job, event='runner_on_ok', uuid='ok1', parent_uuid='task',
+                                      event_data={'host': 'host1'})
+        ok2 = JobEvent.objects.create(job=job, event='runner_on_ok', uuid='ok2', parent_uuid='task',
+                                      event_data={'host': 'host2'})
+        JobEvent.objects.create(job=job, event='runner_on_ok', uuid='ok3', parent_uuid='task',
+                                event_data={'host': 'not-in-inventory'})
+
+        assert JobEvent.update_hosts_for_job(job) == 6
+        assert set(ok1.hosts.all()) == {host1}
+        assert set(ok2.hosts.all()) == {host2}
+        assert set(task.hosts.all()) == {host1, host2}
+        assert set(play.hosts.all()) == {host1, host2}
+
+        # Already associated hosts are not inserted again
+        assert JobEvent.update_hosts_for_job(job) == 0
+
+    def test_hosts_inserted_under_job_lock(self, inventory):
+        job = Job.objects.create(inventory=inventory)
+        inventory.hosts.create(name='host1')
+        JobEvent.objects.create(job=job, event='runner_on_ok', uuid='ok1', event_data={'host': 'host1'})
+
+        with mock.patch('awx.main.models.jobs.advisory_lock') as lock:
+            assert JobEvent.update_hosts_for_job(job) == 1
+        lock.assert_called_once_with('job_event_hosts_%s' % job.id)
@@ -1,7 +1,10 @@
+import json
+
 import pytest
 import mock
 
 from django.core.exceptions import ValidationError
+from django.db import connection, transaction
 
 # AWX
 from awx.main.models import (
@@ -9,7 +12,11 @@ from awx.main.models import (
     Inventory,
     InventorySource,
     InventoryUpdate,
+    Job,
+    JobHostSummary,
 )
+from awx.main.models.inventory import script_version_bumps
+from awx.main.utils import ignore_inventory_computed_fields
 from awx.main.utils.filters import SmartFilter
 
 
@@ -35,6 +42,61 @@ class TestInventoryScript:
         }
 
 
+@pytest.mark.django_db(transaction=True)
+def test_script_version_bumped_once_per_transaction(inventory):
+    version = inventory.script_version
+    with transaction.atomic():
+        # A savepoint rolled back in between doesn't lose track of the bump
+        script_version_bumps.bump(inventory.pk)
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                connection.on_commit(lambda: None)
+                raise RuntimeError()
+        for i in range(3):
+            script_version_bumps.bump(inventory.pk)
+        assert [func for sids, func in connection.run_on_commit].count(script_version_bumps.reset) == 1
+    inventory.refresh_from_db()
+    assert inventory.script_version == version + 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_compiled_inventory_script(inventory, settings, tmpdir):
+    settings.INVENTORY_SCRIPT_CACHE_ROOT = str(tmpdir)
+
+    def script_data():
+        with inventory.open_script_data(hostvars=True) as f:
+            return json.load(f)
+
+    with ignore_inventory_computed_fields():
+        host = inventory.hosts.create(name='ahost', variables={'foo': 'bar'})
+        group = inventory.groups.create(name='agroup')
+        assert script_data() == inventory.get_script_data(hostvars=True)
+        compiled = tmpdir.listdir()
+        assert len(compiled) == 1
+
+        # Changes that don't show in the script keep the compiled one
+        host.description = 'not in the script'
+        host.save(update_fields=['description'])
+        assert script_data()['_meta']['hostvars']['ahost'] == {'foo': 'bar'}
+        assert tmpdir.listdir() == compiled
+
+        group.hosts.add(host)
+        assert script_data()['agroup']['hosts'] == ['ahost']
+        host.variables = '{"foo": "baz"}'
+        host.save()
+        assert script_data()['_meta']['hostvars']['ahost'] == {'foo': 'baz'}
+        assert len(tmpdir.listdir()) == 1
+        assert tmpdir.listdir() != compiled
+
+        # Uncommitted changes are never compiled
+        with transaction.atomic():
+            host.delete()
+            assert inventory.open_script_data(hostvars=True) is None
+
+    inventory.delete()
+    assert tmpdir.listdir() == []
+
+
 @pytest.mark.django_db
 class TestActiveCount:
 
@@ -59,6 +121,66 @@ class TestActiveCount:
         assert Host.objects.active_count() == 1
 
 
+@pytest.mark.django_db
+class TestIncrementalComputedFields:
+
+    FIELDS = ('total_hosts', 'hosts_with_active_failures', 'has_active_failures',
+              'total_groups', 'groups_with_active_failures', 'has_inventory_sources')
+
+    def group_fields(self, inventory):
+        return dict(
+            (g['name'], g) for g in inventory.groups.values('name', *self.FIELDS)
+        )
+
+    def test_matches_full_rebuild(self, inventory):
+        '''
+        root -> mid -> leaf, root -> other -> leaf; unrelated is untouched
+        '''
+        root, mid, other, leaf, unrelated = [
+            inventory.groups.create(name=name) for name in ('root', 'mid', 'other', 'leaf', 'unrelated')
+        ]
+        mid.parents.add(root)
+        other.parents.add(root)
+        leaf.parents.add(mid, other)
+        failed_host = inventory.hosts.create(name='failed')
+        ok_host = inventory.hosts.create(name='ok')
+        leaf.hosts.add(failed_host)
+        other.hosts.add(ok_host)
+        unrelated.hosts.add(ok_host)
+        other.inventory_sources.add(inventory.inventory_sources.create(name='ec2', source='ec2'))
+        job = Job.objects.create(inventory=inventory)
+        summary = JobHostSummary.objects.create(job=job, host=failed_host, failures=1, failed=True)
+        Host.objects.filter(pk=failed_host.pk).update(last_job_host_summary=summary)
+
+        inventory.update_computed_fields_for(host_ids=[failed_host.pk, ok_host.pk])
+        incremental = self.group_fields(inventory)
+        assert incremental['root']['total_hosts'] == 2
+        assert incremental['root']['total_groups'] == 3
+        assert incremental['root']['groups_with_active_failures'] == 3
+        assert incremental['other']['has_inventory_sources'] is True
+        assert Host.objects.get(pk=failed_host.pk).has_active_failures is True
+        assert Inventory.objects.get(pk=inventory.pk).hosts_with_active_failures == 1
+
+        inventory.update_computed_fields()
+        assert self.group_fields(inventory) == incremental
+
+    def test_only_ancestors_updated(self, inventory):
+        parent = inventory.groups.create(name='parent')
+        child = inventory.groups.create(name='child')
+        unrelated = inventory.groups.create(name='unrelated')
+        child.parents.add(parent)
+        host = inventory.hosts.create(name='host')
+        child.hosts.add(host)
+        unrelated.hosts.add(host)
+        inventory.groups.filter(pk=unrelated.pk).update(total_hosts=42)
+
+        inventory.update_computed_fields_for(group_ids=[child.pk])
+        fields = self.group_fields(inventory)
+        assert fields['parent']['total_hosts'] == 1
+        assert fields['child']['total_hosts'] == 1
+        assert fields['unrelated']['total_hosts'] == 42
+
+
 @pytest.mark.django_db
 class TestSCMUpdateFeatures:
 
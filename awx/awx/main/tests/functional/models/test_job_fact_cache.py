@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from django.utils.timezone import utc
+
+from awx.main.models import Host, Job
+
+
+@pytest.mark.django_db
+def test_update_host_facts(inventory):
+    hosts = [inventory.hosts.create(name='host-%d' % i, insights_system_id='old-%d' % i) for i in range(3)]
+    modified = datetime(2017, 12, 14, 10, tzinfo=utc)
+
+    # Loaded as finish_job_fact_cache does
+    updated = list(Host.objects.filter(pk__in=[hosts[0].pk, hosts[1].pk]).only(
+        'name', 'ansible_facts_modified').order_by('pk'))
+    updated[0].ansible_facts = {'foo': 'bar', 'insights': {'system_id': 'new-0'}}
+    updated[0].ansible_facts_modified = modified
+    updated[0].insights_system_id = 'new-0'
+    updated[1].ansible_facts = {'foo': 'baz'}
+    updated[1].ansible_facts_modified = modified + timedelta(hours=1)
+    Job._update_host_facts(updated)
+
+    for host in hosts:
+        host.refresh_from_db()
+    assert hosts[0].ansible_facts == {'foo': 'bar', 'insights': {'system_id': 'new-0'}}
+    assert hosts[0].ansible_facts_modified == modified
+    assert hosts[0].insights_system_id == 'new-0'
+    assert hosts[1].ansible_facts == {'foo': 'baz'}
+    assert hosts[1].ansible_facts_modified == modified + timedelta(hours=1)
+    # Facts without insights leave the host's system id alone
+    assert hosts[1].insights_system_id == 'old-1'
+    assert hosts[2].ansible_facts == {}
+    assert hosts[2].ansible_facts_modified is None
+    assert hosts[2].insights_system_id == 'old-2'
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import mock
+import pytest
+
+from django.utils.timezone import utc
+
+from awx.main.models import Schedule
+
+
+@pytest.mark.django_db
+def test_update_next_runs(job_template):
+    hourly = Schedule.objects.create(name='hourly', unified_job_template=job_template,
+                                     rrule='DTSTART:20151117T050000Z RRULE:FREQ=HOURLY;INTERVAL=1')
+    expired = Schedule.objects.create(name='expired', unified_job_template=job_template,
+                                      rrule='DTSTART:20151117T050000Z RRULE:FREQ=DAILY;INTERVAL=1;COUNT=1')
+    # Both schedules fell behind
+    Schedule.objects.update(next_run=datetime(2015, 11, 17, 5, tzinfo=utc))
+
+    when = datetime(2017, 12, 14, 10, 30, tzinfo=utc)
+    with mock.patch('awx.main.models.schedules.emit_channel_notification') as emit:
+        assert Schedule.objects.all().update_next_runs(when) == sorted([hourly.pk, expired.pk])
+    assert emit.call_count == 2
+
+    hourly.refresh_from_db()
+    expired.refresh_from_db()
+    assert hourly.next_run == datetime(2017, 12, 14, 11, tzinfo=utc)
+    assert expired.next_run is None
+    job_template.refresh_from_db()
+    assert job_template.next_schedule == hourly
+    assert job_template.next_job_run == hourly.next_run
+
+    # Schedules already at their next run are left alone
+    with mock.patch('awx.main.models.schedules.emit_channel_notification'):
+        assert Schedule.objects.all().update_next_runs(when) == []
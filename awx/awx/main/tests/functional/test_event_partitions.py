@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+import mock
+import pytest
+
+from django.db import connection
+from django.utils.timezone import now
+
+from awx.main.models import Job, JobEvent
+from awx.main.management.commands.run_callback_receiver import CallbackBrokerWorker
+from awx.main.utils import event_partitions
+from awx.main.utils.event_partitions import (
+    MIN_SERVER_VERSION, is_partitioned, partition_start, list_event_partitions,
+    partition_event_table, create_event_partitions, drop_event_partitions,
+)
+
+
+@pytest.fixture
+def period(settings):
+    if connection.vendor != 'postgresql' or connection.pg_version < MIN_SERVER_VERSION:
+        pytest.skip('Partitioning the event tables needs PostgreSQL 10')
+    settings.EVENT_PARTITION_DAYS = 7
+    settings.EVENT_PARTITIONS_AHEAD = 2
+    partition_event_table(JobEvent)
+    yield timedelta(days=7)
+    # The conversion is rolled back with the test transaction.
+    event_partitions._partitioned_tables.discard(JobEvent._meta.db_table)
+
+
+@pytest.fixture
+def worker(settings):
+    with mock.patch('awx.main.management.commands.run_callback_receiver.signal'):
+        return CallbackBrokerWorker(None, use_workers=False)
+
+
+@pytest.mark.django_db
+def test_partition_event_table(period):
+    boundary = partition_start(now()) + period
+    assert is_partitioned(JobEvent)
+    assert list_event_partitions(JobEvent) == [('main_jobevent_legacy', None, boundary)]
+
+    created = create_event_partitions(JobEvent)
+    assert created == ['main_jobevent_p{:%Y%m%d}'.format(boundary + period * i) for i in range(2)]
+    assert [p[1:] for p in list_event_partitions(JobEvent)[1:]] == [
+        (boundary, boundary + period), (boundary + period, boundary + period * 2)
+    ]
+    assert create_event_partitions(JobEvent) == []
+
+
+@pytest.mark.django_db
+def test_save_events_past_the_last_partition(period, worker):
+    job = Job.objects.create()
+    created = now() + period
+    bodies = [{'job_id': job.pk, 'event': 'verbose', 'counter': 1, 'stdout': 'hi',
+               'created': created.isoformat()}]
+    worker.save_events(JobEvent, bodies, lambda: JobEvent.bulk_create_from_data(job.pk, bodies))
+    assert JobEvent.objects.get(job=job).created == created
+    assert list_event_partitions(JobEvent)[-1][2] == partition_start(created) + period * 3
+
+
+@pytest.mark.django_db
+def test_save_events_far_in_the_future(period, worker):
+    job = Job.objects.create()
+    bodies = [{'job_id': job.pk, 'event': 'verbose', 'counter': 1, 'stdout': 'hi',
+               'created': '2099-01-01T00:00:00+00:00'}]
+    worker.save_events(JobEvent, bodies, lambda: JobEvent.bulk_create_from_data(job.pk, bodies))
+    assert JobEvent.objects.get(job=job).created < now()
+    # The partitions ahead of time, not all the way to 2099
+    assert len(list_event_partitions(JobEvent)) == 3
+
+
+@pytest.mark.django_db
+def test_drop_event_partitions(period):
+    job = Job.objects.create()
+    JobEvent.objects.create(job=job, event='verbose', created=now())
+    create_event_partitions(JobEvent)
+    boundary = partition_start(now()) + period
+
+    assert drop_event_partitions(JobEvent, boundary, dry_run=True) == ['main_jobevent_legacy']
+    assert JobEvent.objects.count() == 1
+    assert drop_event_partitions(JobEvent, boundary) == ['main_jobevent_legacy']
+    assert JobEvent.objects.count() == 0
+    assert len(list_event_partitions(JobEvent)) == 2
@@ -1,9 +1,14 @@
 import pytest
 
+from django.db import connection
+from django.test.utils import override_settings
+
 from awx.main.models import (
     Role,
     Organization,
     Project,
+    batch_role_ancestor_rebuilding,
+    compute_role_ancestors,
 )
 
 
@@ -68,6 +73,73 @@ def test_accessible_objects(organization, alice, bob):
     assert Organization.accessible_objects(bob, 'admin_role').count() == 0
 
 
+def test_compute_role_ancestors():
+    # 1 is outside of the graph being computed, 2 -> 3 -> 4 -> 2 is a loop
+    parents = {2: [1], 3: [2], 4: [3], 5: [4]}
+    parents[2].append(4)
+    ancestors = compute_role_ancestors([2, 3, 4, 5], parents, {1: [0, 1]})
+    assert ancestors == {
+        2: set([0, 1, 2, 3, 4]),
+        3: set([0, 1, 2, 3, 4]),
+        4: set([0, 1, 2, 3, 4]),
+        5: set([0, 1, 2, 3, 4, 5]),
+    }
+
+
+@pytest.mark.django_db
+def test_in_memory_ancestor_rebuilding(organization, alice):
+    A = Role.objects.create()
+    B = Role.objects.create()
+    A.members.add(alice)
+    with batch_role_ancestor_rebuilding(in_memory=True):
+        A.children.add(B)
+        B.children.add(organization.admin_role)
+        organization.admin_role.children.add(A)
+        assert alice not in organization.admin_role
+    assert alice in organization.admin_role
+    assert alice in B
+
+    # Breaking the loop leaves nothing above the organization admin role but
+    # its original parents
+    with batch_role_ancestor_rebuilding(in_memory=True):
+        A.children.remove(B)
+    assert alice not in organization.admin_role
+    assert alice not in B
+    assert A in organization.admin_role.children.all()
+
+
+def run_on_commit_callbacks():
+    # Tests never commit; run what would have run on commit.
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for sids, func in callbacks:
+        func()
+
+
+@pytest.mark.django_db
+@override_settings(RBAC_ACCESSIBLE_PK_CACHE_TIMEOUT=300)
+def test_accessible_pk_cache(organization, alice, bob):
+    A = Role.objects.create()
+    A.members.add(alice)
+    A.children.add(organization.admin_role)
+    # Not cached until the role changes are committed
+    assert not isinstance(Organization.accessible_pk_qs(alice, 'admin_role'), list)
+    run_on_commit_callbacks()
+
+    assert Organization.accessible_pk_qs(alice, 'admin_role') == [organization.pk]
+    assert Organization.accessible_pk_qs(bob, 'admin_role') == []
+    assert Organization.accessible_objects(alice, 'admin_role').count() == 1
+
+    A.members.add(bob)
+    assert Organization.accessible_objects(bob, 'admin_role').count() == 1
+    run_on_commit_callbacks()
+    assert Organization.accessible_pk_qs(bob, 'admin_role') == [organization.pk]
+
+    A.children.remove(organization.admin_role)
+    run_on_commit_callbacks()
+    assert Organization.accessible_pk_qs(alice, 'admin_role') == []
+    assert Organization.accessible_objects(bob, 'admin_role').count() == 0
+
+
 @pytest.mark.django_db
 def test_team_symantics(organization, team, alice):
     assert alice not in organization.auditor_role
@@ -2,16 +2,18 @@ import pytest
 import mock
 import os
 
+from django.core.cache import cache
 from django.utils.timezone import now, timedelta
 
 from awx.main.tasks import (
     RunProjectUpdate, RunInventoryUpdate,
     awx_isolated_heartbeat,
+    awx_periodic_scheduler,
     isolated_manager
 )
 from awx.main.models import (
     ProjectUpdate, InventoryUpdate, InventorySource,
-    Instance, InstanceGroup
+    Instance, InstanceGroup, JobTemplate, Schedule, TowerScheduleState
 )
 
 
@@ -157,3 +159,29 @@ class TestIsolatedManagementTask:
         iso_instance = Instance.objects.get(hostname='isolated')
         check_mock.assert_not_called()
         assert iso_instance.capacity == 103
+
+
+@pytest.mark.django_db
+def test_periodic_scheduler(job_template):
+    due = Schedule.objects.create(name='due', unified_job_template=job_template,
+                                  rrule='DTSTART:20151117T050000Z RRULE:FREQ=MINUTELY;INTERVAL=20')
+    behind = Schedule.objects.create(name='behind', unified_job_template=job_template,
+                                     rrule='DTSTART:20151117T050000Z RRULE:FREQ=HOURLY;INTERVAL=1')
+    state = TowerScheduleState.get_solo()
+    state.schedule_last_run = now() - timedelta(minutes=30)
+    state.save()
+    Schedule.objects.filter(pk=due.pk).update(next_run=now() - timedelta(minutes=10))
+    Schedule.objects.filter(pk=behind.pk).update(next_run=now() - timedelta(hours=2))
+
+    with mock.patch.object(JobTemplate, 'create_unified_job') as create_unified_job:
+        create_unified_job.return_value.signal_start.return_value = True
+        awx_periodic_scheduler()
+    assert create_unified_job.call_count == 1
+    assert create_unified_job.call_args[1]['_eager_fields']['schedule'] == due
+
+    for schedule in (due, behind):
+        schedule.refresh_from_db()
+        assert schedule.next_run > now()
+    metrics = cache.get('scheduler_metrics')
+    assert (metrics['behind'], metrics['due'], metrics['launched']) == (1, 1, 1)
+    assert 600 <= metrics['lag'] < 660
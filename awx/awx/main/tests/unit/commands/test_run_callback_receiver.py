@@ -0,0 +1,150 @@
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved
+
+# Python
+from Queue import Full as QueueFull
+
+import mock
+import pytest
+
+# Django
+from django.db import DatabaseError, IntegrityError, OperationalError
+
+# AWX
+from awx.main.models import JobEvent
+from awx.main.management.commands.run_callback_receiver import (
+    CallbackBrokerWorker,
+    JobEventBuffer,
+)
+
+
+class TestJobEventBuffer():
+
+    def test_flush_when_full(self):
+        buff = JobEventBuffer(size=2, interval=10)
+        buff.add(('job_id', 1), {'counter': 1}, now=100)
+        assert buff.ready(now=100) == []
+        buff.add(('job_id', 1), {'counter': 2}, now=100)
+        assert buff.ready(now=100) == [(('job_id', 1), [{'counter': 1}, {'counter': 2}])]
+        assert buff.batches == {}
+
+    def test_flush_when_expired(self):
+        buff = JobEventBuffer(size=100, interval=0.5)
+        buff.add(('job_id', 1), {'counter': 1}, now=100)
+        buff.add(('ad_hoc_command_id', 1), {'counter': 1}, now=100.4)
+        assert buff.ready(now=100.2) == []
+        assert buff.ready(now=100.5) == [(('job_id', 1), [{'counter': 1}])]
+        assert buff.ready(now=100.9) == [(('ad_hoc_command_id', 1), [{'counter': 1}])]
+
+    def test_next_flush_in(self):
+        buff = JobEventBuffer(size=100, interval=0.5)
+        assert buff.next_flush_in(default=1, now=100) == 1
+        buff.add(('job_id', 1), {'counter': 1}, now=100)
+        assert buff.next_flush_in(default=1, now=100.25) == 0.25
+        assert buff.next_flush_in(default=1, now=101) == 0.01
+
+    def test_drain(self):
+        buff = JobEventBuffer(size=100, interval=10)
+        buff.add(('job_id', 1), {'counter': 1}, now=100)
+        buff.add(('job_id', 2), {'counter': 1}, now=100)
+        assert buff.drain() == [
+            (('job_id', 1), [{'counter': 1}]),
+            (('job_id', 2), [{'counter': 1}]),
+        ]
+        assert buff.drain() == []
+
+
+class TestCallbackBrokerWorker():
+
+    @pytest.fixture
+    def worker(self, settings):
+        settings.JOB_EVENT_WORKERS = 4
+        with mock.patch('awx.main.management.commands.run_callback_receiver.signal'):
+            worker = CallbackBrokerWorker(None, use_workers=False)
+        for idx in range(4):
+            worker.worker_queues.append([0, mock.Mock(), mock.Mock(), 0])
+        return worker
+
+    def test_route_by_job(self, worker):
+        assert worker.route({'job_id': 6, 'uuid': 'a'}) == 2
+        assert worker.route({'job_id': 6, 'uuid': 'b'}) == 2
+        assert worker.route({'ad_hoc_command_id': 3}) == 3
+
+    def test_full_queue_waits_for_worker(self, worker):
+        queue_actual = worker.worker_queues[1][1]
+        queue_actual.put.side_effect = [QueueFull(), QueueFull(), None]
+        with mock.patch.object(worker, 'publish_metrics'):
+            assert worker.write_queue_worker(1, {'job_id': 1}) == 1
+        assert queue_actual.put.call_count == 3
+        assert worker.worker_queues[1][0] == 1
+        for idx in (0, 2, 3):
+            worker.worker_queues[idx][1].put.assert_not_called()
+
+    def test_dead_worker_drops(self, worker):
+        queue_actual, process = worker.worker_queues[1][1:3]
+        queue_actual.put.side_effect = QueueFull()
+        process.is_alive.return_value = False
+        assert worker.write_queue_worker(1, {'job_id': 1}) is None
+        assert worker.get_metrics()['worker_1_dropped'] == 1
+        assert worker.get_metrics()['dropped'] == 1
+
+    def test_missing_worker_drops(self, worker):
+        del worker.worker_queues[:]
+        assert worker.write_queue_worker(1, {'job_id': 1}) is None
+
+    def test_metrics(self, worker):
+        for idx, (_, queue_actual, _, _) in enumerate(worker.worker_queues):
+            queue_actual.qsize.return_value = idx
+        metrics = worker.get_metrics()
+        assert metrics['queue_depth'] == 6
+        assert metrics['worker_3_queue_depth'] == 3
+
+    def integrity_error(self, pgcode, constraint_name=None):
+        exc = IntegrityError()
+        exc.__cause__ = mock.Mock(pgcode=pgcode, diag=mock.Mock(constraint_name=constraint_name))
+        return exc
+
+    def test_save_events_creates_missing_partitions(self, worker):
+        save = mock.Mock(side_effect=[self.integrity_error('23514'), 'saved'])
+        bodies = [{'job_id': 1, 'created': '2031-01-01T00:00:00'}]
+        with mock.patch('awx.main.management.commands.run_callback_receiver.create_event_partitions') as create, \
+                mock.patch('awx.main.management.commands.run_callback_receiver.clamp_event_times') as clamp:
+            assert worker.save_events(JobEvent, bodies, save) == 'saved'
+        clamp.assert_called_once_with(bodies)
+        create.assert_called_once_with(JobEvent, until=clamp.return_value)
+        assert save.call_count == 2
+
+    def test_save_events_other_errors(self, worker):
+        save = mock.Mock(side_effect=self.integrity_error('23505', 'main_jobevent_pkey'))
+        with mock.patch('awx.main.management.commands.run_callback_receiver.create_event_partitions') as create:
+            with pytest.raises(IntegrityError):
+                worker.save_events(JobEvent, [{'job_id': 1}], save)
+        create.assert_not_called()
+
+    def test_check_event_partitions_hourly(self, worker):
+        with mock.patch('awx.main.management.commands.run_callback_receiver.is_partitioned', return_value=True), \
+                mock.patch('awx.main.management.commands.run_callback_receiver.extend_event_partitions') as extend:
+            worker.check_event_partitions(now=10000)
+            worker.check_event_partitions(now=10000 + 60)
+            assert extend.call_count == 2
+            worker.check_event_partitions(now=10000 + 3600)
+            assert extend.call_count == 4
+
+    def test_flush_events_retries_only_unsaved(self, worker, mocker):
+        saved = []
+        failures = [OperationalError()]
+
+        def create_from_data(**body):
+            if body['uuid'] == 'b' and failures:
+                raise failures.pop()
+            saved.append(body['uuid'])
+
+        mocker.patch.object(JobEvent, 'bulk_create_from_data', side_effect=DatabaseError())
+        mocker.patch.object(JobEvent, 'create_from_data', side_effect=create_from_data)
+        mocker.patch.object(worker, 'unsaved_events',
+                            side_effect=lambda model, kind, job_id, bodies: [b for b in bodies if b['uuid'] not in saved])
+        mocker.patch('awx.main.management.commands.run_callback_receiver.time.sleep')
+        mocker.patch('awx.main.management.commands.run_callback_receiver.django_connection')
+        bodies = [{'job_id': 1, 'uuid': uuid} for uuid in 'abc']
+        assert worker.flush_events([(('job_id', 1), bodies)], mock.Mock()) is True
+        assert saved == ['a', 'b', 'c']
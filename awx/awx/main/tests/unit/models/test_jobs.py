@@ -29,6 +29,17 @@ class CacheMock(object):
     def delete(self, key):
         del self.d[key]
 
+    def get_multi(self, keys):
+        return dict((key, self.d[key]) for key in keys if key in self.d)
+
+    def set_multi(self, mapping):
+        self.d.update(mapping)
+        return []
+
+    def delete_multi(self, keys):
+        for key in keys:
+            self.d.pop(key, None)
+
 
 @pytest.fixture
 def old_time():
@@ -67,6 +78,9 @@ def mock_cache(mocker):
     mocker.patch.object(cache, 'set', wraps=cache.set)
     mocker.patch.object(cache, 'get', wraps=cache.get)
     mocker.patch.object(cache, 'delete', wraps=cache.delete)
+    mocker.patch.object(cache, 'get_multi', wraps=cache.get_multi)
+    mocker.patch.object(cache, 'set_multi', wraps=cache.set_multi)
+    mocker.patch.object(cache, 'delete_multi', wraps=cache.delete_multi)
     return cache
 
 
@@ -90,26 +104,30 @@ def test_start_job_fact_cache(hosts, job, inventory, mocker):
 
     job.start_job_fact_cache()
 
-    job._get_memcache_connection().set.assert_any_call('5', [h.name for h in hosts])
-    for host in hosts:  
-        job._get_memcache_connection().set.assert_any_call('{}-{}'.format(5, base64.b64encode(host.name)), json.dumps(host.ansible_facts))
-        job._get_memcache_connection().set.assert_any_call('{}-{}-modified'.format(5, base64.b64encode(host.name)), host.ansible_facts_modified.isoformat())
+    cache = job._get_memcache_connection()
+    cache.set.assert_any_call('5', [h.name for h in hosts])
+    assert cache.set_multi.call_count == 1
+    for host in hosts:
+        assert cache.d['{}-{}'.format(5, base64.b64encode(host.name))] == json.dumps(host.ansible_facts)
+        assert cache.d['{}-{}-modified'.format(5, base64.b64encode(host.name))] == host.ansible_facts_modified.isoformat()
 
 
 def test_start_job_fact_cache_existing_host(hosts, hosts2, job, job2, inventory, mocker):
 
     job.start_job_fact_cache()
 
-    for host in hosts:  
-        job._get_memcache_connection().set.assert_any_call('{}-{}'.format(5, base64.b64encode(host.name)), json.dumps(host.ansible_facts))
-        job._get_memcache_connection().set.assert_any_call('{}-{}-modified'.format(5, base64.b64encode(host.name)), host.ansible_facts_modified.isoformat())
+    cache = job._get_memcache_connection()
+    for host in hosts:
+        assert cache.d['{}-{}'.format(5, base64.b64encode(host.name))] == json.dumps(host.ansible_facts)
+        assert cache.d['{}-{}-modified'.format(5, base64.b64encode(host.name))] == host.ansible_facts_modified.isoformat()
 
-    job._get_memcache_connection().set.reset_mock()
+    cache.set_multi.reset_mock()
 
     job2.start_job_fact_cache()
 
     # Ensure hosts2 ansible_facts didn't overwrite hosts ansible_facts
-    ansible_facts_cached = job._get_memcache_connection().get('{}-{}'.format(5, base64.b64encode(hosts2[0].name)))
+    cache.set_multi.assert_not_called()
+    ansible_facts_cached = cache.get('{}-{}'.format(5, base64.b64encode(hosts2[0].name)))
     assert ansible_facts_cached == json.dumps(hosts[1].ansible_facts)
 
 
@@ -128,8 +146,7 @@ def test_memcached_fact_modified_key_unicode(job):
 def test_finish_job_fact_cache(job, hosts, inventory, mocker, new_time):
 
     job.start_job_fact_cache()
-    for h in hosts:
-        h.save = mocker.Mock()
+    job._update_host_facts = mocker.Mock()
 
     host_key = job.memcached_fact_host_key(hosts[1].name)
     modified_key = job.memcached_fact_modified_key(hosts[1].name)
@@ -137,12 +154,23 @@ def test_finish_job_fact_cache(job, hosts, inventory, mocker, new_time):
     ansible_facts_new = {"foo": "bar", "insights": {"system_id": "updated_by_scan"}}
     job._get_memcache_connection().set(host_key, json.dumps(ansible_facts_new))
     job._get_memcache_connection().set(modified_key, new_time.isoformat())
-    
+
     job.finish_job_fact_cache()
 
-    hosts[0].save.assert_not_called()
-    hosts[2].save.assert_not_called()
     assert hosts[1].ansible_facts == ansible_facts_new
     assert hosts[1].insights_system_id == "updated_by_scan"
-    hosts[1].save.assert_called_once_with()
+    job._update_host_facts.assert_called_once_with([hosts[1]])
+
+
+def test_finish_job_fact_cache_batches(job, hosts, inventory, mocker, settings):
+    settings.AWX_FACT_CACHE_BATCH_SIZE = 2
+    job.start_job_fact_cache()
+    job._update_host_facts = mocker.Mock()
+    cache = job._get_memcache_connection()
+    cache.get_multi.reset_mock()
+
+    job.finish_job_fact_cache()
 
+    # One lookup of the modified keys per batch of hosts; nothing changed.
+    assert cache.get_multi.call_count == 2
+    job._update_host_facts.assert_not_called()
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from django.utils.timezone import utc
+
+from awx.main.models import schedules
+from awx.main.models.schedules import parse_rrule
+
+
+def test_parse_rrule_counted():
+    future_rs, dtstart, dtend = parse_rrule('DTSTART:20151117T050000Z RRULE:FREQ=DAILY;INTERVAL=1;COUNT=3')
+    assert dtstart == datetime(2015, 11, 17, 5, tzinfo=utc)
+    assert dtend == datetime(2015, 11, 19, 5, tzinfo=utc)
+    assert future_rs.after(datetime(2015, 11, 18, 12, tzinfo=utc)) == dtend
+    assert future_rs.after(dtend) is None
+
+
+def test_parse_rrule_unbounded():
+    future_rs, dtstart, dtend = parse_rrule('DTSTART:20151117T050000Z RRULE:FREQ=HOURLY;INTERVAL=1')
+    assert dtstart == datetime(2015, 11, 17, 5, tzinfo=utc)
+    assert dtend is None
+    assert future_rs.after(datetime(2017, 12, 14, 10, 30, tzinfo=utc)) == datetime(2017, 12, 14, 11, tzinfo=utc)
+
+
+def test_parse_rrule_is_cached(mocker):
+    rrule = 'DTSTART:20151117T050000Z RRULE:FREQ=WEEKLY;INTERVAL=1;COUNT=2'
+    first = parse_rrule(rrule)
+    rrulestr = mocker.patch.object(schedules.dateutil.rrule, 'rrulestr')
+    assert parse_rrule(rrule) is first
+    assert not rrulestr.called
@@ -70,7 +70,8 @@ def job(mocker):
         'created_by.pk': 1, 'created_by.username': 'admin',
         'launch_type': 'manual',
         'awx_meta_vars.return_value': {},
-        'inventory.get_script_data.return_value': {}})
+        'inventory.get_script_data.return_value': {},
+        'inventory.open_script_data.return_value': None})
     ret.project = mocker.MagicMock(scm_revision='asdf1234')
     return ret
 
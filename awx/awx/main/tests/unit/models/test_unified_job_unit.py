@@ -64,6 +64,16 @@ def test_cancel_job_explanation(unified_job):
     unified_job.save.assert_called_with(update_fields=['cancel_flag', 'start_args', 'status', 'job_explanation'])
 
 
+def test_cancel_running_broadcasts(unified_job, mocker):
+    unified_job.status = 'running'
+    on_commit = mocker.patch('awx.main.models.unified_jobs.connection.on_commit')
+
+    unified_job.cancel()
+
+    assert unified_job.status == 'running'
+    on_commit.assert_called_once_with(unified_job._broadcast_cancel)
+
+
 def test_log_representation():
     '''
     Common representation used inside of log messages
@@ -0,0 +1,93 @@
+import pytest
+
+from django.core.cache import cache
+
+from awx.main import consumers
+from awx.main.consumers import EventEmitter, batched_subscription_key
+
+
+@pytest.fixture
+def sent(mocker, settings):
+    settings.WEBSOCKET_EVENT_BATCH_SIZE = 8
+    settings.WEBSOCKET_EVENT_BATCH_MIN_INTERVAL = 0.1
+    settings.WEBSOCKET_EVENT_BATCH_MAX_INTERVAL = 0.4
+    cache.clear()
+    for group in ('job_events-1', 'job_events-2'):
+        cache.set(batched_subscription_key(group), True)
+    messages = []
+    mocker.patch.object(consumers, 'emit_channel_notification',
+                        side_effect=lambda group, payload: messages.append((group, payload)))
+    return messages
+
+
+def test_emit_without_coalescing(sent):
+    EventEmitter().emit('job_events-1', {'counter': 1})
+    assert sent == [('job_events-1', {'counter': 1}), ('job_events-1-batched', [{'counter': 1}])]
+
+
+def test_emit_without_batched_subscribers(sent):
+    emitter = EventEmitter()
+    emitter.emit('job_events-3', {'counter': 1}, now=100)
+    emitter.coalesce = True
+    emitter.emit('job_events-3', {'counter': 2}, now=100.5)
+    emitter.flush(drain=True)
+    assert sent == [('job_events-3', {'counter': 1}), ('job_events-3', {'counter': 2})]
+
+    # A subscription is noticed once the last lookup is old enough
+    cache.set(batched_subscription_key('job_events-3'), True)
+    emitter.emit('job_events-3', {'counter': 3}, now=100.9)
+    assert 'job_events-3' not in emitter.buffers
+    emitter.emit('job_events-3', {'counter': 4}, now=101.5)
+    assert emitter.buffers['job_events-3'] == (101.5, [{'counter': 4}])
+
+
+def test_emit_coalesces_per_group(sent):
+    emitter = EventEmitter()
+    emitter.coalesce = True
+    emitter.emit('job_events-1', {'counter': 1}, now=100)
+    emitter.emit('job_events-2', {'counter': 1}, now=100.5)
+    emitter.emit('job_events-1', {'counter': 2}, now=100.5)
+    assert [group for group, _ in sent] == ['job_events-1', 'job_events-2', 'job_events-1']
+
+    emitter.flush(now=100.25)
+    assert sent[3:] == [('job_events-1-batched', [{'counter': 1}, {'counter': 2}])]
+    assert abs(emitter.next_flush_in(now=100.25) - 0.35) < 1e-6
+    emitter.flush(drain=True)
+    assert sent[4:] == [('job_events-2-batched', [{'counter': 1}])]
+
+
+def test_window_adapts_to_event_rate(sent):
+    emitter = EventEmitter()
+    emitter.coalesce = True
+    for i in range(8):
+        emitter.emit('job_events-1', {'counter': i}, now=100)
+    # A full buffer is sent right away, and the group's window doubles.
+    assert sent[-1] == ('job_events-1-batched', [{'counter': i} for i in range(8)])
+    assert emitter.window('job_events-1') == 0.2
+    for i in range(16):
+        emitter.emit('job_events-1', {'counter': i}, now=100)
+    assert emitter.window('job_events-1') == 0.4
+
+    # Quiet groups go back to the shortest window.
+    emitter.emit('job_events-1', {'counter': 8}, now=101)
+    emitter.flush(now=101.5)
+    assert emitter.window('job_events-1') == 0.2
+    emitter.emit('job_events-1', {'counter': 9}, now=102)
+    emitter.flush(now=102.3)
+    assert emitter.window('job_events-1') == 0.1
+    assert 'job_events-1' not in emitter.windows
+
+
+def test_idle_groups_are_pruned(sent):
+    emitter = EventEmitter()
+    emitter.coalesce = True
+    for i in range(8):
+        emitter.emit('job_events-1', {'counter': i}, now=1000)
+    emitter.emit('job_events-2', {'counter': 1}, now=1200)
+    assert 'job_events-1' in emitter.windows
+
+    emitter.flush(now=1350)
+    assert 'job_events-1' not in emitter.windows
+    assert 'job_events-1' not in emitter.subscriptions
+    assert 'job_events-1' not in emitter.last_seen
+    assert 'job_events-2' in emitter.last_seen
@@ -0,0 +1,66 @@
+import pytest
+
+from awx.main.scheduler.dag_simple import SimpleDAG
+
+
+@pytest.fixture
+def dag():
+    '''
+    a --success--> b --always--> d
+    a --failure--> c --success--> d
+    '''
+    dag = SimpleDAG()
+    for obj in ('a', 'b', 'c', 'd'):
+        dag.add_node(obj)
+    dag.add_edges([
+        ('a', 'b', 'success_nodes'),
+        ('a', 'c', 'failure_nodes'),
+        ('b', 'd', 'always_nodes'),
+        ('c', 'd', 'success_nodes'),
+    ])
+    return dag
+
+
+def objs(nodes):
+    return [n['node_object'] for n in nodes]
+
+
+def test_add_node_is_idempotent(dag):
+    dag.add_node('a')
+    assert len(dag) == 4
+    assert 'a' in dag
+    assert 'z' not in dag
+    assert dag.find_ord('c') == 2
+    assert dag.find_ord('z') is None
+
+
+def test_add_edge_unknown_node(dag):
+    with pytest.raises(LookupError):
+        dag.add_edge('a', 'z')
+
+
+def test_get_dependencies(dag):
+    assert objs(dag.get_dependencies('a')) == ['b', 'c']
+    assert objs(dag.get_dependencies('a', 'failure_nodes')) == ['c']
+    assert objs(dag.get_dependencies('d')) == []
+    assert objs(dag.get_dependencies('z')) == []
+
+
+def test_get_dependents(dag):
+    assert objs(dag.get_dependents('d')) == ['b', 'c']
+    assert objs(dag.get_dependents('d', 'success_nodes')) == ['c']
+    assert objs(dag.get_dependents('a')) == []
+
+
+def test_root_and_leaf_nodes(dag):
+    assert objs(dag.get_root_nodes()) == ['a']
+    assert objs(dag.get_leaf_nodes()) == ['d']
+
+
+def test_unhashable_nodes():
+    dag = SimpleDAG()
+    dag.add_node({'name': 'a'})
+    dag.add_node({'name': 'b'})
+    dag.add_edge({'name': 'a'}, {'name': 'b'}, 'success_nodes')
+    assert dag.find_ord({'name': 'b'}) == 1
+    assert objs(dag.get_dependencies({'name': 'a'})) == [{'name': 'b'}]
@@ -3,15 +3,19 @@
 
 import mock
 import pytest
+from datetime import timedelta
 
 from django.utils.timezone import now as tz_now
 from django.db import DatabaseError
 
 from awx.main.scheduler import TaskManager
+from awx.main.scheduler.task_manager import IncrementalTaskCache
 from awx.main.models import (
     Job,
     Instance,
     InstanceGroup,
+    InventoryUpdate,
+    UnifiedJob,
 )
 from django.core.cache import cache
 
@@ -67,3 +71,58 @@ class TestCleanupInconsistentCeleryTasks():
         active_task_queues, queues = tm.get_active_tasks()
         assert 'host1' in queues
         assert 'host2' in queues
+
+
+class TestIncrementalTaskCache():
+
+    @pytest.fixture
+    def modified(self):
+        return tz_now()
+
+    @pytest.fixture
+    def task_cache(self, modified):
+        task_cache = IncrementalTaskCache()
+        task_cache.reset([
+            Job(id=1, status='running', created=modified, modified=modified),
+            Job(id=2, status='pending', created=modified, modified=modified),
+        ])
+        return task_cache
+
+    def apply(self, task_cache, current, loaded):
+        filter_mock = mock.MagicMock()
+        filter_mock.return_value.values_list.return_value = current
+        filter_mock.return_value.prefetch_related.return_value = loaded
+        with mock.patch.object(UnifiedJob.objects, 'filter', filter_mock):
+            return task_cache.apply_deltas(), filter_mock
+
+    def test_unchanged_tasks_are_not_reloaded(self, task_cache, modified):
+        deltas, filter_mock = self.apply(task_cache, [(1, 'running', modified), (2, 'pending', modified)], [])
+        assert deltas == 0
+        assert filter_mock.call_count == 1
+        assert sorted(task_cache.tasks.keys()) == [1, 2]
+
+    def test_finished_tasks_are_dropped(self, task_cache, modified):
+        deltas, _ = self.apply(task_cache, [(2, 'pending', modified)], [])
+        assert deltas == 1
+        assert task_cache.tasks.keys() == [2]
+
+    def test_new_and_changed_tasks_are_loaded(self, task_cache, modified):
+        later = modified + timedelta(seconds=1)
+        loaded = [
+            Job(id=2, status='waiting', created=modified, modified=later),
+            Job(id=3, status='pending', created=later, modified=later),
+        ]
+        deltas, filter_mock = self.apply(task_cache, [(1, 'running', modified), (2, 'waiting', later),
+                                                      (3, 'pending', later)], loaded)
+        assert deltas == 2
+        assert sorted(filter_mock.call_args_list[1][1]['pk__in']) == [2, 3]
+        assert task_cache.tasks[2].status == 'waiting'
+        assert [t.id for t in task_cache.sorted_tasks()] == [1, 2, 3]
+
+    def test_file_inventory_updates_are_ignored(self, task_cache, modified):
+        update = InventoryUpdate(id=4, status='pending', source='file', created=modified, modified=modified)
+        current = [(1, 'running', modified), (2, 'pending', modified), (4, 'pending', modified)]
+        self.apply(task_cache, current, [update])
+        assert 4 not in task_cache.tasks
+        deltas, _ = self.apply(task_cache, current, [])
+        assert deltas == 0
@@ -13,6 +13,7 @@ import mock
 import pytest
 import yaml
 from django.conf import settings
+from django.core.cache import cache
 
 
 from awx.main.models import (
@@ -61,6 +62,75 @@ def test_work_success_callback_missing_job():
         assert tasks.handle_work_success(None, task_data) is None
 
 
+class TestInventoryComputedFieldsDelta:
+
+    @pytest.fixture
+    def inventory(self, mocker):
+        cache.clear()
+        return mocker.patch.object(Inventory.objects, 'filter').return_value.first.return_value
+
+    def queue(self, seq, delta):
+        cache.set(tasks._computed_fields_key(1, 'seq'), seq, None)
+        cache.set(tasks._computed_fields_key(1, seq), delta)
+
+    def test_applies_deltas(self, inventory):
+        self.queue(1, {'hosts': [1, 2], 'groups': []})
+        self.queue(2, {'hosts': [3], 'groups': [4]})
+        tasks.update_inventory_computed_fields_delta(1)
+        inventory.update_computed_fields_for.assert_called_once_with(set([1, 2, 3]), set([4]))
+        assert cache.get(tasks._computed_fields_key(1, 'done')) == 2
+        assert cache.get(tasks._computed_fields_key(1, 1)) is None
+
+    def test_rebuilds_when_too_many_deltas(self, inventory, mocker, settings):
+        settings.INVENTORY_COMPUTED_FIELDS_MAX_DELTAS = 10
+        cache.set(tasks._computed_fields_key(1, 'seq'), 1000000, None)
+        get_many = mocker.spy(cache, 'get_many')
+        tasks.update_inventory_computed_fields_delta(1)
+        assert not get_many.called
+        inventory.update_computed_fields.assert_called_once_with(update_hosts=True)
+        # Requests are numbered from 1 again after a full rebuild
+        assert cache.get(tasks._computed_fields_key(1, 'seq')) == 0
+        assert cache.get(tasks._computed_fields_key(1, 'done')) == 0
+
+    def test_rebuilds_when_delta_lost(self, inventory):
+        self.queue(2, {'hosts': [3], 'groups': []})
+        tasks.update_inventory_computed_fields_delta(1)
+        inventory.update_computed_fields.assert_called_once_with(update_hosts=True)
+        assert not inventory.update_computed_fields_for.called
+        assert cache.get(tasks._computed_fields_key(1, 'seq')) == 0
+
+
+def test_cancel_watcher(mocker, settings):
+    settings.AWX_CANCEL_CHECK_INTERVAL = 1
+    settings.AWX_CANCEL_DB_CHECK_INTERVAL = 30
+    clock = mocker.patch('awx.main.tasks.time.time', return_value=100)
+    cache_get = mocker.patch('awx.main.tasks.cache.get', return_value=None)
+    model = mock.Mock()
+    cancel_flag = model.objects.filter.return_value.values_list.return_value.first
+    cancel_flag.return_value = False
+    watcher = tasks.CancelWatcher(model, 1)
+
+    # Rate limited: nothing is checked within a second of the last check.
+    assert watcher() is False
+    assert not cache_get.called
+    clock.return_value = 101
+    assert watcher() is False
+    cache_get.assert_called_once_with('unified-job-cancel-1')
+    assert not model.objects.filter.called
+
+    # The database is read as a fallback every AWX_CANCEL_DB_CHECK_INTERVAL.
+    clock.return_value = 130
+    assert watcher() is False
+    model.objects.filter.assert_called_once_with(pk=1)
+
+    cache_get.return_value = True
+    clock.return_value = 131
+    assert watcher() is True
+    clock.return_value = 131.5
+    assert watcher() is True
+    assert cache_get.call_count == 3
+
+
 def test_send_notifications_list(mocker):
     patches = list()
 
@@ -209,7 +279,8 @@ class TestJobExecution:
                 mock.patch.object(cls, 'inventory', mock.Mock(
                     pk=1,
                     get_script_data=lambda *args, **kw: self.INVENTORY_DATA,
-                    spec_set=['pk', 'get_script_data']
+                    open_script_data=lambda *args, **kw: None,
+                    spec_set=['pk', 'get_script_data', 'open_script_data']
                 ))
             )
         for p in self.patches:
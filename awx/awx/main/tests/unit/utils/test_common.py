@@ -2,6 +2,7 @@
 
 # Copyright (c) 2017 Ansible, Inc.
 # All Rights Reserved.
+import collections
 import os
 import pytest
 from uuid import uuid4
@@ -164,3 +165,10 @@ def test_extract_ansible_vars():
     redacted, var_list = common.extract_ansible_vars(json.dumps(my_dict))
     assert var_list == set(['ansible_connetion_setting'])
     assert redacted == {"foobar": "baz"}
+
+
+def test_cache_list_related_skips_non_model_items():
+    Category = collections.namedtuple('Category', ('url', 'slug', 'name'))
+    page = [Category('/api/v2/settings/all/', 'all', 'All')]
+    common.cache_list_related(page, ['created_by'])
+    assert page == [Category('/api/v2/settings/all/', 'all', 'All')]
@@ -110,3 +110,25 @@ def test_large_data_payload(fake_callback, fake_cache, wrapped_handle):
     assert recomb_data['role'] == 'some_path_to_role'
     assert 'event' in recomb_data
     assert recomb_data['event'] == 'foo'
+
+
+def test_partial_event_store_batches_lookups(fake_callback, job_event_callback):
+    class FakeStore(object):
+        lookups = []
+
+        def get_many(self, uuids):
+            self.lookups.append(uuids)
+            return dict((u, {'event': 'event-{}'.format(u)}) for u in uuids)
+
+    store = FakeStore()
+    wrapped_handle = OutputEventFilter(cStringIO.StringIO(), job_event_callback,
+                                       partial_event_store=store)
+    chunk = cStringIO.StringIO()
+    for event_uuid in ('a', 'b', 'c'):
+        write_encoded_event_data(chunk, {'uuid': event_uuid})
+        chunk.write('ok: [localhost]\n')
+    write_encoded_event_data(chunk, {})
+    wrapped_handle.write(chunk.getvalue())
+
+    assert store.lookups == [['a', 'b', 'c']]
+    assert [e['event'] for e in fake_callback] == ['event-a', 'event-b', 'event-c']
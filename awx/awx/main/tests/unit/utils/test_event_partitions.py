@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import mock
+import pytest
+
+from django.utils.timezone import utc
+
+from awx.main.models import Job, JobEvent
+from awx.main.utils import event_partitions
+from awx.main.utils.event_partitions import (
+    EVENT_TIME_SLACK, partition_start, filter_event_partitions, extend_event_partitions,
+    is_missing_partition_error, clamp_event_times, _index_columns, _parse_bound,
+)
+
+
+@pytest.mark.parametrize('when, start', [
+    (datetime(2017, 12, 14, 10, 30, tzinfo=utc), datetime(2017, 12, 14, tzinfo=utc)),
+    (datetime(2017, 12, 20, 23, 59, tzinfo=utc), datetime(2017, 12, 14, tzinfo=utc)),
+    (datetime(2017, 12, 21, tzinfo=utc), datetime(2017, 12, 21, tzinfo=utc)),
+])
+def test_partition_start(settings, when, start):
+    settings.EVENT_PARTITION_DAYS = 7
+    assert partition_start(when) == start
+
+
+def test_parse_bound():
+    assert _parse_bound('MINVALUE') is None
+    assert _parse_bound("'2017-12-21 00:00:00+00'") == datetime(2017, 12, 21, tzinfo=utc)
+
+
+def test_index_columns():
+    columns = _index_columns(JobEvent)
+    assert ('job_id',) in columns
+    assert ('job_id', 'uuid') in columns
+    assert ('id',) not in columns
+
+
+def test_filter_event_partitions():
+    created = datetime(2017, 12, 14, tzinfo=utc)
+    job = Job(created=created, finished=created + timedelta(hours=1))
+    qs = JobEvent.objects.filter(job_id=1)
+    with mock.patch.object(event_partitions, 'is_partitioned', return_value=False):
+        assert filter_event_partitions(qs, job) is qs
+    with mock.patch.object(event_partitions, 'is_partitioned', return_value=True):
+        where = filter_event_partitions(qs, job).query.where.children
+    bounds = dict((c.lookup_name, c.rhs) for c in where if c.lhs.target.name == 'created')
+    assert bounds == {'gte': created - EVENT_TIME_SLACK, 'lt': job.finished + EVENT_TIME_SLACK}
+
+
+def test_is_missing_partition_error():
+    def error(pgcode, constraint_name=None):
+        exc = Exception()
+        exc.__cause__ = mock.Mock(pgcode=pgcode, diag=mock.Mock(constraint_name=constraint_name))
+        return exc
+
+    assert is_missing_partition_error(error('23514'))
+    # Check constraints, e.g. of positive integer fields
+    assert not is_missing_partition_error(error('23514', 'main_jobevent_counter_check'))
+    assert not is_missing_partition_error(error('23505', 'main_jobevent_pkey'))
+    assert not is_missing_partition_error(Exception('no partition of relation "main_jobevent" found for row'))
+
+
+def test_clamp_event_times(settings):
+    settings.EVENT_PARTITION_DAYS = 7
+    settings.EVENT_PARTITIONS_AHEAD = 4
+    current = datetime(2017, 12, 14, tzinfo=utc)
+    with mock.patch.object(event_partitions, 'now', return_value=current):
+        assert clamp_event_times([{}, {'created': 'bogus'}, {'created': '2017-01-01T00:00:00'}]) == current
+        assert clamp_event_times([
+            {'created': '2018-01-01T10:00:00'},
+            {'created': datetime(2018, 1, 1, 12, tzinfo=utc)},
+        ]) == datetime(2018, 1, 1, 12, tzinfo=utc)
+        bodies = [{'created': '2099-01-01T00:00:00'}]
+        assert clamp_event_times(bodies) == current
+    assert bodies == [{'created': current}]
+
+
+@pytest.mark.parametrize('last, logged', [
+    (datetime(2017, 12, 21, tzinfo=utc), True),
+    (datetime(2018, 1, 11, tzinfo=utc), False),
+])
+def test_extend_event_partitions_short_runway(settings, last, logged):
+    settings.EVENT_PARTITION_DAYS = 7
+    settings.EVENT_PARTITIONS_AHEAD = 4
+    partitions = [('main_jobevent_legacy', None, datetime(2017, 12, 14, tzinfo=utc)),
+                  ('main_jobevent_p20171214', datetime(2017, 12, 14, tzinfo=utc), last)]
+    with mock.patch.object(event_partitions, 'now', return_value=datetime(2017, 12, 14, tzinfo=utc)), \
+            mock.patch.object(event_partitions, 'list_event_partitions', return_value=partitions), \
+            mock.patch.object(event_partitions, 'create_event_partitions') as create, \
+            mock.patch.object(event_partitions, 'logger') as logger:
+        extend_event_partitions(JobEvent)
+    create.assert_called_once_with(JobEvent)
+    assert logger.error.called is logged
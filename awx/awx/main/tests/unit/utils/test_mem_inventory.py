@@ -1,11 +1,12 @@
 # AWX utils
 from awx.main.utils.mem_inventory import (
-    MemInventory,
-    mem_data_to_dict, dict_to_mem_data
+    MemInventory, JSONObjectStream,
+    mem_data_to_dict, dict_to_mem_data, stream_to_mem_data
 )
 
 import pytest
 import json
+import tempfile
 
 
 @pytest.fixture
@@ -126,3 +127,50 @@ def test_host_lists_accepted(JSON_with_lists):
     # Check that marietta's hosts was saved
     h = inventory.get_host('host6.example.com')
     assert h.name == 'host6.example.com'
+
+
+def _as_file(data):
+    f = tempfile.TemporaryFile()
+    f.write(json.dumps(data, indent=4, sort_keys=True))
+    f.seek(0)
+    return f
+
+
+def _summary(inventory):
+    hosts = dict((k, h.variables) for k, h in inventory.all_group.all_hosts.items())
+    groups = dict((k, (sorted(h.name for h in g.hosts), sorted(c.name for c in g.children), g.variables))
+                  for k, g in inventory.all_group.all_groups.items())
+    return hosts, groups
+
+
+@pytest.mark.inventory_import
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+def test_stream_JSON_to_memory(JSON_of_inv, chunk_size, monkeypatch):
+    monkeypatch.setattr(JSONObjectStream, 'chunk_size', chunk_size)
+    # Host vars given in a group are overridden by _meta, which sorts before
+    # the group in the streamed document.
+    JSON_of_inv['my_group']['hosts'] = {'group_host': {'foo': 'group', 'other': 1}}
+    JSON_of_inv['_meta']['hostvars']['group_host'] = {'foo': 'meta'}
+    JSON_of_inv['_meta']['hostvars']['filtered_host'] = {'foo': 'ignored'}
+    inventory, has_hostvars = stream_to_mem_data(_as_file(JSON_of_inv))
+    assert has_hostvars is True
+    assert _summary(inventory) == _summary(dict_to_mem_data(JSON_of_inv))
+    assert inventory.get_host('group_host').variables == {'foo': 'meta', 'other': 1}
+    assert 'filtered_host' not in inventory.all_group.all_hosts
+
+
+@pytest.mark.inventory_import
+def test_stream_JSON_without_hostvars(JSON_with_lists):
+    inventory, has_hostvars = stream_to_mem_data(_as_file(JSON_with_lists))
+    assert has_hostvars is False
+    assert _summary(inventory) == _summary(dict_to_mem_data(JSON_with_lists))
+
+
+@pytest.mark.inventory_import
+@pytest.mark.parametrize('content', ['[]', '{"a": [1, 2}', '{"a": 1,}', ''])
+def test_stream_invalid_JSON(content):
+    f = tempfile.TemporaryFile()
+    f.write(content)
+    f.seek(0)
+    with pytest.raises(ValueError):
+        stream_to_mem_data(f)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import codecs
+import os
+
+import pytest
+
+from awx.main.utils.stdout_index import (
+    get_line_index_path, StdoutLineIndexWriter, StdoutLineReader
+)
+
+
+LINES = [u'first\n', u'sécond\n', u'\n', u'fourth\n', u'fifth']
+
+
+@pytest.fixture
+def stdout_path(tmpdir):
+    path = str(tmpdir.join('1-stdout.out'))
+    stdout = codecs.open(path, 'w', encoding='utf-8')
+    index = StdoutLineIndexWriter(path)
+    # Write in chunks that don't line up with line boundaries.
+    data = u''.join(LINES)
+    for i in range(0, len(data), 4):
+        stdout.write(data[i:i + 4])
+        index.write(data[i:i + 4])
+    stdout.close()
+    index.close()
+    return path
+
+
+@pytest.mark.parametrize('start, end', [
+    (0, None), (1, 3), (2, 2), (3, 100), (-2, None), (-100, None), (10, None),
+])
+def test_read_lines(stdout_path, start, end):
+    content, start_actual, end_actual, absolute_end = StdoutLineReader(stdout_path).read_lines(start, end)
+    assert content == u''.join(LINES[start:end])
+    assert absolute_end == len(LINES)
+    if start < 0:
+        assert (start_actual, end_actual) == (len(LINES) + start, len(LINES))
+    else:
+        assert start_actual == start
+        assert end_actual == (min(end, len(LINES)) if end is not None else len(LINES))
+
+
+def test_missing_index_is_rebuilt(stdout_path):
+    os.remove(get_line_index_path(stdout_path))
+    content, _, _, absolute_end = StdoutLineReader(stdout_path).read_lines(-1)
+    assert content == u'fifth'
+    assert absolute_end == len(LINES)
+    assert os.path.exists(get_line_index_path(stdout_path))
+
+
+def test_output_past_end_of_index(stdout_path):
+    with codecs.open(stdout_path, 'a', encoding='utf-8') as f:
+        f.write(u'\nsixth\n')
+    content, _, _, absolute_end = StdoutLineReader(stdout_path).read_lines(4)
+    assert content == u'fifth\nsixth\n'
+    assert absolute_end == 6
+
+
+def test_index_ahead_of_stdout(stdout_path):
+    # The index can be flushed before the stdout file it describes.
+    with open(stdout_path, 'rb+') as f:
+        f.truncate(len(u''.join(LINES[:2]).encode('utf-8')))
+    content, _, _, absolute_end = StdoutLineReader(stdout_path).read_lines(0)
+    assert content == u''.join(LINES[:2])
+    assert absolute_end == 2
+
+
+def test_index_of_replaced_stdout_is_rebuilt(stdout_path):
+    # e.g. `sed -i` writes a new file in place of the old one, which can
+    # shrink it without invalidating the old offsets.
+    replacement = stdout_path + '.new'
+    with codecs.open(replacement, 'w', encoding='utf-8') as f:
+        f.write(u'one\ntwo\n')
+    os.rename(replacement, stdout_path)
+    content, _, _, absolute_end = StdoutLineReader(stdout_path).read_lines(0)
+    assert content == u'one\ntwo\n'
+    assert absolute_end == 2
+
+
+def test_index_without_header_is_rebuilt(stdout_path):
+    with open(get_line_index_path(stdout_path), 'wb') as f:
+        f.write(b'\x00' * 8)
+    content, _, _, absolute_end = StdoutLineReader(stdout_path).read_lines(-1)
+    assert content == u'fifth'
+    assert absolute_end == len(LINES)
@@ -40,7 +40,7 @@ logger = logging.getLogger('awx.main.utils')
 __all__ = ['get_object_or_400', 'get_object_or_403', 'camelcase_to_underscore', 'memoize', 'memoize_delete',
            'get_ansible_version', 'get_ssh_version', 'get_licenser', 'get_awx_version', 'update_scm_url',
            'get_type_for_model', 'get_model_for_type', 'copy_model_by_class',
-           'copy_m2m_relationships' ,'cache_list_capabilities', 'to_python_boolean',
+           'copy_m2m_relationships' ,'cache_list_capabilities', 'cache_list_related', 'to_python_boolean',
            'ignore_inventory_computed_fields', 'ignore_inventory_group_removal',
            '_inventory_updates', 'get_pk_from_dict', 'getattrd', 'NoDefaultProvided',
            'get_current_apps', 'set_current_apps', 'OutputEventFilter',
@@ -372,12 +372,13 @@ def _convert_model_field_for_display(obj, field_name, password_fields=None):
     return field_val
 
 
-def model_instance_diff(old, new, serializer_mapping=None):
+def model_instance_diff(old, new, serializer_mapping=None, fields=None):
     """
     Calculate the differences between two model instances. One of the instances may be None (i.e., a newly
     created model or deleted model). This will cause all fields with a value to have changed (from None).
     serializer_mapping are used to determine read-only fields.
     When provided, read-only fields will not be included in the resulting dictionary
+    When fields is provided, only those fields are compared.
     """
     from django.db.models import Model
 
@@ -391,6 +392,8 @@ def model_instance_diff(old, new, serializer_mapping=None):
     diff = {}
 
     allowed_fields = get_allowed_fields(new, serializer_mapping)
+    if fields is not None:
+        allowed_fields = [f for f in allowed_fields if f in fields]
 
     for field in allowed_fields:
         old_value = getattr(old, field, None)
@@ -515,7 +518,11 @@ def get_model_for_type(type):
 def cache_list_capabilities(page, prefetch_list, model, user):
     '''
     Given a `page` list of objects, the specified roles for the specified user
-    are save on each object in the list, using 1 query for each role type
+    are save on each object in the list, using 1 query for all of the role
+    types: each one is a CASE over its accessible_pk_qs subqueries, annotated
+    on the objects of the page.  The subqueries bypass the accessible pk
+    cache, whose misses would each cost a query of their own and whose ids
+    would be inlined in every CASE.
 
     Examples:
     capabilities_prefetch = ['admin', 'execute']
@@ -528,7 +535,8 @@ def cache_list_capabilities(page, prefetch_list, model, user):
       --> prefetch logical combination of admin permission to inventory AND
           project, put into cache dictionary as "copy"
     '''
-    from django.db.models import Q
+    from collections import OrderedDict
+    from django.db.models import BooleanField, Case, Q, Value, When
     page_ids = [obj.id for obj in page]
     for obj in page:
         obj.capabilities_cache = {}
@@ -537,6 +545,8 @@ def cache_list_capabilities(page, prefetch_list, model, user):
     if hasattr(model, 'invalid_user_capabilities_prefetch_models'):
         skip_models = model.invalid_user_capabilities_prefetch_models()
 
+    display_methods = []
+    conditions = []
     for prefetch_entry in prefetch_list:
 
         display_method = None
@@ -549,7 +559,7 @@ def cache_list_capabilities(page, prefetch_list, model, user):
         if type(paths) is not list:
             paths = [paths]
 
-        # Build the query for accessible_objects according the user & role(s)
+        # Build the condition for accessible_objects according the user & role(s)
         filter_args = []
         for role_path in paths:
             if '.' in role_path:
@@ -558,12 +568,10 @@ def cache_list_capabilities(page, prefetch_list, model, user):
                 parent_model = model
                 for subpath in role_path.split('.')[:-1]:
                     parent_model = parent_model._meta.get_field(subpath).related_model
-                filter_args.append(Q(
-                    Q(**{'%s__pk__in' % res_path: parent_model.accessible_pk_qs(user, '%s_role' % role_type)}) |
-                    Q(**{'%s__isnull' % res_path: True})))
+                filter_args.append((res_path, parent_model, role_type))
             else:
                 role_type = role_path
-                filter_args.append(Q(**{'pk__in': model.accessible_pk_qs(user, '%s_role' % role_type)}))
+                filter_args.append((None, model, role_type))
 
         if display_method is None:
             # Role name translation to UI names for methods
@@ -573,17 +581,80 @@ def cache_list_capabilities(page, prefetch_list, model, user):
             elif role_type in ['execute', 'update']:
                 display_method = 'start'
 
-        # Union that query with the list of items on page
-        filter_args.append(Q(pk__in=page_ids))
-        ids_with_role = set(model.objects.filter(*filter_args).values_list('pk', flat=True))
+        display_methods.append(display_method)
+        conditions.append(filter_args)
+
+    if not page_ids or not display_methods:
+        return
+
+    if user.is_superuser:
+        # get_user_capabilities grants every cached capability to superusers
+        capabilities = {}
+        default = [True] * len(display_methods)
+    else:
+        # Evaluate the conditions of every method for the items on page at once
+        annotations = OrderedDict()
+        for filter_args in conditions:
+            q = Q()
+            for res_path, role_model, role_type in filter_args:
+                accessible_pks = role_model.accessible_pk_qs(user, '%s_role' % role_type, cached=False)
+                if res_path:
+                    q &= Q(Q(**{'%s__pk__in' % res_path: accessible_pks}) |
+                           Q(**{'%s__isnull' % res_path: True}))
+                else:
+                    q &= Q(pk__in=accessible_pks)
+            annotations['capability_%d' % len(annotations)] = Case(
+                When(q, then=Value(True)), default=Value(False), output_field=BooleanField()
+            )
+        qs = model.objects.filter(pk__in=page_ids).annotate(**annotations)
+        capabilities = dict(
+            (row[0], [bool(has_role) for has_role in row[1:]])
+            for row in qs.values_list('pk', *annotations.keys())
+        )
+        default = [False] * len(display_methods)
+
+    # Save data item-by-item
+    for obj in page:
+        if skip_models and obj.__class__.__name__.lower() in skip_models:
+            continue
+        obj_capabilities = capabilities.get(obj.pk, default)
+        for display_method, has_role in zip(display_methods, obj_capabilities):
+            obj.capabilities_cache[display_method] = has_role
+
 
-        # Save data item-by-item
-        for obj in page:
-            if skip_models and obj.__class__.__name__.lower() in skip_models:
+def cache_list_related(page, field_names):
+    '''
+    Given a `page` list of objects, load the objects referenced by their
+    foreign keys named in `field_names` with one query per related model and
+    cache them on the objects of the page, so that serializing it (summary
+    fields, related links) doesn't load them one object at a time.
+
+    Polymorphic related objects are loaded as instances of their real class,
+    so that their type can be displayed without further queries.  Foreign
+    keys that are already cached (by select_related or prefetch_related) are
+    left alone, as are items of the page that are not model instances.
+    '''
+    from django.db.models import Model
+    field_names = set(field_names)
+    references = {}
+    for obj in page:
+        if not isinstance(obj, Model):
+            continue
+        for field in obj._meta.concrete_fields:
+            if field.name not in field_names or not field.is_relation or field.auto_created:
                 continue
-            obj.capabilities_cache[display_method] = False
-            if obj.pk in ids_with_role:
-                obj.capabilities_cache[display_method] = True
+            if hasattr(obj, field.get_cache_name()) or getattr(obj, field.attname) is None:
+                continue
+            references.setdefault(field.related_model, []).append((obj, field))
+
+    for related_model, model_references in references.items():
+        related_ids = set(getattr(obj, field.attname) for obj, field in model_references)
+        related_objects = dict((related.pk, related) for related in
+                               related_model.objects.filter(pk__in=related_ids))
+        for obj, field in model_references:
+            related = related_objects.get(getattr(obj, field.attname))
+            if related is not None:
+                setattr(obj, field.get_cache_name(), related)
 
 
 def validate_vars_type(vars_obj):
@@ -735,6 +806,8 @@ def wrap_args_with_proot(args, cwd, **kwargs):
     if not kwargs.get('isolated'):
         hide_paths.extend(['/etc/tower', '/var/lib/awx', '/var/log',
                            settings.PROJECTS_ROOT, settings.JOBOUTPUT_ROOT])
+        if getattr(settings, 'INVENTORY_SCRIPT_CACHE_ROOT', None):
+            hide_paths.append(settings.INVENTORY_SCRIPT_CACHE_ROOT)
     hide_paths.extend(getattr(settings, 'AWX_PROOT_HIDE_PATHS', None) or [])
     for path in sorted(set(hide_paths)):
         if not os.path.exists(path):
@@ -845,15 +918,25 @@ class OutputEventFilter(object):
 
     EVENT_DATA_RE = re.compile(r'\x1b\[K((?:[A-Za-z0-9+/=]+\x1b\[\d+D)+)\x1b\[K')
 
-    def __init__(self, fileobj=None, event_callback=None, raw_callback=None):
+    def __init__(self, fileobj=None, event_callback=None, raw_callback=None,
+                 partial_event_store=None, index_lines=True):
         self._fileobj = fileobj
+        self._line_index = None
+        stdout_path = getattr(fileobj, 'name', None)
+        if index_lines and isinstance(stdout_path, six.string_types) and os.path.isfile(stdout_path):
+            # Record line offsets next to the stdout file so that it can be
+            # paged through without reading it whole.
+            from awx.main.utils.stdout_index import StdoutLineIndexWriter
+            self._line_index = StdoutLineIndexWriter(stdout_path)
         self._event_callback = event_callback
         self._event_ct = 0
         self._raw_callback = raw_callback
+        self._partial_event_store = partial_event_store
         self._counter = 1
         self._start_line = 0
         self._buffer = ''
         self._current_event_data = None
+        self._pending_events = []
 
     def __getattr__(self, attr):
         return getattr(self._fileobj, attr)
@@ -861,6 +944,8 @@ class OutputEventFilter(object):
     def write(self, data):
         if self._fileobj:
             self._fileobj.write(data)
+        if self._line_index:
+            self._line_index.write(data)
         self._buffer += data
         if self._raw_callback:
             self._raw_callback(data)
@@ -875,13 +960,23 @@ class OutputEventFilter(object):
                 event_data = {}
             self._emit_event(self._buffer[:match.start()], event_data)
             self._buffer = self._buffer[match.end():]
+        self._flush_events()
+
+    def flush(self):
+        if self._fileobj:
+            self._fileobj.flush()
+        if self._line_index:
+            self._line_index.flush()
 
     def close(self):
         if self._fileobj:
             self._fileobj.close()
+        if self._line_index:
+            self._line_index.close()
         if self._buffer:
             self._emit_event(self._buffer)
             self._buffer = ''
+        self._flush_events()
 
     def _emit_event(self, buffered_stdout, next_event_data=None):
         if self._current_event_data:
@@ -902,14 +997,26 @@ class OutputEventFilter(object):
             event_data['end_line'] = self._start_line + n_lines
             self._start_line += n_lines
             if self._event_callback:
-                self._event_callback(event_data)
-                self._event_ct += 1
+                self._pending_events.append(dict(event_data))
 
         if next_event_data.get('uuid', None):
             self._current_event_data = next_event_data
         else:
             self._current_event_data = None
 
+    def _flush_events(self):
+        # Fetch the partial data for every event seen in this chunk of output
+        # with a single lookup, then hand the merged events to the callback.
+        pending, self._pending_events = self._pending_events, []
+        if self._partial_event_store:
+            uuids = [e['uuid'] for e in pending if 'uuid' in e]
+            partial_events = self._partial_event_store.get_many(uuids) if uuids else {}
+            for event_data in pending:
+                event_data.update(partial_events.get(event_data.get('uuid', None), {}))
+        for event_data in pending:
+            self._event_callback(event_data)
+            self._event_ct += 1
+
 
 def is_ansible_variable(key):
     return key.startswith('ansible_')
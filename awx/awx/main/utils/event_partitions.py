@@ -0,0 +1,262 @@
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved.
+
+# Python
+import datetime
+import logging
+import re
+
+# Django
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now, utc
+
+# AWX
+from awx.main.utils.pglock import advisory_lock
+
+__all__ = ['MIN_SERVER_VERSION', 'EVENT_TIME_SLACK', 'is_partitioned', 'partition_start',
+           'list_event_partitions', 'partition_event_table', 'create_event_partitions',
+           'drop_event_partitions', 'filter_event_partitions', 'extend_event_partitions',
+           'is_missing_partition_error', 'clamp_event_times']
+
+logger = logging.getLogger('awx.main.utils.event_partitions')
+
+# Range partitions with MINVALUE bounds, and inserts through the partitioned
+# table returning the new ids, need PostgreSQL 10.
+MIN_SERVER_VERSION = 100000
+
+# Events are timestamped by the callback plugin on the node that ran them (or
+# when saved, if they carry no timestamp), so allow for clock skew and
+# callback receiver lag when bounding when the events of a job were created.
+EVENT_TIME_SLACK = datetime.timedelta(days=1)
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=utc)
+CHECK_VIOLATION = '23514'
+BOUND_RE = re.compile(r'FROM \((.+)\) TO \((.+)\)$')
+
+# Tables are never converted back, so only positive answers are remembered.
+_partitioned_tables = set()
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _literal(when):
+    # Partition bounds must be plain literals, not parameters cast to a type.
+    return "'{}'".format(when.astimezone(utc).strftime('%Y-%m-%d %H:%M:%S+00'))
+
+
+def _parse_bound(value):
+    if value in ('MINVALUE', 'MAXVALUE'):
+        return None
+    return parse_datetime(value.strip("'"))
+
+
+def _index_columns(model):
+    opts = model._meta
+    columns = [(f.column,) for f in opts.local_fields if f.db_index and not f.primary_key]
+    columns += [tuple(opts.get_field(name).column for name in fields) for fields in opts.index_together]
+    return columns
+
+
+def is_partitioned(model):
+    '''
+    Return whether the table of `model` has been converted to a table
+    partitioned by creation time with `awx-manage partition_events`.
+    '''
+    if connection.vendor != 'postgresql':
+        return False
+    table = model._meta.db_table
+    if table not in _partitioned_tables:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_class WHERE oid = to_regclass(%s) AND relkind = 'p'", [table])
+            if cursor.fetchone() is None:
+                return False
+        _partitioned_tables.add(table)
+    return True
+
+
+def partition_start(when):
+    '''
+    Return the start of the EVENT_PARTITION_DAYS long period `when` is in.
+    '''
+    days = settings.EVENT_PARTITION_DAYS
+    return EPOCH + datetime.timedelta(days=(when - EPOCH).days // days * days)
+
+
+def list_event_partitions(model):
+    '''
+    Return the (name, lower bound, upper bound) of the partitions of the
+    table of `model` ordered by time, with None for unbounded ends.
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i '
+                       'JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s)',
+                       [model._meta.db_table])
+        rows = cursor.fetchall()
+    partitions = []
+    for name, bound in rows:
+        lower, upper = BOUND_RE.search(bound).groups()
+        partitions.append((name, _parse_bound(lower), _parse_bound(upper)))
+    partitions.sort(key=lambda p: (p[1] is not None, p[1]))
+    return partitions
+
+
+def partition_event_table(model):
+    '''
+    Convert the table of `model` into a table partitioned by range of
+    creation time.  The existing table becomes the partition holding the
+    events created before the start of the next period, which is scanned
+    once to check it.
+
+    PostgreSQL can't enforce foreign keys to a partitioned table, so those
+    pointing to the events (from the many to many tables) are dropped.
+    '''
+    opts = model._meta
+    table = opts.db_table
+    legacy = '{}_legacy'.format(table)
+    boundary = partition_start(now()) + datetime.timedelta(days=settings.EVENT_PARTITION_DAYS)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE {} IN ACCESS EXCLUSIVE MODE'.format(_quote(table)))
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, opts.pk.column])
+        sequence = cursor.fetchone()[0]
+        cursor.execute("SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE contype = 'f' "
+                       'AND confrelid = to_regclass(%s) AND conrelid <> confrelid', [table])
+        for referencing_table, constraint in cursor.fetchall():
+            cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(referencing_table, _quote(constraint)))
+        cursor.execute('ALTER TABLE {} RENAME TO {}'.format(_quote(table), _quote(legacy)))
+        cursor.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS) PARTITION BY RANGE ({})'.format(
+            _quote(table), _quote(legacy), _quote(opts.get_field('created').column)))
+        # Keep the id sequence when the old table is eventually dropped.
+        cursor.execute('ALTER SEQUENCE {} OWNED BY {}.{}'.format(sequence, _quote(table), _quote(opts.pk.column)))
+        cursor.execute('ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (MINVALUE) TO ({})'.format(
+            _quote(table), _quote(legacy), _literal(boundary)))
+    _partitioned_tables.add(table)
+    logger.info('Partitioned %s, existing events are kept in %s.', table, legacy)
+
+
+def create_event_partitions(model, until=None):
+    '''
+    Create the partitions missing from the partitioned table of `model` for
+    the period `until` (now by default) is in and the EVENT_PARTITIONS_AHEAD
+    following ones, returning their names.
+    '''
+    opts = model._meta
+    table = opts.db_table
+    period = datetime.timedelta(days=settings.EVENT_PARTITION_DAYS)
+    end = partition_start(until or now()) + period * (settings.EVENT_PARTITIONS_AHEAD + 1)
+    created = []
+    with advisory_lock('event_partitions_{}'.format(table)):
+        start = max(upper for name, lower, upper in list_event_partitions(model) if upper is not None)
+        while start < end:
+            name = '{}_p{:%Y%m%d}'.format(table, start)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('CREATE TABLE {} PARTITION OF {} FOR VALUES FROM ({}) TO ({})'.format(
+                    _quote(name), _quote(table), _literal(start), _literal(start + period)))
+                cursor.execute('ALTER TABLE {} ADD PRIMARY KEY ({})'.format(_quote(name), _quote(opts.pk.column)))
+                for i, columns in enumerate(_index_columns(model)):
+                    cursor.execute('CREATE INDEX {} ON {} ({})'.format(
+                        _quote('{}_idx{}'.format(name, i)), _quote(name), ', '.join(map(_quote, columns))))
+            logger.info('Created event partition %s.', name)
+            created.append(name)
+            start += period
+    return created
+
+
+def extend_event_partitions(model):
+    '''
+    Create the partitions of the partitioned table of `model` ahead of time,
+    first logging an error if less than half of the EVENT_PARTITIONS_AHEAD
+    periods were left, which means they weren't created on schedule (e.g.
+    because celery beat is not running).
+    '''
+    period = datetime.timedelta(days=settings.EVENT_PARTITION_DAYS)
+    last = max(upper for name, lower, upper in list_event_partitions(model) if upper is not None)
+    runway = last - now()
+    if runway < period * settings.EVENT_PARTITIONS_AHEAD / 2:
+        logger.error('The partitions of %s only reach %s, events created later will be rejected; '
+                     'check that the extend_event_partitions periodic task is running.',
+                     model._meta.db_table, last.isoformat())
+    return create_event_partitions(model)
+
+
+def is_missing_partition_error(exc):
+    '''
+    Return whether `exc` was raised inserting a row no partition accepts,
+    such as an event timestamped after the end of the last partition.
+    PostgreSQL reports those as check violations naming no constraint.
+    '''
+    cause = getattr(exc, '__cause__', None) or exc
+    diag = getattr(cause, 'diag', None)
+    return getattr(cause, 'pgcode', None) == CHECK_VIOLATION and getattr(diag, 'constraint_name', None) is None
+
+
+def clamp_event_times(bodies):
+    '''
+    Return the latest creation time of a list of callback payloads, or now
+    if that is later (payloads without a valid timestamp are saved with the
+    current time).
+
+    Payloads timestamped more than EVENT_PARTITIONS_AHEAD periods from now
+    come from a badly skewed clock; they are stamped with the current time
+    instead, rather than creating partitions all the way to their timestamp.
+    '''
+    current = now()
+    horizon = current + datetime.timedelta(days=settings.EVENT_PARTITION_DAYS) * settings.EVENT_PARTITIONS_AHEAD
+    latest = current
+    for body in bodies:
+        created = body.get('created', None)
+        if not isinstance(created, datetime.datetime):
+            try:
+                created = parse_datetime(created)
+            except (TypeError, ValueError):
+                continue
+        if created is None:
+            continue
+        if not created.tzinfo:
+            created = created.replace(tzinfo=utc)
+        if created > horizon:
+            logger.warn('Event timestamped %s is too far in the future, saving it as created now.', created.isoformat())
+            body['created'] = current
+            continue
+        latest = max(latest, created)
+    return latest
+
+
+def drop_event_partitions(model, before, dry_run=False):
+    '''
+    Drop the partitions of the table of `model` holding only events created
+    before `before`, along with the rows of its many to many tables pointing
+    to them, returning the names of the (would be) dropped partitions.
+    '''
+    pk_column = model._meta.pk.column
+    dropped = []
+    for name, lower, upper in list_event_partitions(model):
+        if upper is None or upper > before:
+            continue
+        if not dry_run:
+            with transaction.atomic(), connection.cursor() as cursor:
+                for field in model._meta.many_to_many:
+                    cursor.execute('DELETE FROM {} WHERE {} IN (SELECT {} FROM {})'.format(
+                        _quote(field.remote_field.through._meta.db_table), _quote(field.m2m_column_name()),
+                        _quote(pk_column), _quote(name)))
+                cursor.execute('DROP TABLE {}'.format(_quote(name)))
+            logger.info('Dropped event partition %s.', name)
+        dropped.append(name)
+    return dropped
+
+
+def filter_event_partitions(queryset, unified_job):
+    '''
+    Restrict a queryset of the events of `unified_job` to the time window
+    they can have been created in, so that PostgreSQL only scans the
+    partitions overlapping it.
+    '''
+    if not is_partitioned(queryset.model):
+        return queryset
+    queryset = queryset.filter(created__gte=unified_job.created - EVENT_TIME_SLACK)
+    if unified_job.finished:
+        queryset = queryset.filter(created__lt=unified_job.finished + EVENT_TIME_SLACK)
+    return queryset
@@ -2,6 +2,7 @@
 # All Rights Reserved.
 
 # Python
+import json
 import re
 import logging
 from collections import OrderedDict
@@ -12,11 +13,12 @@ from collections import OrderedDict
 logger = logging.getLogger('awx.main.commands.inventory_import')
 
 
-__all__ = ['MemHost', 'MemGroup', 'MemInventory',
-           'mem_data_to_dict', 'dict_to_mem_data']
+__all__ = ['MemHost', 'MemGroup', 'MemInventory', 'JSONObjectStream',
+           'mem_data_to_dict', 'dict_to_mem_data', 'stream_to_mem_data']
 
 
 ipv6_port_re = re.compile(r'^\[([A-Fa-f0-9:]{3,})\]:(\d+?)$')
+json_whitespace_re = re.compile(r'[ \t\n\r]*')
 
 
 # Models for in-memory objects that represent an inventory
@@ -27,6 +29,10 @@ class MemObject(object):
     Common code shared between in-memory groups and hosts.
     '''
 
+    # Large cloud inventories can hold hundreds of thousands of these, so
+    # avoid a per-instance __dict__.
+    __slots__ = ('name',)
+
     def __init__(self, name):
         assert name, 'no name'
         self.name = name
@@ -37,17 +43,21 @@ class MemGroup(MemObject):
     In-memory representation of an inventory group.
     '''
 
+    __slots__ = ('children', 'hosts', 'variables', 'parents', 'all_hosts', 'all_groups',
+                 '_host_set')
+
     def __init__(self, name):
         super(MemGroup, self).__init__(name)
         self.children = []
         self.hosts = []
+        # Membership test for hosts, which can number in the thousands.
+        self._host_set = set()
         self.variables = {}
         self.parents = []
         # Used on the "all" group in place of previous global variables.
         # maps host and group names to hosts to prevent redudant additions
         self.all_hosts = {}
         self.all_groups = {}
-        self.variables = {}
         logger.debug('Loaded group: %s', self.name)
 
     def __repr__(self):
@@ -65,7 +75,8 @@ class MemGroup(MemObject):
     def add_host(self, host):
         assert isinstance(host, MemHost), 'not MemHost instance'
         logger.debug('Adding host %s to group %s', host.name, self.name)
-        if host not in self.hosts:
+        if host not in self._host_set:
+            self._host_set.add(host)
             self.hosts.append(host)
 
     def debug_tree(self, group_names=None):
@@ -89,11 +100,12 @@ class MemHost(MemObject):
     In-memory representation of an inventory host.
     '''
 
+    __slots__ = ('variables', 'instance_id')
+
     def __init__(self, name, port=None):
         super(MemHost, self).__init__(name)
         self.variables = {}
         self.instance_id = None
-        self.name = name
         if port:
             # was `ansible_ssh_port` in older Ansible versions
             self.variables['ansible_port'] = port
@@ -224,6 +236,86 @@ def mem_data_to_dict(inventory):
     return inventory_data
 
 
+def _add_group_data(inventory, k, v):
+    '''
+    Add the hosts, variables and children of group `k` (as found in the JSON
+    output of an inventory script) to the in-memory inventory.
+    '''
+    group = inventory.get_group(k)
+    if not group:
+        return
+
+    # Load group hosts/vars/children from a dictionary.
+    if isinstance(v, dict):
+        # Process hosts within a group.
+        hosts = v.get('hosts', {})
+        if isinstance(hosts, dict):
+            for hk, hv in hosts.iteritems():
+                host = inventory.get_host(hk)
+                if not host:
+                    continue
+                if isinstance(hv, dict):
+                    host.variables.update(hv)
+                else:
+                    logger.warning('Expected dict of vars for '
+                                   'host "%s", got %s instead',
+                                   hk, str(type(hv)))
+                group.add_host(host)
+        elif isinstance(hosts, (list, tuple)):
+            for hk in hosts:
+                host = inventory.get_host(hk)
+                if not host:
+                    continue
+                group.add_host(host)
+        else:
+            logger.warning('Expected dict or list of "hosts" for '
+                           'group "%s", got %s instead', k,
+                           str(type(hosts)))
+        # Process group variables.
+        vars = v.get('vars', {})
+        if isinstance(vars, dict):
+            group.variables.update(vars)
+        else:
+            logger.warning('Expected dict of vars for '
+                           'group "%s", got %s instead',
+                           k, str(type(vars)))
+        # Process child groups.
+        children = v.get('children', [])
+        if isinstance(children, (list, tuple)):
+            for c in children:
+                child = inventory.get_group(c, inventory.all_group, child=True)
+                if child and c != 'ungrouped':
+                    group.add_child_group(child)
+        else:
+            logger.warning('Expected list of children for '
+                           'group "%s", got %s instead',
+                           k, str(type(children)))
+
+    # Load host names from a list.
+    elif isinstance(v, (list, tuple)):
+        for h in v:
+            host = inventory.get_host(h)
+            if not host:
+                continue
+            group.add_host(host)
+    else:
+        logger.warning('')
+        logger.warning('Expected dict or list for group "%s", '
+                       'got %s instead', k, str(type(v)))
+
+    if k not in ['all', 'ungrouped']:
+        inventory.all_group.add_child_group(group)
+
+
+def _add_meta_hostvars(host, hostvars):
+    if isinstance(hostvars, dict):
+        host.variables.update(hostvars)
+    else:
+        logger.warning('Expected dict of vars for '
+                       'host "%s", got %s instead',
+                       host.name, str(type(hostvars)))
+
+
 def dict_to_mem_data(data, inventory=None):
     '''
     In-place operation on `inventory`, adds contents from `data` to the
@@ -237,79 +329,159 @@ def dict_to_mem_data(data, inventory=None):
     _meta = data.pop('_meta', {})
 
     for k,v in data.iteritems():
-        group = inventory.get_group(k)
-        if not group:
-            continue
-
-        # Load group hosts/vars/children from a dictionary.
-        if isinstance(v, dict):
-            # Process hosts within a group.
-            hosts = v.get('hosts', {})
-            if isinstance(hosts, dict):
-                for hk, hv in hosts.iteritems():
-                    host = inventory.get_host(hk)
-                    if not host:
-                        continue
-                    if isinstance(hv, dict):
-                        host.variables.update(hv)
-                    else:
-                        logger.warning('Expected dict of vars for '
-                                       'host "%s", got %s instead',
-                                       hk, str(type(hv)))
-                    group.add_host(host)
-            elif isinstance(hosts, (list, tuple)):
-                for hk in hosts:
-                    host = inventory.get_host(hk)
-                    if not host:
-                        continue
-                    group.add_host(host)
-            else:
-                logger.warning('Expected dict or list of "hosts" for '
-                               'group "%s", got %s instead', k,
-                               str(type(hosts)))
-            # Process group variables.
-            vars = v.get('vars', {})
-            if isinstance(vars, dict):
-                group.variables.update(vars)
-            else:
-                logger.warning('Expected dict of vars for '
-                               'group "%s", got %s instead',
-                               k, str(type(vars)))
-            # Process child groups.
-            children = v.get('children', [])
-            if isinstance(children, (list, tuple)):
-                for c in children:
-                    child = inventory.get_group(c, inventory.all_group, child=True)
-                    if child and c != 'ungrouped':
-                        group.add_child_group(child)
-            else:
-                logger.warning('Expected list of children for '
-                               'group "%s", got %s instead',
-                               k, str(type(children)))
-
-        # Load host names from a list.
-        elif isinstance(v, (list, tuple)):
-            for h in v:
-                host = inventory.get_host(h)
-                if not host:
-                    continue
-                group.add_host(host)
-        else:
-            logger.warning('')
-            logger.warning('Expected dict or list for group "%s", '
-                           'got %s instead', k, str(type(v)))
-
-        if k not in ['all', 'ungrouped']:
-            inventory.all_group.add_child_group(group)
+        _add_group_data(inventory, k, v)
 
     if _meta:
         for k,v in inventory.all_group.all_hosts.iteritems():
-            meta_hostvars = _meta['hostvars'].get(k, {})
-            if isinstance(meta_hostvars, dict):
-                v.variables.update(meta_hostvars)
-            else:
-                logger.warning('Expected dict of vars for '
-                               'host "%s", got %s instead',
-                               k, str(type(meta_hostvars)))
+            _add_meta_hostvars(v, _meta['hostvars'].get(k, {}))
 
     return inventory
+
+
+class JSONObjectStream(object):
+    '''
+    Incrementally decodes a large JSON document made of nested objects from a
+    file.  The members of an object are read one at a time, so only the
+    member currently being processed has to be held in memory.
+    '''
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, fileobj, object_pairs_hook=None):
+        self.fileobj = fileobj
+        self.decoder = json.JSONDecoder(object_pairs_hook=object_pairs_hook)
+        # Values that are skipped don't need to go through the hook.
+        self.skip_decoder = json.JSONDecoder()
+        self.seek(fileobj.tell())
+
+    @property
+    def offset(self):
+        '''
+        Offset in the file of the next unread byte.
+        '''
+        return self._base + self._pos
+
+    def seek(self, offset):
+        self.fileobj.seek(offset)
+        self._base = offset
+        self._buf = b''
+        self._pos = 0
+        self._eof = False
+
+    def _read(self, size):
+        # Drop what has already been consumed before reading more.
+        data = self.fileobj.read(size)
+        self._base += self._pos
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+        self._eof = not data
+
+    def _peek(self):
+        while True:
+            self._pos = json_whitespace_re.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or self._eof:
+                return self._buf[self._pos:self._pos + 1]
+            self._read(self.chunk_size)
+
+    def _expect(self, chars):
+        c = self._peek()
+        if not c or c not in chars:
+            raise ValueError('Expected {} at offset {}, got {!r}'.format(
+                ' or '.join(repr(ch) for ch in chars), self.offset, c))
+        self._pos += 1
+        return c
+
+    def value(self, decoder=None):
+        '''
+        Decode and return the JSON value at the current position.
+        '''
+        decoder = decoder or self.decoder
+        self._peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if self._eof:
+                    raise
+            else:
+                # A number at the very end of the buffer may continue past it.
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return obj
+            # Grow the buffer geometrically so that a large value is only
+            # decoded a handful of times before it fits.
+            self._read(max(self.chunk_size, len(self._buf) - self._pos))
+
+    def skip(self, depth=0):
+        '''
+        Discard the JSON value at the current position, reading objects up to
+        `depth` levels deep one member at a time.
+        '''
+        if depth and self._peek() == b'{':
+            for _ in self.iter_object():
+                self.skip(depth - 1)
+        else:
+            self.value(self.skip_decoder)
+
+    def iter_object(self):
+        '''
+        Yield the keys of the JSON object at the current position.  Each
+        member's value must be consumed (with value(), skip() or
+        iter_object()) before advancing to the next key.
+        '''
+        self._expect(b'{')
+        if self._peek() == b'}':
+            self._pos += 1
+            return
+        while True:
+            if self._peek() != b'"':
+                self._expect(b'"')
+            key = self.value()
+            self._expect(b':')
+            yield key
+            if self._expect(b',}') == b'}':
+                return
+
+
+def stream_to_mem_data(fileobj, inventory=None):
+    '''
+    Like dict_to_mem_data, but reads the JSON inventory incrementally from
+    the seekable `fileobj`, adding one group or host at a time to
+    `inventory`.  The groups are loaded first, then a second pass reads only
+    "_meta" to apply hostvars, so they still take precedence over variables
+    given with the group hosts.  Variable names repeated across hosts share
+    a single string.
+
+    Returns the inventory and whether "_meta" contained any hostvars.
+    '''
+    if inventory is None:
+        inventory = MemInventory()
+    strings = {}
+
+    def object_pairs_hook(pairs):
+        return dict((strings.setdefault(k, k), v) for k, v in pairs)
+
+    stream = JSONObjectStream(fileobj, object_pairs_hook=object_pairs_hook)
+    meta_offset = None
+    for k in stream.iter_object():
+        if k == '_meta':
+            meta_offset = stream.offset
+            stream.skip(depth=2)
+        else:
+            _add_group_data(inventory, k, stream.value())
+
+    has_hostvars = False
+    if meta_offset is not None:
+        all_hosts = inventory.all_group.all_hosts
+        stream.seek(meta_offset)
+        for k in stream.iter_object():
+            if k != 'hostvars':
+                stream.skip()
+                continue
+            has_hostvars = True
+            for name in stream.iter_object():
+                hostvars = stream.value()
+                if name in all_hosts:
+                    _add_meta_hostvars(all_hosts[name], hostvars)
+
+    return inventory, has_hostvars
@@ -0,0 +1,64 @@
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved.
+
+# Python
+import codecs
+import json
+import os
+import stat
+
+# Django
+from django.conf import settings
+from django.core.cache import cache
+
+__all__ = ['MemcachePartialEventStore', 'FilePartialEventStore',
+           'get_partial_event_store']
+
+
+class MemcachePartialEventStore(object):
+    '''
+    Partial event data written to memcache by the awx_display callback plugin
+    under `ev-<uuid>` keys.
+    '''
+
+    def get_many(self, uuids):
+        if not uuids:
+            return {}
+        found = cache.get_many(['ev-{}'.format(event_uuid) for event_uuid in uuids])
+        return dict((key[len('ev-'):], value) for key, value in found.items())
+
+
+class FilePartialEventStore(object):
+    '''
+    Partial event data written by the awx_display callback plugin as
+    `<uuid>-partial.json` files in the job's private data dir (the same
+    layout used when running on an isolated node).
+    '''
+
+    def __init__(self, private_data_dir):
+        self.path = os.path.join(private_data_dir, 'artifacts', 'job_events')
+
+    def get_many(self, uuids):
+        found = {}
+        for event_uuid in uuids:
+            filename = os.path.join(self.path, '{}-partial.json'.format(event_uuid))
+            try:
+                with codecs.open(filename, 'r', encoding='utf-8') as f:
+                    found[event_uuid] = json.load(f)
+            except (IOError, ValueError):
+                continue
+        return found
+
+
+def get_partial_event_store(private_data_dir=None):
+    '''
+    Return the partial event store configured by AWX_PARTIAL_EVENT_TRANSPORT;
+    the file transport requires the job's private data dir.
+    '''
+    transport = getattr(settings, 'AWX_PARTIAL_EVENT_TRANSPORT', 'memcache')
+    if transport == 'file' and private_data_dir:
+        store = FilePartialEventStore(private_data_dir)
+        if not os.path.exists(store.path):
+            os.makedirs(store.path, mode=stat.S_IXUSR + stat.S_IWUSR + stat.S_IRUSR)
+        return store
+    return MemcachePartialEventStore()
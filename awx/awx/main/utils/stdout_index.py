@@ -0,0 +1,215 @@
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved.
+
+# Python
+import logging
+import mmap
+import os
+import struct
+
+import six
+
+__all__ = ['get_line_index_path', 'StdoutLineIndexWriter', 'StdoutLineReader']
+
+logger = logging.getLogger('awx.main.utils.stdout_index')
+
+# Each entry in the index is the byte offset just past a newline in the stdout
+# file, stored as a little-endian unsigned 64-bit integer; line N therefore
+# spans [entry N-1, entry N) with an implicit entry of 0 before the first.
+OFFSET_FORMAT = '<Q'
+OFFSET_SIZE = struct.calcsize(OFFSET_FORMAT)
+
+# The entries follow a header holding the inode of the stdout file they were
+# recorded for, so that an index isn't used for a file replaced since (e.g.
+# rewritten with `sed -i`).
+HEADER_MAGIC = b'AWXLIDX1'
+HEADER_FORMAT = '<8sQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+
+def get_line_index_path(stdout_path):
+    return '{}.idx'.format(stdout_path)
+
+
+def _pack_header(inode):
+    return struct.pack(HEADER_FORMAT, HEADER_MAGIC, inode)
+
+
+def _pack_offsets(offsets):
+    return struct.pack('<{}Q'.format(len(offsets)), *offsets)
+
+
+def _newline_offsets(data, start, end, base=0):
+    '''
+    Return the offsets (relative to `base`) just past every newline found in
+    data[start:end].
+    '''
+    offsets = []
+    pos = data.find(b'\n', start, end)
+    while pos != -1:
+        offsets.append(base + pos + 1)
+        pos = data.find(b'\n', pos + 1, end)
+    return offsets
+
+
+class StdoutLineIndexWriter(object):
+    '''
+    Incrementally records the byte offset of every line written to a stdout
+    file in a sidecar index file, so that readers can seek directly to a
+    range of lines.
+    '''
+
+    def __init__(self, stdout_path):
+        self.path = get_line_index_path(stdout_path)
+        self.position = 0
+        self._fileobj = open(self.path, 'wb')
+        self._fileobj.write(_pack_header(os.stat(stdout_path).st_ino))
+
+    def write(self, data):
+        if isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+        offsets = _newline_offsets(data, 0, len(data), base=self.position)
+        self.position += len(data)
+        if offsets:
+            self._fileobj.write(_pack_offsets(offsets))
+
+    def flush(self):
+        self._fileobj.flush()
+
+    def close(self):
+        self._fileobj.close()
+
+
+class StdoutLineReader(object):
+    '''
+    Reads ranges of lines from a stdout file through a memory map, using the
+    sidecar line index to find them.  Lines past the end of the index (output
+    that is still being written, or a missing index) are found by scanning
+    only the unindexed tail of the file; a missing or stale index is rebuilt.
+    '''
+
+    def __init__(self, stdout_path):
+        self.stdout_path = stdout_path
+        self.index_path = get_line_index_path(stdout_path)
+
+    def read_lines(self, start_line=0, end_line=None):
+        '''
+        Return (content, start_actual, end_actual, absolute_end) for the
+        lines selected by slicing the file's lines with [start_line:end_line].
+        '''
+        with open(self.stdout_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            if size == 0:
+                return self._result(u'', 0, start_line, end_line)
+            data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            try:
+                return self._read_lines(data, size, stat.st_ino, start_line, end_line)
+            finally:
+                data.close()
+
+    def _read_lines(self, data, size, inode, start_line, end_line):
+        index, indexed = self._open_index(data, size, inode)
+        try:
+            last_indexed = self._offset(index, indexed - 1) if indexed else 0
+            tail = _newline_offsets(data, last_indexed, size)
+            if (tail[-1] if tail else last_indexed) < size:
+                # The last line has no trailing newline (yet).
+                tail.append(size)
+            line_count = indexed + len(tail)
+
+            def line_end(n):
+                if n <= 0:
+                    return 0
+                if n <= indexed:
+                    return self._offset(index, n - 1)
+                return tail[n - indexed - 1]
+
+            first, last, _ = slice(start_line, end_line).indices(line_count)
+            if last > first:
+                content = data[line_end(first):line_end(last)].decode('utf-8')
+            else:
+                content = u''
+            return self._result(content, line_count, start_line, end_line)
+        finally:
+            if index:
+                index.close()
+
+    @staticmethod
+    def _result(content, line_count, start_line, end_line):
+        if start_line < 0:
+            start_actual = line_count + start_line
+            end_actual = line_count
+        else:
+            start_actual = start_line
+            if end_line is not None:
+                end_actual = min(end_line, line_count)
+            else:
+                end_actual = line_count
+        return content, start_actual, end_actual, line_count
+
+    @staticmethod
+    def _offset(index, n):
+        index.seek(HEADER_SIZE + n * OFFSET_SIZE)
+        return struct.unpack(OFFSET_FORMAT, index.read(OFFSET_SIZE))[0]
+
+    @staticmethod
+    def _count(index):
+        return (os.fstat(index.fileno()).st_size - HEADER_SIZE) // OFFSET_SIZE
+
+    def _indexed_lines(self, index, data, size, inode):
+        '''
+        Return the number of index entries that can be used for the current
+        contents of the stdout file, or None if the index does not match it.
+        '''
+        header = index.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or struct.unpack(HEADER_FORMAT, header) != (HEADER_MAGIC, inode):
+            return None
+        count = self._count(index)
+        # While a job is running the index may be flushed ahead of the stdout
+        # file, so only trust the entries that fall within the file.
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._offset(index, mid) <= size:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo:
+            last = self._offset(index, lo - 1)
+            if data[last - 1:last] != b'\n':
+                return None
+        return lo
+
+    def _open_index(self, data, size, inode):
+        try:
+            index = open(self.index_path, 'rb')
+        except IOError:
+            index = None
+        if index is not None:
+            indexed = self._indexed_lines(index, data, size, inode)
+            if indexed is not None:
+                return index, indexed
+            index.close()
+        try:
+            self._rebuild_index(data, size, inode)
+            index = open(self.index_path, 'rb')
+            return index, self._count(index)
+        except (IOError, OSError):
+            logger.exception('Failed to build line index for %s', self.stdout_path)
+            return None, 0
+
+    def _rebuild_index(self, data, size, inode):
+        # Jobs that predate the index (or whose index was lost) get one built
+        # on first read; write to a temporary file so concurrent readers never
+        # see a partial index.
+        tmp_path = '{}.{}.tmp'.format(self.index_path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            f.write(_pack_header(inode))
+            for chunk_start in six.moves.range(0, size, SCAN_CHUNK_SIZE):
+                chunk_end = min(chunk_start + SCAN_CHUNK_SIZE, size)
+                offsets = _newline_offsets(data, chunk_start, chunk_end)
+                if offsets:
+                    f.write(_pack_offsets(offsets))
+        os.rename(tmp_path, self.index_path)
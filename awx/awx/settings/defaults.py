@@ -118,6 +118,17 @@ PROJECTS_ROOT = os.path.join(BASE_DIR, 'projects')
 # directory should not be web-accessible
 JOBOUTPUT_ROOT = os.path.join(BASE_DIR, 'job_output')
 
+# Absolute filesystem path to the directory holding the compiled inventory
+# scripts served to jobs and /api/v2/inventories/N/script/ (default for
+# development, default for production defined in production.py).  Set to None
+# to build every script from the database.  This directory should not be
+# web-accessible.
+if is_testing():
+    # Test databases reuse inventory ids and script versions.
+    INVENTORY_SCRIPT_CACHE_ROOT = None
+else:
+    INVENTORY_SCRIPT_CACHE_ROOT = os.path.join(BASE_DIR, 'inventory_scripts')
+
 # Absolute filesystem path to the directory to store logs
 LOG_ROOT = os.path.join(BASE_DIR)
 
@@ -184,6 +195,32 @@ JOB_EVENT_WORKERS = 4
 # The maximum size of the job event worker queue before requests are blocked
 JOB_EVENT_MAX_QUEUE_SIZE = 10000
 
+# The maximum number of unacknowledged job events the callback receiver takes
+# from the broker; while a worker queue is full, the rest wait in the broker
+JOB_EVENT_PREFETCH_COUNT = 1000
+
+# Buffer job events in each callback receiver worker and save them in per-job
+# batches (one INSERT per batch) instead of one transaction per event.
+JOB_EVENT_BUFFERED_WRITES = False
+
+# The maximum number of events buffered for a single job before it is flushed
+JOB_EVENT_BUFFER_SIZE = 100
+
+# The maximum time (in seconds) an event may wait in a worker's buffer
+JOB_EVENT_BUFFER_FLUSH_INTERVAL = 0.5
+
+# How often (in seconds) each callback receiver worker logs its throughput
+JOB_EVENT_STATS_INTERVAL = 60
+
+# How often (in seconds) the callback receiver stores its per-worker queue
+# depth and drop counters (see `awx-manage stats`)
+JOB_EVENT_METRICS_INTERVAL = 10
+
+# How partial job event data is handed from the awx_display callback plugin
+# to the task that dispatches events: 'memcache', or 'file' to write it into
+# the job's private data dir and skip a memcache round trip per event.
+AWX_PARTIAL_EVENT_TRANSPORT = 'memcache'
+
 # Disallow sending session cookies over insecure connections
 SESSION_COOKIE_SECURE = True
 
@@ -466,6 +503,10 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'awx.main.tasks.purge_old_stdout_files',
         'schedule': timedelta(days=7)
     },
+    'event_partitions': {
+        'task': 'awx.main.tasks.extend_event_partitions',
+        'schedule': timedelta(hours=1)
+    },
     'task_manager': {
         'task': 'awx.main.scheduler.tasks.run_task_manager',
         'schedule': timedelta(seconds=20),
@@ -474,6 +515,19 @@ CELERY_BEAT_SCHEDULE = {
 }
 AWX_INCONSISTENT_TASK_INTERVAL = 60 * 3
 
+# Event tables partitioned with `awx-manage partition_events` are split into
+# partitions spanning this many days; the partitions for this many periods
+# ahead are created in advance by a periodic task.
+EVENT_PARTITION_DAYS = 7
+EVENT_PARTITIONS_AHEAD = 4
+
+# Keep the set of pending/waiting/running tasks between task manager runs and
+# only load the tasks that changed, instead of reloading all of them each run.
+AWX_INCREMENTAL_TASK_MANAGER = False
+
+# How often (in seconds) the incremental task manager does a full reload.
+AWX_TASK_MANAGER_FULL_RECONCILE_INTERVAL = 60 * 5
+
 # Django Caching Configuration
 if is_testing():
     CACHES = {
@@ -573,8 +627,39 @@ ANSIBLE_FORCE_COLOR = True
 # the celery task.
 AWX_TASK_ENV = {}
 
-# Flag to enable/disable updating hosts M2M when saving job events.
+# Flag to enable/disable updating hosts M2M for job events.  Associations are
+# written in bulk once the playbook reports its stats, and again
+# CAPTURE_JOB_EVENT_HOSTS_DELAY seconds after the job finishes.
 CAPTURE_JOB_EVENT_HOSTS = False
+CAPTURE_JOB_EVENT_HOSTS_DELAY = 30
+
+# Inventory computed field updates requested while one is already queued are
+# merged into it; after this many seconds without the queued task running,
+# the next request queues another.
+INVENTORY_COMPUTED_FIELDS_QUEUED_TIMEOUT = 300
+
+# Requested inventory computed field updates are kept in the cache for this
+# many seconds; when more than INVENTORY_COMPUTED_FIELDS_MAX_DELTAS of them
+# are waiting, or one was lost, the whole inventory is rebuilt instead.
+INVENTORY_COMPUTED_FIELDS_DELTA_TIMEOUT = 86400
+INVENTORY_COMPUTED_FIELDS_MAX_DELTAS = 1000
+
+# Number of hosts read, cached and written back per batch when seeding and
+# harvesting the fact cache of jobs using use_fact_cache.
+AWX_FACT_CACHE_BATCH_SIZE = 500
+
+# Number of hosts, groups or memberships read and written per query by
+# inventory_import when syncing an inventory source into the database.
+AWX_INVENTORY_IMPORT_BATCH_SIZE = 500
+
+# Number of seconds the ids of the objects each user can access through a role
+# are cached for (0 disables the cache).  Cached ids are also discarded as soon
+# as any role membership or ancestry changes.
+RBAC_ACCESSIBLE_PK_CACHE_TIMEOUT = 300
+
+# Users with access to more objects than this are not cached; the role
+# ancestry is queried as a subquery instead.
+RBAC_ACCESSIBLE_PK_CACHE_MAX_SIZE = 10000
 
 # Rebuild Host Smart Inventory memberships.
 AWX_REBUILD_SMART_MEMBERSHIP = False
@@ -594,6 +679,14 @@ AWX_PROOT_HIDE_PATHS = []
 # Note: This setting may be overridden by database settings.
 AWX_PROOT_SHOW_PATHS = []
 
+# Running jobs look for a cancel request, broadcast to the cache of every node
+# when a job is canceled, at most once every this many seconds.
+AWX_CANCEL_CHECK_INTERVAL = 1
+
+# Running jobs also read their cancel flag from the database every this many
+# seconds, in case a cancel broadcast was missed.
+AWX_CANCEL_DB_CHECK_INTERVAL = 30
+
 # Number of jobs to show as part of the job template history
 AWX_JOB_TEMPLATE_HISTORY = 10
 
@@ -890,6 +983,15 @@ SCM_EXCLUDE_EMPTY_GROUPS = True
 ACTIVITY_STREAM_ENABLED = True
 ACTIVITY_STREAM_ENABLED_FOR_INVENTORY_SYNC = False
 
+# How activity stream entries are written: 'immediate' saves each entry as it
+# is recorded, 'batch' bulk inserts a transaction's entries once it commits,
+# and 'buffered' hands them to a background task once it commits.
+if is_testing():
+    # Test transactions never commit.
+    ACTIVITY_STREAM_WRITE_MODE = 'immediate'
+else:
+    ACTIVITY_STREAM_WRITE_MODE = 'batch'
+
 # Internal API URL for use by inventory scripts and callback plugin.
 INTERNAL_API_URL = 'http://127.0.0.1:%s' % DEVSERVER_DEFAULT_PORT
 
@@ -931,6 +1033,15 @@ LOG_AGGREGATOR_LEVEL = 'INFO'
 # raising this value can help
 CHANNEL_LAYER_RECEIVE_MAX_RETRY = 10
 
+# Websocket clients subscribing to job or ad hoc command events with
+# "batch": true receive them as JSON arrays of up to this many events...
+WEBSOCKET_EVENT_BATCH_SIZE = 100
+
+# ...sent by the callback receiver at most once per window for each job; the
+# window (in seconds) adapts between these bounds to the job's event rate.
+WEBSOCKET_EVENT_BATCH_MIN_INTERVAL = 0.1
+WEBSOCKET_EVENT_BATCH_MAX_INTERVAL = 2
+
 # Logging configuration.
 LOGGING = {
     'version': 1,
@@ -39,6 +39,9 @@ INTERNAL_API_URL = 'http://127.0.0.1:80'
 # This directory should not be web-accessible
 JOBOUTPUT_ROOT = '/var/lib/awx/job_status/'
 
+# Absolute filesystem path to the directory holding compiled inventory scripts
+INVENTORY_SCRIPT_CACHE_ROOT = '/var/lib/awx/inventory_scripts/'
+
 # The heartbeat file for the tower scheduler
 SCHEDULE_METADATA_LOCATION = '/var/lib/awx/.tower_cycle'
 
@@ -82,31 +82,33 @@ def update_user_orgs(backend, details, user=None, *args, **kwargs):
     '''
     if not user:
         return
-    from awx.main.models import Organization
+    from awx.main.models import Organization, batch_role_ancestor_rebuilding
     multiple_orgs = feature_enabled('multiple_organizations')
     org_map = backend.setting('ORGANIZATION_MAP') or {}
-    for org_name, org_opts in org_map.items():
-
-        # Get or create the org to update.  If the license only allows for one
-        # org, always use the first active org, unless no org exists.
-        if multiple_orgs:
-            org = Organization.objects.get_or_create(name=org_name)[0]
-        else:
-            try:
-                org = Organization.objects.order_by('pk')[0]
-            except IndexError:
-                continue
-
-        # Update org admins from expression(s).
-        remove = bool(org_opts.get('remove', True))
-        admins_expr = org_opts.get('admins', None)
-        remove_admins = bool(org_opts.get('remove_admins', remove))
-        _update_m2m_from_expression(user, org.admin_role.members, admins_expr, remove_admins)
-
-        # Update org users from expression(s).
-        users_expr = org_opts.get('users', None)
-        remove_users = bool(org_opts.get('remove_users', remove))
-        _update_m2m_from_expression(user, org.member_role.members, users_expr, remove_users)
+    # Creating organizations rebuilds role ancestry; do it once, in bulk.
+    with batch_role_ancestor_rebuilding(in_memory=True):
+        for org_name, org_opts in org_map.items():
+
+            # Get or create the org to update.  If the license only allows for one
+            # org, always use the first active org, unless no org exists.
+            if multiple_orgs:
+                org = Organization.objects.get_or_create(name=org_name)[0]
+            else:
+                try:
+                    org = Organization.objects.order_by('pk')[0]
+                except IndexError:
+                    continue
+
+            # Update org admins from expression(s).
+            remove = bool(org_opts.get('remove', True))
+            admins_expr = org_opts.get('admins', None)
+            remove_admins = bool(org_opts.get('remove_admins', remove))
+            _update_m2m_from_expression(user, org.admin_role.members, admins_expr, remove_admins)
+
+            # Update org users from expression(s).
+            users_expr = org_opts.get('users', None)
+            remove_users = bool(org_opts.get('remove_users', remove))
+            _update_m2m_from_expression(user, org.member_role.members, users_expr, remove_users)
 
 
 def update_user_teams(backend, details, user=None, *args, **kwargs):
@@ -116,25 +118,27 @@ def update_user_teams(backend, details, user=None, *args, **kwargs):
     '''
     if not user:
         return
-    from awx.main.models import Organization, Team
+    from awx.main.models import Organization, Team, batch_role_ancestor_rebuilding
     multiple_orgs = feature_enabled('multiple_organizations')
     team_map = backend.setting('TEAM_MAP') or {}
-    for team_name, team_opts in team_map.items():
-
-        # Get or create the org to update.  If the license only allows for one
-        # org, always use the first active org, unless no org exists.
-        if multiple_orgs:
-            if 'organization' not in team_opts:
-                continue
-            org = Organization.objects.get_or_create(name=team_opts['organization'])[0]
-        else:
-            try:
-                org = Organization.objects.order_by('pk')[0]
-            except IndexError:
-                continue
-
-        # Update team members from expression(s).
-        team = Team.objects.get_or_create(name=team_name, organization=org)[0]
-        users_expr = team_opts.get('users', None)
-        remove = bool(team_opts.get('remove', True))
-        _update_m2m_from_expression(user, team.member_role.members, users_expr, remove)
+    # Creating teams rebuilds role ancestry; do it once, in bulk.
+    with batch_role_ancestor_rebuilding(in_memory=True):
+        for team_name, team_opts in team_map.items():
+
+            # Get or create the org to update.  If the license only allows for one
+            # org, always use the first active org, unless no org exists.
+            if multiple_orgs:
+                if 'organization' not in team_opts:
+                    continue
+                org = Organization.objects.get_or_create(name=team_opts['organization'])[0]
+            else:
+                try:
+                    org = Organization.objects.order_by('pk')[0]
+                except IndexError:
+                    continue
+
+            # Update team members from expression(s).
+            team = Team.objects.get_or_create(name=team_name, organization=org)[0]
+            users_expr = team_opts.get('users', None)
+            remove = bool(team_opts.get('remove', True))
+            _update_m2m_from_expression(user, team.member_role.members, users_expr, remove)
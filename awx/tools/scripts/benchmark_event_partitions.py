@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved.
+'''
+Compare the job event insert rate and the latency of the job events list
+queries with the event table unpartitioned and partitioned by creation time,
+for synthetic jobs spread over the coming weeks.
+
+Everything, including the conversion of the table, is done inside a
+transaction that is rolled back, so this can be pointed at a development
+database running PostgreSQL 10 or later:
+
+    awx-python tools/scripts/benchmark_event_partitions.py --jobs 500 --events 1000
+'''
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import timedelta
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+if base_dir not in sys.path:
+    sys.path.insert(1, base_dir)
+
+LAYOUTS = (('unpartitioned', False), ('partitioned', True))
+BATCH_SIZE = 100
+PAGE_SIZE = 25
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_jobs(jobs, days):
+    from django.utils.timezone import now
+    from awx.main.models import Job
+
+    begin = now()
+    step = timedelta(days=days) / jobs
+    return [
+        Job.objects.create(name='benchmark-%d' % i, status='successful',
+                           created=begin + step * i, finished=begin + step * i + timedelta(minutes=10))
+        for i in xrange(jobs)
+    ]
+
+
+def insert_events(jobs, events):
+    from awx.main.models import JobEvent
+
+    for job in jobs:
+        for offset in xrange(0, events, BATCH_SIZE):
+            JobEvent.objects.bulk_create([
+                JobEvent(job=job, event='runner_on_ok', counter=i, uuid=str(uuid.uuid4()),
+                         stdout='ok: [host-%d]' % i, start_line=i, end_line=i + 1,
+                         created=job.created + timedelta(seconds=i), modified=job.created)
+                for i in xrange(offset, min(offset + BATCH_SIZE, events))
+            ])
+
+
+def list_events(job):
+    from awx.main.utils.event_partitions import filter_event_partitions
+
+    qs = filter_event_partitions(job.job_events.all(), job).order_by('pk')
+    qs.count()
+    list(qs[:PAGE_SIZE])
+
+
+def run(layout, partitioned, jobs, events, days, samples):
+    from django.db import transaction
+    from django.utils.timezone import now
+    from awx.main.models import JobEvent
+    from awx.main.utils import event_partitions
+
+    results = {}
+    try:
+        with transaction.atomic():
+            if partitioned:
+                event_partitions.partition_event_table(JobEvent)
+                event_partitions.create_event_partitions(JobEvent, until=now() + timedelta(days=days))
+            created_jobs = create_jobs(jobs, days)
+
+            begin = time.time()
+            insert_events(created_jobs, events)
+            results['insert'] = jobs * events / (time.time() - begin)
+
+            rnd = random.Random(0)
+            begin = time.time()
+            for i in xrange(samples):
+                list_events(rnd.choice(created_jobs))
+            results['list'] = (time.time() - begin) * 1000 / samples
+            raise Rollback()
+    except Rollback:
+        pass
+    finally:
+        event_partitions._partitioned_tables.discard(JobEvent._meta.db_table)
+    print('%-14s  %10d  %14.0f  %12.2f' % (layout, jobs * events, results['insert'], results['list']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=200, help='number of jobs')
+    parser.add_argument('--events', type=int, default=500, help='number of events per job')
+    parser.add_argument('--days', type=int, default=56, help='number of days the jobs are spread over')
+    parser.add_argument('--samples', type=int, default=50, help='number of event lists to time')
+    args = parser.parse_args()
+
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'awx.settings.development')
+    django.setup()
+    from django.db import connection
+    from awx.main.utils.event_partitions import MIN_SERVER_VERSION
+
+    if connection.vendor != 'postgresql' or connection.pg_version < MIN_SERVER_VERSION:
+        sys.exit('Partitioned event tables require PostgreSQL 10 or later.')
+
+    print('%-14s  %10s  %14s  %12s' % ('layout', 'events', 'inserts (/s)', 'list (ms)'))
+    for layout, partitioned in LAYOUTS:
+        run(layout, partitioned, args.jobs, args.events, args.days, args.samples)
+
+
+if __name__ == '__main__':
+    main()
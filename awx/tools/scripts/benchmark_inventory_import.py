@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved.
+'''
+Compare the time and peak memory used by inventory_import to turn the JSON
+output of an inventory script into in-memory hosts and groups, by loading the
+whole document with json.loads and by streaming it with stream_to_mem_data.
+
+Each load runs in a fresh interpreter so that peak RSS figures are not
+affected by earlier runs:
+
+    awx-python tools/scripts/benchmark_inventory_import.py --hosts 10000 --hosts 100000
+'''
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+if base_dir not in sys.path:
+    sys.path.insert(1, base_dir)
+
+METHODS = ('json', 'stream')
+
+
+def generate_inventory(path, hosts, groups, host_vars, seed=0):
+    '''
+    Write an EC2-like inventory script output with the given number of hosts,
+    each a member of a handful of groups, with keys sorted like
+    ansible-inventory does.
+    '''
+    rnd = random.Random(seed)
+    group_hosts = dict(('group_%05d' % i, []) for i in xrange(groups))
+    group_names = sorted(group_hosts)
+    with open(path, 'wb') as f:
+        f.write('{"_meta": {"hostvars": {')
+        for i in xrange(hosts):
+            name = 'ip-10-%d-%d-%d.ec2.internal' % (i >> 16 & 255, i >> 8 & 255, i & 255)
+            for group_name in rnd.sample(group_names, min(5, groups)):
+                group_hosts[group_name].append(name)
+            variables = dict(('ec2_var_%02d' % v, 'value-%d-%d' % (v, rnd.randint(0, 1 << 30)))
+                             for v in xrange(host_vars))
+            variables['ansible_host'] = '10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255)
+            f.write('%s%s: %s' % (', ' if i else '', json.dumps(name), json.dumps(variables, sort_keys=True)))
+        f.write('}}')
+        f.write(', "all": {"children": %s}' % json.dumps(group_names + ['ungrouped']))
+        for group_name in group_names:
+            f.write(', %s: %s' % (json.dumps(group_name), json.dumps({
+                'hosts': group_hosts[group_name],
+                'vars': {'group_id': group_name},
+            })))
+        f.write(', "ungrouped": {}}')
+
+
+def load(method, path):
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'awx.settings.development')
+    django.setup()
+    from awx.main.utils.mem_inventory import dict_to_mem_data, stream_to_mem_data
+
+    begin = time.time()
+    with open(path, 'rb') as f:
+        if method == 'json':
+            inventory = dict_to_mem_data(json.loads(f.read()))
+        else:
+            inventory, _ = stream_to_mem_data(f)
+    elapsed = time.time() - begin
+    print(json.dumps({
+        'seconds': elapsed,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'hosts': len(inventory.all_group.all_hosts),
+        'groups': len(inventory.all_group.all_groups),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hosts', type=int, action='append',
+                        help='number of hosts to generate (may be repeated, default 10000 and 100000)')
+    parser.add_argument('--groups', type=int, default=200, help='number of groups to generate')
+    parser.add_argument('--host-vars', type=int, default=30, help='number of variables per host')
+    parser.add_argument('--load', nargs=2, metavar=('METHOD', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        return load(*args.load)
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print('%8s  %-8s  %10s  %12s' % ('hosts', 'method', 'seconds', 'max RSS (MB)'))
+        for hosts in args.hosts or [10000, 100000]:
+            path = os.path.join(tmpdir, 'inventory-%d.json' % hosts)
+            generate_inventory(path, hosts, args.groups, args.host_vars)
+            for method in METHODS:
+                output = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                                  '--load', method, path])
+                result = json.loads(output.strip().splitlines()[-1])
+                assert result['hosts'] == hosts, result
+                print('%8d  %-8s  %10.2f  %12.1f' % (hosts, method, result['seconds'],
+                                                     result['max_rss_kb'] / 1024.0))
+    finally:
+        shutil.rmtree(tmpdir, True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved.
+'''
+Compare the time taken by the SQL sweep and the in-memory engine of
+Role.rebuild_role_ancestor_list to rebuild the ancestry of a synthetic role
+graph shaped like a large install: organizations with many resources, each
+with admin and read roles, some cross-linked and a few looping back.
+
+Everything is created inside a transaction that is rolled back, so this can
+be pointed at a development database:
+
+    awx-python tools/scripts/benchmark_role_ancestry.py --organizations 50 --resources 1000
+'''
+import argparse
+import os
+import random
+import sys
+import time
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+if base_dir not in sys.path:
+    sys.path.insert(1, base_dir)
+
+ENGINES = (('sql', False), ('in_memory', True))
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_graph(organizations, resources, seed=0):
+    '''
+    Bulk create the roles and parent relations of the graph without touching
+    the ancestry table, returning the ids of all roles and of the organization
+    admin roles.
+    '''
+    from awx.main.models import Role
+
+    rnd = random.Random(seed)
+    root = Role.objects.create(role_field='benchmark_root')
+    Role.objects.bulk_create([
+        Role(role_field=role_field, object_id=i)
+        for i in xrange(organizations * (resources + 1))
+        for role_field in ('admin_role', 'read_role')
+    ], batch_size=1000)
+    role_ids = list(Role.objects.filter(pk__gt=root.pk).order_by('pk').values_list('pk', flat=True))
+
+    edges = []
+    org_admin_ids = []
+    it = iter(role_ids)
+    for o in xrange(organizations):
+        org_admin, org_read = next(it), next(it)
+        org_admin_ids.append(org_admin)
+        edges += [(org_admin, root.pk), (org_read, org_admin)]
+        resource_admins = []
+        for r in xrange(resources):
+            admin, read = next(it), next(it)
+            edges += [(admin, org_admin), (read, admin), (read, org_read)]
+            if resource_admins and rnd.random() < 0.3:
+                edges.append((read, rnd.choice(resource_admins)))
+            if rnd.random() < 0.01:
+                edges.append((org_admin, read))
+            resource_admins.append(admin)
+    Role.parents.through.objects.bulk_create([
+        Role.parents.through(from_role_id=from_id, to_role_id=to_id)
+        for from_id, to_id in edges
+    ], batch_size=1000)
+    return [root.pk] + role_ids, org_admin_ids
+
+
+def run(engine, in_memory, organizations, resources):
+    from django.db import transaction
+    from awx.main.models import Role, RoleAncestorEntry
+
+    results = {}
+    try:
+        with transaction.atomic():
+            role_ids, org_admin_ids = create_graph(organizations, resources)
+
+            begin = time.time()
+            Role.rebuild_role_ancestor_list(role_ids, [], in_memory=in_memory)
+            results['full'] = time.time() - begin
+            results['entries'] = RoleAncestorEntry.objects.filter(descendent_id__in=role_ids).count()
+
+            # Like deleting an organization: detach everything below its admin role
+            begin = time.time()
+            children = Role.parents.through.objects.filter(to_role_id=org_admin_ids[0])
+            child_ids = list(children.values_list('from_role_id', flat=True))
+            children.delete()
+            Role.rebuild_role_ancestor_list([], child_ids, in_memory=in_memory)
+            results['detach'] = time.time() - begin
+            raise Rollback()
+    except Rollback:
+        pass
+    print('%-10s  %8d  %10d  %10.2f  %10.2f' % (engine, len(role_ids), results['entries'],
+                                                results['full'], results['detach']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--organizations', type=int, default=20, help='number of organizations')
+    parser.add_argument('--resources', type=int, default=500, help='number of resources per organization')
+    args = parser.parse_args()
+
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'awx.settings.development')
+    django.setup()
+
+    print('%-10s  %8s  %10s  %10s  %10s' % ('engine', 'roles', 'entries', 'full (s)', 'detach (s)'))
+    for engine, in_memory in ENGINES:
+        run(engine, in_memory, args.organizations, args.resources)
+
+
+if __name__ == '__main__':
+    main()
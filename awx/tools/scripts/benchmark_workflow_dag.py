@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved.
+'''
+Time WorkflowDAG construction and traversal over large synthetic workflows:
+random layered DAGs whose nodes closest to the roots have already run.
+
+Nothing touches the database:
+
+    awx-python tools/scripts/benchmark_workflow_dag.py --nodes 1000 10000
+'''
+import argparse
+import os
+import random
+import sys
+import time
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+if base_dir not in sys.path:
+    sys.path.insert(1, base_dir)
+
+
+class FakeJob(object):
+
+    def __init__(self, status):
+        self.status = status
+
+
+class FakeNode(object):
+    '''
+    Stand-in for a WorkflowJobNode; hashable and comparable by id.
+    '''
+
+    def __init__(self, id, job=None):
+        self.id = id
+        self.job = job
+        self.unified_job_template = object()
+
+    def __eq__(self, other):
+        return isinstance(other, FakeNode) and self.id == other.id
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+def build_workflow(node_count, fan_out=3, finished_ratio=0.5, seed=0):
+    '''
+    Build a random layered DAG where roughly `finished_ratio` of the nodes
+    (those closest to the roots) have already run.
+    '''
+    rng = random.Random(seed)
+    finished = int(node_count * finished_ratio)
+    nodes = []
+    for i in range(node_count):
+        job = None
+        if i < finished:
+            job = FakeJob(rng.choice(['successful', 'successful', 'failed']))
+        nodes.append(FakeNode(i, job))
+    edges = []
+    for i in range(1, node_count):
+        for parent in set(rng.randint(max(0, i - 50), i - 1) for _ in range(rng.randint(1, fan_out))):
+            label = rng.choice(['success_nodes', 'failure_nodes', 'always_nodes'])
+            edges.append((nodes[parent], nodes[i], label))
+    return nodes, edges
+
+
+def timed(fn):
+    start = time.time()
+    result = fn()
+    return result, time.time() - start
+
+
+def run(node_count):
+    from awx.main.scheduler.dag_workflow import WorkflowDAG
+
+    nodes, edges = build_workflow(node_count)
+
+    def construct():
+        dag = WorkflowDAG()
+        for node in nodes:
+            dag.add_node(node)
+        dag.add_edges(edges)
+        return dag
+
+    dag, construct_time = timed(construct)
+    _, roots_time = timed(dag.get_root_nodes)
+    _, leafs_time = timed(dag.get_leaf_nodes)
+    to_run, bfs_time = timed(dag.bfs_nodes_to_run)
+    _, done_time = timed(dag.is_workflow_done)
+    print('{:>6} nodes {:>6} edges: construct {:.3f}s, roots {:.3f}s, leafs {:.3f}s, '
+          'bfs_nodes_to_run {:.3f}s ({} to run), is_workflow_done {:.3f}s'.format(
+              node_count, len(edges), construct_time, roots_time, leafs_time,
+              bfs_time, len(to_run), done_time))
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, nargs='+', default=[1000, 10000],
+                        help='number of nodes of each workflow to time')
+    args = parser.parse_args()
+
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'awx.settings.development')
+    django.setup()
+
+    for node_count in args.nodes:
+        run(node_count)
+
+
+if __name__ == '__main__':
+    main()